@@ -2,6 +2,9 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib.auth import get_user_model
+
+from authentication.models import OutboundEmail, RevokedToken
+
 User = get_user_model()
 
 @admin.register(User)
@@ -10,4 +13,20 @@ class UserAdmin(admin.ModelAdmin):
     search_fields = ('email',)
     list_filter = ('is_active', 'is_staff', 'is_superuser')
     ordering = ('-created_at',)
-    readonly_fields = ('created_at',)
\ No newline at end of file
+    readonly_fields = ('created_at',)
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'to', 'template', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    search_fields = ('to',)
+    list_filter = ('status', 'template')
+    ordering = ('-created_at',)
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+
+
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    list_display = ('id', 'jti', 'revoked_at', 'expires_at')
+    search_fields = ('jti',)
+    ordering = ('-revoked_at',)
@@ -0,0 +1,61 @@
+"""
+Native async login for ASGI deployments.
+
+The user lookup runs on the async ORM and the password check awaits the
+hashing executor, so a login storm parks coroutines instead of occupying a
+thread each for the length of a PBKDF2 run.
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from rest_framework import serializers, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.settings import api_settings
+
+from authentication.login import LoginBusy, hashing, last_logins
+from authentication.serializers import LoginSerializer
+
+User = get_user_model()
+
+
+class AsyncLoginView(View):
+    query_budget = 2
+    renderer = JSONRenderer()
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # credentials in the body, no session cookie to protect
+        view.csrf_exempt = True
+        return view
+
+    def render(self, data, status_code=status.HTTP_200_OK, headers=None):
+        return HttpResponse(self.renderer.render(data), status=status_code, content_type='application/json', headers=headers)
+
+    async def post(self, request):
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or not data.get('email') or not data.get('password'):
+            return self.render({"message": "Invalid operation. Please provide email and password"}, status.HTTP_400_BAD_REQUEST)
+
+        user = await User.objects.filter(email=User.objects.normalize_email(str(data['email']))).afirst()
+        if user is None:
+            return self.render({"message": ["User does not exist"]}, status.HTTP_400_BAD_REQUEST)
+        try:
+            token = LoginSerializer.issue(user, await hashing.averify(user, str(data['password'])))
+        except LoginBusy:
+            return self.render(
+                {"message": "Too many logins in progress. Please try again shortly"},
+                status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'},
+            )
+        except serializers.ValidationError as exc:
+            # shaped as LoginView reports it through serializer.is_valid()
+            return self.render(serializers.as_serializer_error(exc), status.HTTP_400_BAD_REQUEST)
+        if api_settings.UPDATE_LAST_LOGIN:
+            await last_logins.arecord(user.pk)
+        return self.render(token)
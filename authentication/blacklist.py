@@ -0,0 +1,154 @@
+"""
+Refresh token blacklist: a per-process Bloom filter of revoked `jti`s in
+front of the RevokedToken table.
+
+A jti the filter has never seen is certainly not revoked, so the usual check
+costs one cache read and no query. Only a possible hit (a revoked token, or
+a false positive at about JWT_BLACKLIST_ERROR_RATE) asks the table.
+
+Processes keep their filters in step through a generation counter in the
+cache: revoke() bumps it once the row is committed, and a process that
+sees a new generation adds the rows revoked since its last sync. A per
+process cache never shows a bump made in another process, so a filter older
+than JWT_BLACKLIST_SYNC_SECONDS is topped up the same way whatever the
+generation says. Expired rows are pruned at most once per
+JWT_BLACKLIST_PRUNE_SECONDS.
+"""
+import hashlib
+import math
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.models import RevokedToken
+
+GENERATION_KEY = 'jwt:blacklist:generation'
+PRUNE_KEY = 'jwt:blacklist:prune'
+# re-read rows revoked this long before the last sync, their transaction may
+# have committed after it; longer than JWT_BLACKLIST_SYNC_SECONDS
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, key):
+        # double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        """Set `key`'s bits. `count` only grows when one was unset, so re-adds do not fill the filter."""
+        added = False
+        for position in self.positions(key):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+
+class TokenBlacklist:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.filter = None
+        self.generation = None
+        self.synced_at = None
+
+    def is_revoked(self, jti):
+        self.sync()
+        if jti not in self.filter:
+            return False
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    def revoke(self, jti, expires_at):
+        """Record `jti` as revoked. Returns False when it already was."""
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+                transaction.on_commit(bump_generation)
+        except IntegrityError:
+            return False
+        with self._lock:
+            if self.filter is not None:
+                self.filter.add(jti)
+        prune()
+        return True
+
+    def current(self, generation):
+        if self.filter is None or generation != self.generation:
+            return False
+        return timezone.now() - self.synced_at < timedelta(seconds=settings.JWT_BLACKLIST_SYNC_SECONDS)
+
+    def sync(self):
+        generation = cache.get(GENERATION_KEY, 0)
+        if self.current(generation):
+            return
+        with self._lock:
+            if self.current(generation):
+                return
+            now = timezone.now()
+            rows = RevokedToken.objects.filter(expires_at__gt=now)
+            if self.filter is None or self.filter.count >= settings.JWT_BLACKLIST_CAPACITY:
+                # first load, or a full filter is rebuilt without the expired rows
+                self.filter = BloomFilter(settings.JWT_BLACKLIST_CAPACITY, settings.JWT_BLACKLIST_ERROR_RATE)
+            else:
+                rows = rows.filter(revoked_at__gte=self.synced_at - SYNC_OVERLAP)
+            for jti in rows.values_list('jti', flat=True).iterator():
+                self.filter.add(jti)
+            self.generation = generation
+            self.synced_at = now
+
+    def forget(self):
+        with self._lock:
+            self.filter = None
+            self.generation = None
+
+
+def bump_generation():
+    if not cache.add(GENERATION_KEY, 1, None):
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.add(GENERATION_KEY, 1, None)
+
+
+def prune():
+    """Delete expired rows, at most once per JWT_BLACKLIST_PRUNE_SECONDS across processes."""
+    if cache.add(PRUNE_KEY, 1, settings.JWT_BLACKLIST_PRUNE_SECONDS):
+        return RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+    return 0
+
+
+blacklist = TokenBlacklist()
+
+
+class RevocableRefreshToken(RefreshToken):
+    """RefreshToken checked against, and revoked into, the blacklist."""
+
+    def verify(self, *args, **kwargs):
+        # expired tokens fail here first and never reach the blacklist
+        super().verify(*args, **kwargs)
+        if blacklist.is_revoked(self[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+    def revoke(self):
+        """Revoke this token. Returns False when it already was."""
+        return blacklist.revoke(self[api_settings.JTI_CLAIM], datetime.fromtimestamp(self['exp'], tz=dt_timezone.utc))
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_otp_cache_is_shared(app_configs, **kwargs):
+    """
+    OTP codes, attempt counters and the resend throttle live in the default
+    cache, which a per-process backend cannot share between workers.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in settings.PER_PROCESS_CACHE_BACKENDS:
+        return []
+    return [Warning(
+        f"Verification codes are kept in the per-process {backend.rsplit('.', 1)[-1]}",
+        hint="With several workers, a code issued by one cannot be verified by another, and the "
+             "attempt limit and resend throttle are per worker. Point CACHE_BACKEND at a shared cache.",
+        id='authentication.W001',
+    )]
@@ -0,0 +1,231 @@
+"""
+Login throughput: password checks on a bounded executor, `last_login`
+coalesced into batched UPDATEs.
+
+PBKDF2 is most of a login's cost and hashlib releases the GIL while it runs,
+so checks go to LOGIN_HASH_WORKERS dedicated threads instead of whatever
+thread the request is on. At most LOGIN_HASH_QUEUE checks wait for a worker;
+past that, submit() raises LoginBusy and the view answers 503 at once,
+rather than piling a login storm onto every worker.
+
+Logins record `last_login` in a per-process buffer that is written with one
+UPDATE per LOGIN_FLUSH_SECONDS, by whichever login comes due or, once logins
+stop, by a daemon timer armed when the buffer fills; the buffer is flushed
+once more at interpreter exit. A process that is killed loses at most that
+window of `last_login` values. A flush that fails (e.g. the database is
+locked) is logged and its batch goes back into the buffer for the next one;
+it never fails the login that triggered it. Passwords stored with an
+outdated hasher are rehashed on the executor after the response and written
+with the next flush.
+"""
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.db import connections
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from zippee_assessment.write_queue import write_queue
+
+logger = logging.getLogger(__name__)
+
+
+class LoginBusy(Exception):
+    """Every hashing worker is busy and the wait queue is full."""
+
+
+def must_update(encoded):
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = get_hasher('default')
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+class HashingExecutor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pool = None
+        self.slots = None
+        self.in_flight = 0
+        self.peak = 0
+        self.completed = 0
+        self.rejected = 0
+        self.upgrades = 0
+
+    def start(self):
+        if self.pool is None:
+            with self._lock:
+                if self.pool is None:
+                    workers = settings.LOGIN_HASH_WORKERS
+                    self.slots = threading.BoundedSemaphore(workers + settings.LOGIN_HASH_QUEUE)
+                    self.pool = ThreadPoolExecutor(workers, thread_name_prefix='login-hash')
+
+    def submit(self, func, *args):
+        self.start()
+        if not self.slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise LoginBusy()
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        future = self.pool.submit(func, *args)
+        future.add_done_callback(self.release)
+        return future
+
+    def release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self.slots.release()
+
+    def verify(self, user, password):
+        """Check `password` against `user` on the executor. Raises LoginBusy when saturated."""
+        return self.submit(self.check, user.pk, user.password, password).result()
+
+    async def averify(self, user, password):
+        return await asyncio.wrap_future(self.submit(self.check, user.pk, user.password, password))
+
+    def check(self, user_id, encoded, password):
+        # no setter: the upgrade below is scheduled instead of saved inline
+        if not check_password(password, encoded):
+            return False
+        if must_update(encoded):
+            try:
+                self.submit(self.upgrade, user_id, encoded, password)
+            except LoginBusy:
+                # tried again on the next login
+                pass
+        return True
+
+    def upgrade(self, user_id, encoded, password):
+        last_logins.upgrade(user_id, encoded, make_password(password))
+        with self._lock:
+            self.upgrades += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': settings.LOGIN_HASH_WORKERS,
+                'queue_limit': settings.LOGIN_HASH_QUEUE,
+                'in_flight': self.in_flight,
+                'queued': max(0, self.in_flight - settings.LOGIN_HASH_WORKERS),
+                'peak': self.peak,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'upgrades': self.upgrades,
+            }
+
+
+class LastLoginBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flushing = threading.Lock()
+        self.logins = {}
+        self.passwords = {}
+        self.due = time.monotonic() + settings.LOGIN_FLUSH_SECONDS
+        self.flushes = 0
+        self.timer = None
+
+    def record(self, user_id, when=None):
+        """Buffer a login of `user_id`, flushing the buffer when it is due."""
+        with self._lock:
+            self.logins[user_id] = when or timezone.now()
+            self.arm()
+            due = time.monotonic() >= self.due
+        if due:
+            self.flush()
+
+    async def arecord(self, user_id, when=None):
+        with self._lock:
+            self.logins[user_id] = when or timezone.now()
+            self.arm()
+            due = time.monotonic() >= self.due
+        if due:
+            await sync_to_async(self.flush)()
+
+    def upgrade(self, user_id, encoded, rehashed):
+        with self._lock:
+            self.passwords[user_id] = (encoded, rehashed)
+            self.arm()
+
+    def arm(self):
+        # called under _lock: one timer at a time flushes what logins leave behind
+        if self.timer is None:
+            self.timer = threading.Timer(settings.LOGIN_FLUSH_SECONDS, self.flush_on_timer)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush_on_timer(self):
+        with self._lock:
+            self.timer = None
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+        with self._lock:
+            if self.logins or self.passwords:
+                # a failed batch went back into the buffer
+                self.arm()
+
+    def flush(self):
+        # one flusher at a time, logins arriving meanwhile go to the next batch
+        if not self._flushing.acquire(blocking=False):
+            return 0
+        try:
+            with self._lock:
+                logins, self.logins = self.logins, {}
+                passwords, self.passwords = self.passwords, {}
+                self.due = time.monotonic() + settings.LOGIN_FLUSH_SECONDS
+            if not logins and not passwords:
+                return 0
+            try:
+                write_queue.run(self.write, logins, passwords)
+            except Exception:
+                logger.exception("last_login flush of %d logins failed, retrying with the next flush", len(logins))
+                with self._lock:
+                    # values buffered since the swap are newer, they win
+                    self.logins = {**logins, **self.logins}
+                    self.passwords = {**passwords, **self.passwords}
+                return 0
+            self.flushes += 1
+            return len(logins)
+        finally:
+            self._flushing.release()
+
+    def forget(self):
+        with self._lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.logins.clear()
+            self.passwords.clear()
+            self.due = time.monotonic() + settings.LOGIN_FLUSH_SECONDS
+
+    def write(self, logins, passwords):
+        User = get_user_model()
+        ids = list(logins)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            User.objects.filter(pk__in=chunk).update(last_login=Case(
+                *[When(pk=pk, then=Value(logins[pk])) for pk in chunk], output_field=DateTimeField(),
+            ))
+        for pk, (encoded, rehashed) in passwords.items():
+            # skipped if the password changed since it was checked
+            User.objects.filter(pk=pk, password=encoded).update(password=rehashed)
+
+
+hashing = HashingExecutor()
+last_logins = LastLoginBuffer()
+
+atexit.register(last_logins.flush)
@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from authentication.outbox import send_due
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails from the outbox in batches, retrying failures with exponential backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Emails per batch (default: OUTBOX_BATCH_SIZE)')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when nothing is due')
+        parser.add_argument('--once', action='store_true', help='Send what is due now, then exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or settings.OUTBOX_BATCH_SIZE
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_due(batch_size)
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f"Sent {sent}, failed {failed}")
+            if sent + failed < batch_size:
+                if options['once']:
+                    break
+                # drop a connection the database may have closed while idle
+                close_old_connections()
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f"Sent {total_sent} emails, {total_failed} failed"))
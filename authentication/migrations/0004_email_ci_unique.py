@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:58
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def lowercase_emails(apps, schema_editor):
+    User = apps.get_model('authentication', 'CustomUser')
+    users = User.objects.using(schema_editor.connection.alias)
+    clashes = list(
+        users.annotate(normalized=Lower('email')).values('normalized')
+        .annotate(n=Count('id')).filter(n__gt=1).values_list('normalized', flat=True)
+    )
+    if clashes:
+        raise RuntimeError(
+            'Users whose emails differ only by case must be merged or renamed before '
+            f'this migration: {", ".join(sorted(clashes))}'
+        )
+    users.exclude(email=Lower('email')).update(email=Lower('email'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('authentication', '0003_outbound_email'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='user_email_ci_unique'),
+        ),
+    ]
@@ -1,8 +1,18 @@
 from django.db import models
+from django.db.models.functions import Lower
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 import os, uuid
 
 class CustomUserManager(BaseUserManager):
+    @classmethod
+    def normalize_email(cls, email):
+        # emails are stored lowercased, so lookups are exact matches on the unique index
+        return (email or '').strip().lower()
+
+    def get_by_natural_key(self, username):
+        return self.get(email=self.normalize_email(username))
+
     def create_user(self, email, password, **extra_fields):
         if not email:
             raise ValueError('Email is required')
@@ -48,15 +58,69 @@ class CustomUser(AbstractUser):
     REQUIRED_FIELDS = []  
     
     objects = CustomUserManager()
+
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # also rejects mixed-case duplicates written around save(), e.g. by update()
+            models.UniqueConstraint(Lower('email'), name='user_email_ci_unique'),
+        ]
     
     def __str__(self):
         return self.email
     
 
     def save(self, *args, **kwargs):
+        self.email = CustomUserManager.normalize_email(self.email)
         if self.pk is None:
             self.role = self.base_role
         else:
             if not self.first_name:
                 self.first_name = self.email.split('@')[0]
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class OutboundEmail(models.Model):
+    """
+    Transactional outbox for emails: requests insert a row in their own
+    transaction and return, `python manage.py run_outbox_worker` renders and
+    sends them in batches, retrying failures with exponential backoff.
+    """
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        SENT = "SENT", "Sent"
+        FAILED = "FAILED", "Failed"
+
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    # rendered as <template>.txt, plus <template>.html when it exists
+    template = models.CharField(max_length=255)
+    context = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # lease of the worker currently sending it, see authentication.outbox.claim
+    claim = models.CharField(max_length=32, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.template} to {self.to} ({self.status})"
+
+
+class RevokedToken(models.Model):
+    """
+    Durable store of revoked refresh tokens behind the per-process Bloom
+    filter in authentication.blacklist. Rows are pruned once `expires_at`
+    passes, an expired token is rejected on its own.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return self.jti
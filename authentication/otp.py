@@ -0,0 +1,85 @@
+"""
+Email verification codes kept in the Django cache, never in the database.
+
+issue_otp() stores a keyed hash of a random code under `otp:<email>` for
+OTP_TTL_SECONDS; verify_otp() checks a submitted code against it with a
+constant-time comparison. Every check increments `otp:attempts:<email>`
+first, and once OTP_MAX_ATTEMPTS is reached the code is dropped, so it cannot
+be brute forced within its TTL. Failed checks only touch the cache; a correct
+code activates the user with a single conditional UPDATE. The cache must be
+shared between workers (see checks.check_otp_cache_is_shared).
+"""
+import hashlib
+import hmac
+import secrets
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+VERIFIED = 'verified'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+LOCKED = 'locked'
+
+
+def normalize(email):
+    return get_user_model().objects.normalize_email(email)
+
+
+def code_key(email):
+    return f'otp:{normalize(email)}'
+
+
+def attempts_key(email):
+    return f'otp:attempts:{normalize(email)}'
+
+
+def resend_key(email):
+    return f'otp:resend:{normalize(email)}'
+
+
+def digest(email, code):
+    # bound to the address and SECRET_KEY, a cache dump does not reveal codes
+    message = f'{normalize(email)}:{code}'.encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def issue_otp(email):
+    """Store a new code for `email`, replacing any previous one, and return it."""
+    code = f'{secrets.randbelow(10 ** settings.OTP_LENGTH):0{settings.OTP_LENGTH}d}'
+    cache.set_many({code_key(email): digest(email, code), attempts_key(email): 0}, settings.OTP_TTL_SECONDS)
+    return code
+
+
+def can_resend(email):
+    """True at most once per OTP_RESEND_SECONDS for `email`."""
+    return cache.add(resend_key(email), 1, settings.OTP_RESEND_SECONDS)
+
+
+def check_otp(email, code):
+    """Check `code` against the stored one without touching the database."""
+    stored = cache.get(code_key(email))
+    if stored is None:
+        return EXPIRED
+    try:
+        attempts = cache.incr(attempts_key(email))
+    except ValueError:
+        # the counter expired between the two reads
+        return EXPIRED
+    if attempts > settings.OTP_MAX_ATTEMPTS:
+        cache.delete_many([code_key(email), attempts_key(email)])
+        return LOCKED
+    if not hmac.compare_digest(stored, digest(email, str(code))):
+        return INVALID
+    cache.delete_many([code_key(email), attempts_key(email)])
+    return VERIFIED
+
+
+def verify_otp(email, code):
+    """Check `code` and activate the matching inactive user when it is right."""
+    result = check_otp(email, code)
+    if result == VERIFIED:
+        # a repeated or concurrent verification matches no row
+        get_user_model().objects.filter(email=normalize(email), is_active=False).update(is_active=True)
+    return result
@@ -0,0 +1,103 @@
+"""
+Email outbox: enqueue_email() inside the request, send_due() in the worker.
+
+Workers claim due rows with a conditional UPDATE that stamps a random claim
+token and pushes `next_attempt_at` out by OUTBOX_LEASE_SECONDS, so several
+workers never send the same row, and a worker that dies mid-batch only delays
+its rows by the lease. One SMTP connection is opened per batch.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
+
+from authentication.models import OutboundEmail
+
+
+def enqueue_email(to, subject, template, context=None, using=None):
+    """Queue `template` for `to`. Call it inside the transaction making the change the email is about."""
+    return OutboundEmail.objects.using(using).create(to=to, subject=subject, template=template, context=context or {})
+
+
+def backoff(attempts):
+    """Seconds to wait before the next attempt after `attempts` failures."""
+    return min(settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.OUTBOX_RETRY_MAX_SECONDS)
+
+
+def claim(batch_size, now=None):
+    """Lease up to `batch_size` due emails to this worker and return them, oldest first."""
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    due = OutboundEmail.objects.filter(status=OutboundEmail.Status.PENDING, next_attempt_at__lte=now)
+    ids = list(due.order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    # rows another worker claimed in the meantime no longer match `due`
+    due.filter(id__in=ids).update(claim=token, next_attempt_at=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS))
+    return list(OutboundEmail.objects.filter(claim=token).order_by('id'))
+
+
+def render(email):
+    body = render_to_string(f'{email.template}.txt', email.context)
+    message = EmailMultiAlternatives(email.subject, body, settings.DEFAULT_FROM_EMAIL, [email.to])
+    try:
+        message.attach_alternative(get_template(f'{email.template}.html').render(email.context), 'text/html')
+    except TemplateDoesNotExist:
+        pass
+    return message
+
+
+def send_due(batch_size=None, connection=None):
+    """Send one batch of due emails. Returns `(sent, failed)` counts."""
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    emails = claim(batch_size)
+    if not emails:
+        return 0, 0
+
+    connection = connection or get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        # mail server unreachable, the whole batch backs off
+        for email in emails:
+            mark_failed(email, exc)
+        return 0, len(emails)
+
+    sent = failed = 0
+    try:
+        for email in emails:
+            try:
+                connection.send_messages([render(email)])
+            except Exception as exc:
+                failed += 1
+                mark_failed(email, exc)
+            else:
+                sent += 1
+                mark_sent(email)
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def mark_sent(email):
+    # the context can hold personal data, sent rows keep only the envelope
+    OutboundEmail.objects.filter(pk=email.pk, claim=email.claim).update(
+        status=OutboundEmail.Status.SENT, sent_at=timezone.now(), attempts=email.attempts + 1,
+        context={}, claim='', last_error='',
+    )
+
+
+def mark_failed(email, exc):
+    attempts = email.attempts + 1
+    exhausted = attempts >= settings.OUTBOX_MAX_ATTEMPTS
+    OutboundEmail.objects.filter(pk=email.pk, claim=email.claim).update(
+        status=OutboundEmail.Status.FAILED if exhausted else OutboundEmail.Status.PENDING,
+        attempts=attempts,
+        next_attempt_at=timezone.now() + timedelta(seconds=backoff(attempts)),
+        claim='',
+        last_error=f'{type(exc).__name__}: {exc}'[:2000],
+    )
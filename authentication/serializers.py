@@ -2,7 +2,16 @@ from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ObjectDoesNotExist
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from authentication.blacklist import RevocableRefreshToken
+from authentication.login import hashing, last_logins
+from authentication.otp import issue_otp
+from zippee_assessment.authentication import user_state
+from authentication.outbox import enqueue_email
 from authentication.utils import create_tokens_for_user
 User = get_user_model()
 
@@ -25,20 +34,32 @@ class RegisterSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         if attrs['password'] != attrs['password2']:
             raise serializers.ValidationError({"password": "Password fields didn't match."})
-        if User.objects.filter(email__iexact=attrs['email']).exists():
-            raise serializers.ValidationError({"email": "Email is already taken."})
         return attrs
 
     def create(self, validated_data):
-        user = User.objects.create(
-            email=validated_data['email'],
-            first_name=validated_data.get('first_name', ''),
-            last_name=validated_data.get('last_name', '')
+        # the unique indexes decide, a check before the insert would race another signup
+        try:
+            with transaction.atomic():
+                return self.insert(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({"email": ["Email is already taken."]})
+
+    def insert(self, validated_data):
+        user = User(
+            email=User.objects.normalize_email(validated_data['email']),
+            # CustomUser.save() only defaults first_name on updates
+            first_name=validated_data.get('first_name') or validated_data['email'].split('@')[0],
+            last_name=validated_data.get('last_name', ''),
+            # activated by VerifyOTPView
+            is_active=False,
             )
-        
-        
         user.set_password(validated_data['password'])
         user.save()
+        # sent by run_outbox_worker, the request does not wait on SMTP
+        enqueue_email(
+            user.email, 'Welcome to Zippee', 'authentication/email/registration',
+            {'email': user.email, 'first_name': user.first_name, 'otp': issue_otp(user.email)},
+        )
         return "User Created Successfully. Please Verify using OTP sent to your Email"
     
     def to_representation(self, instance):
@@ -61,13 +82,73 @@ class LoginSerializer(serializers.Serializer):
         password = data.get('password', None)
         if email and password:
             try:
-                user = User.objects.get(email__iexact=email)
+                user = User.objects.get(email=User.objects.normalize_email(email))
             except ObjectDoesNotExist:
                 raise serializers.ValidationError({"message": "User does not exist"})
-            if not user.check_password(password):
-                raise serializers.ValidationError({"message": "Invalid Password"})
-            token = create_tokens_for_user(user)
-            token['role'] = user.role
+            # raises LoginBusy when the hashing executor is saturated
+            token = self.issue(user, hashing.verify(user, password))
+            if api_settings.UPDATE_LAST_LOGIN:
+                last_logins.record(user.pk)
             return token
         else:
             raise serializers.ValidationError({"message": "Please provide email and password"})
+
+    @staticmethod
+    def issue(user, verified):
+        """Tokens for `user` once its password is `verified`, no I/O so async views can call it."""
+        if not verified:
+            raise serializers.ValidationError({"message": "Invalid Password"})
+        if not user.is_active:
+            raise serializers.ValidationError({"message": "Please verify your email using the OTP sent to you"})
+        token = create_tokens_for_user(user)
+        token['role'] = user.role
+        return token
+
+
+class VerifyOTPSerializer(serializers.Serializer):
+    email = serializers.EmailField(required=True)
+    otp = serializers.RegexField(r'^\d+$', max_length=12, required=True)
+
+
+class ResendOTPSerializer(serializers.Serializer):
+    email = serializers.EmailField(required=True)
+
+
+class RefreshSerializer(serializers.Serializer):
+    refresh = serializers.CharField(required=True, write_only=True)
+
+    def validate(self, data):
+        try:
+            refresh = RevocableRefreshToken(data['refresh'])
+        except TokenError:
+            raise serializers.ValidationError({"message": "Invalid or expired refresh token"})
+        # is_active/role from the cached user state, as for access tokens
+        state = user_state.get(refresh[api_settings.USER_ID_CLAIM])
+        if state is None or not state[0]:
+            raise serializers.ValidationError({"message": "No active account found for the given token"})
+        if state[1] != refresh.get('role'):
+            refresh['role'] = state[1]
+
+        token = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # the unique jti makes the revoke the gate, a replayed token loses the race
+            if api_settings.BLACKLIST_AFTER_ROTATION and not refresh.revoke():
+                raise serializers.ValidationError({"message": "Invalid or expired refresh token"})
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            token['refresh'] = str(refresh)
+        token['role'] = refresh['role']
+        return token
+
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField(required=True, write_only=True)
+
+    def validate(self, data):
+        try:
+            refresh = RevocableRefreshToken(data['refresh'])
+        except TokenError:
+            raise serializers.ValidationError({"message": "Invalid or expired refresh token"})
+        refresh.revoke()
+        return {"message": "Logged out successfully", "status": "success"}
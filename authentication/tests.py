@@ -0,0 +1,543 @@
+from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPException
+import threading
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.test import override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentication import otp, outbox
+from authentication.checks import check_otp_cache_is_shared
+from authentication.login import HashingExecutor, LoginBusy, hashing, last_logins
+from authentication.blacklist import BloomFilter, blacklist, bump_generation
+from authentication.models import OutboundEmail, RevokedToken
+from authentication.utils import create_tokens_for_user
+from authentication.views import LoginView, RefreshView, RegisterView, VerifyOTPView
+from zippee_assessment.middleware import query_budget
+from zippee_assessment.authentication import ClaimsJWTAuthentication, ClaimsUser, user_state
+
+User = get_user_model()
+
+
+class ClaimsJWTAuthenticationTestCase(APITestCase):
+    """Test cases for the claims-backed JWT authentication"""
+
+    def setUp(self):
+        user_state.forget()
+        self.user = User.objects.create_user(email='claims@test.com', password='testpass123')
+        self.access = create_tokens_for_user(self.user)['access']
+
+    def user_queries(self, method, url, token, **kwargs):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, format='json', **kwargs)
+        return response, [q['sql'] for q in queries if User._meta.db_table in q['sql']]
+
+    def test_write_is_authorized_from_claims(self):
+        """Test only the first request reads the user state, and only is_active/role"""
+        response, queries = self.user_queries('post', '/api/tasks/', self.access, data={'title': 'one'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('password', queries[0])
+
+        response, queries = self.user_queries('post', '/api/tasks/', self.access, data={'title': 'two'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(queries, [])
+
+    def test_request_user_carries_token_claims(self):
+        """Test the claims user exposes role and email for the permissions"""
+        user = ClaimsJWTAuthentication().get_user(AccessToken(self.access))
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual((user.id, user.role, user.email), (self.user.id, 'USER', 'claims@test.com'))
+        self.assertTrue(user.is_active)
+
+    def test_deactivated_user_is_rejected(self):
+        """Test deactivation applies once the cached state expires"""
+        self.user_queries('post', '/api/tasks/', self.access, data={'title': 'before'})
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        user_state.forget(self.user.pk)
+
+        response, _ = self.user_queries('post', '/api/tasks/', self.access, data={'title': 'after'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_role_comes_from_user_state(self):
+        """Test a role change is honoured without reissuing the token"""
+        User.objects.filter(pk=self.user.pk).update(role='MANAGER')
+        response, _ = self.user_queries('delete', '/api/tasks/99999/', self.access)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(JWT_USER_STATE_MAX_ENTRIES=2)
+    def test_user_state_is_bounded(self):
+        """Test the per-process state keeps the most recently used users only"""
+        others = [User.objects.create_user(email=f'claims{n}@test.com', password='testpass123') for n in range(2)]
+        user_state.get(self.user.pk)
+        user_state.get(others[0].pk)
+        user_state.get(self.user.pk)
+        user_state.get(others[1].pk)
+        self.assertEqual(list(user_state._entries), [str(self.user.pk), str(others[1].pk)])
+
+    def test_token_without_role_claim_loads_user(self):
+        """Test tokens issued without claims fall back to the database user"""
+        token = AccessToken.for_user(self.user)
+        response, queries = self.user_queries('post', '/api/tasks/', str(token), data={'title': 'plain'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('password', queries[0])
+
+
+@override_settings(QUERY_BUDGET_ENFORCE=True)
+class AuthenticationQueryBudgetTestCase(APITestCase):
+    """Test the authentication views stay within their declared query budgets"""
+
+    def test_register_budget(self):
+        """Test registration is the user insert and the outbox insert"""
+        response = self.client.post('/api/authentication/register/', {
+            'email': 'budget@test.com', 'password': 'Budget@12345', 'password2': 'Budget@12345',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertLessEqual(response.wsgi_request.query_stats.count, query_budget(RegisterView, 'POST'))
+
+    def test_verify_budget(self):
+        """Test a correct code is a single conditional UPDATE"""
+        cache.clear()
+        User.objects.create_user(email='verify-budget@test.com', password='testpass123', is_active=False)
+        code = otp.issue_otp('verify-budget@test.com')
+        response = self.client.post('/api/authentication/verify/', {'email': 'verify-budget@test.com', 'otp': code}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(response.wsgi_request.query_stats.count, query_budget(VerifyOTPView, 'POST'))
+
+    def test_refresh_budget(self):
+        """Test a refresh is the user state and the revoke insert, without a blacklist lookup"""
+        cache.clear()
+        # loaded once per process
+        blacklist.sync()
+        user = User.objects.create_user(email='refresh-budget@test.com', password='testpass123')
+        response = self.client.post('/api/authentication/refresh/', {'refresh': create_tokens_for_user(user)['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(response.wsgi_request.query_stats.count, query_budget(RefreshView, 'POST'))
+
+    def test_login_budget(self):
+        """Test login is a single user lookup"""
+        User.objects.create_user(email='login-budget@test.com', password='testpass123')
+        response = self.client.post('/api/authentication/login/', {
+            'email': 'login-budget@test.com', 'password': 'testpass123',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(response.wsgi_request.query_stats.count, query_budget(LoginView, 'POST'))
+
+
+@override_settings(OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_BASE_SECONDS=30)
+class EmailOutboxTestCase(APITestCase):
+    """Test cases for the email outbox and its worker"""
+
+    def register(self, email='outbox@test.com'):
+        return self.client.post('/api/authentication/register/', {
+            'email': email, 'password': 'Outbox@12345', 'password2': 'Outbox@12345', 'first_name': 'Ada',
+        }, format='json')
+
+    def test_registration_only_enqueues(self):
+        """Test registering queues the email instead of sending it in the request"""
+        response = self.register()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(mail.outbox, [])
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.to, email.status, email.context['first_name']), ('outbox@test.com', 'PENDING', 'Ada'))
+
+    def test_worker_sends_rendered_batches(self):
+        """Test the worker renders text and HTML bodies and marks rows sent"""
+        for n in range(3):
+            self.register(f'outbox{n}@test.com')
+        self.assertEqual(outbox.send_due(batch_size=2), (2, 0))
+        self.assertEqual(outbox.send_due(batch_size=2), (1, 0))
+        self.assertEqual(outbox.send_due(batch_size=2), (0, 0))
+
+        self.assertEqual([message.to for message in mail.outbox], [[f'outbox{n}@test.com'] for n in range(3)])
+        self.assertIn('Hi Ada', mail.outbox[0].body)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        sent = OutboundEmail.objects.get(to='outbox0@test.com')
+        self.assertEqual((sent.status, sent.attempts, sent.context), ('SENT', 1, {}))
+        self.assertIsNotNone(sent.sent_at)
+
+    def test_failures_back_off_then_give_up(self):
+        """Test failed sends are retried with exponential backoff until OUTBOX_MAX_ATTEMPTS"""
+        email = outbox.enqueue_email('retry@test.com', 'Retry', 'authentication/email/registration', {'email': 'retry@test.com'})
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=SMTPException('down')):
+            for attempt in range(1, 4):
+                started = timezone.now()
+                self.assertEqual(outbox.send_due(), (0, 1))
+                email.refresh_from_db()
+                self.assertEqual((email.attempts, email.last_error), (attempt, 'SMTPException: down'))
+                self.assertGreaterEqual(email.next_attempt_at, started + timedelta(seconds=30 * 2 ** (attempt - 1)))
+                # not due again until the backoff has passed
+                self.assertEqual(outbox.send_due(), (0, 0))
+                OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(email.status, 'FAILED')
+        self.assertEqual(outbox.send_due(), (0, 0))
+
+    def test_claimed_rows_are_not_sent_twice(self):
+        """Test a second worker skips rows leased to the first"""
+        outbox.enqueue_email('lease@test.com', 'Lease', 'authentication/email/registration', {'email': 'lease@test.com'})
+        claimed = outbox.claim(10)
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(outbox.claim(10), [])
+
+    def test_command_once(self):
+        """Test run_outbox_worker --once drains what is due and exits"""
+        self.register()
+        call_command('run_outbox_worker', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(OutboundEmail.objects.get().status, 'SENT')
+
+
+@override_settings(OTP_MAX_ATTEMPTS=3)
+class OTPVerificationTestCase(APITestCase):
+    """Test cases for cache-backed email verification"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.post('/api/authentication/register/', {
+            'email': 'otp@test.com', 'password': 'Verify@12345', 'password2': 'Verify@12345',
+        }, format='json')
+        self.code = OutboundEmail.objects.get().context['otp']
+
+    def verify(self, code, email='otp@test.com'):
+        return self.client.post('/api/authentication/verify/', {'email': email, 'otp': code}, format='json')
+
+    def login(self):
+        return self.client.post('/api/authentication/login/', {'email': 'otp@test.com', 'password': 'Verify@12345'}, format='json')
+
+    def wrong(self):
+        return f'{(int(self.code) + 1) % 10 ** 6:06d}'
+
+    def test_registration_needs_verification(self):
+        """Test a new user cannot log in until the emailed code is verified"""
+        self.assertFalse(User.objects.get(email='otp@test.com').is_active)
+        self.assertEqual(len(self.code), 6)
+        self.assertEqual(self.login().status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.verify(self.code)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(User.objects.get(email='otp@test.com').is_active)
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    def test_codes_are_single_use(self):
+        """Test a verified code cannot be replayed"""
+        self.assertEqual(self.verify(self.code).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.verify(self.code).json()['message'], 'Invalid or expired OTP')
+
+    def test_failures_do_not_query(self):
+        """Test wrong, unknown and throttled codes are answered from the cache alone"""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.verify(self.wrong()).status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(self.verify('123456', email='nobody@test.com').status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(self.verify('abc').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(queries), 0)
+
+    def test_attempts_are_limited(self):
+        """Test the code is dropped after OTP_MAX_ATTEMPTS guesses"""
+        for _ in range(3):
+            self.assertEqual(self.verify(self.wrong()).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.verify(self.code).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.verify(self.code).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(User.objects.get(email='otp@test.com').is_active)
+
+    def test_expired_code(self):
+        """Test a code is gone once its TTL has passed"""
+        cache.delete(otp.code_key('otp@test.com'))
+        self.assertEqual(self.verify(self.code).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_codes_are_hashed(self):
+        """Test the cache holds a digest, not the code"""
+        stored = cache.get(otp.code_key('OTP@test.com'))
+        self.assertNotIn(self.code, stored)
+        self.assertEqual(otp.check_otp('OTP@Test.com', self.code), otp.VERIFIED)
+
+    def test_resend(self):
+        """Test resending replaces the code and is rate limited per address"""
+        response = self.client.post('/api/authentication/verify/resend/', {'email': 'otp@test.com'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        code = OutboundEmail.objects.get(template='authentication/email/otp').context['otp']
+        if code != self.code:
+            self.assertEqual(self.verify(self.code).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.verify(code).status_code, status.HTTP_200_OK)
+
+        response = self.client.post('/api/authentication/verify/resend/', {'email': 'otp@test.com'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_resend_does_not_reveal_accounts(self):
+        """Test unknown and active addresses get the same answer and no email"""
+        response = self.client.post('/api/authentication/verify/resend/', {'email': 'nobody@test.com'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+    def test_per_process_cache_is_flagged_for_deployment(self):
+        """Test codes on LocMemCache raise a deploy check warning and a shared cache does not"""
+        self.assertEqual([warning.id for warning in check_otp_cache_is_shared(None)], ['authentication.W001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_otp_cache_is_shared(None), [])
+
+
+class EmailNormalizationTestCase(APITestCase):
+    """Test cases for lowercased email storage and its case-insensitive unique index"""
+
+    def register(self, email):
+        return self.client.post('/api/authentication/register/', {
+            'email': email, 'password': 'Casing@12345', 'password2': 'Casing@12345',
+        }, format='json')
+
+    def test_emails_are_stored_lowercased(self):
+        """Test every way of creating a user stores the normalized email"""
+        self.register(' Mixed@Test.COM')
+        user = User.objects.create_user(email='Manager@Test.com', password='testpass123')
+        self.assertTrue(User.objects.filter(email='mixed@test.com').exists())
+        self.assertEqual(user.email, 'manager@test.com')
+
+    def test_duplicate_in_another_case_is_rejected(self):
+        """Test the insert itself reports a duplicate address"""
+        self.assertEqual(self.register('dup@test.com').status_code, status.HTTP_201_CREATED)
+        response = self.register('DUP@test.com')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'email': ['Email is already taken.']})
+        self.assertEqual(User.objects.count(), 1)
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+    def test_functional_index_rejects_mixed_case_writes(self):
+        """Test writes that bypass save() still cannot create a case-insensitive duplicate"""
+        User.objects.create_user(email='one@test.com', password='testpass123')
+        other = User.objects.create_user(email='two@test.com', password='testpass123')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.filter(pk=other.pk).update(email='ONE@test.com')
+
+    def test_login_is_an_exact_lookup(self):
+        """Test login matches any casing with an equality on the email column"""
+        User.objects.create_user(email='login@test.com', password='testpass123')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/authentication/login/', {
+                'email': 'LOGIN@Test.com', 'password': 'testpass123',
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sql = queries[0]['sql']
+        self.assertIn('"email" = ', sql)
+        self.assertNotIn('LIKE', sql)
+
+
+class RefreshTokenBlacklistTestCase(APITestCase):
+    """Test cases for refresh rotation and logout through the Bloom filter blacklist"""
+
+    def setUp(self):
+        cache.clear()
+        blacklist.forget()
+        user_state.forget()
+        self.user = User.objects.create_user(email='refresh@test.com', password='testpass123')
+        self.refresh = create_tokens_for_user(self.user)['refresh']
+
+    def post(self, url, refresh):
+        return self.client.post(f'/api/authentication/{url}/', {'refresh': refresh}, format='json')
+
+    def test_refresh_rotates(self):
+        """Test refreshing returns a working access token and revokes the old refresh token"""
+        response = self.post('refresh', self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['role'], 'USER')
+        self.assertNotEqual(data['refresh'], self.refresh)
+        self.assertTrue(RevokedToken.objects.exists())
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {data['access']}")
+        self.assertEqual(self.client.post('/api/tasks/', {'title': 'fresh'}, format='json').status_code, status.HTTP_201_CREATED)
+        self.client.credentials()
+
+        # the old token cannot be replayed, the new one works once
+        self.assertEqual(self.post('refresh', self.refresh).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post('refresh', data['refresh']).status_code, status.HTTP_200_OK)
+
+    def test_unrevoked_tokens_skip_the_table(self):
+        """Test the filter answers for tokens it has never seen"""
+        blacklist.sync()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(blacklist.is_revoked('never-revoked'))
+        self.assertEqual(len(queries), 0)
+
+    def test_logout_revokes(self):
+        """Test logout revokes the refresh token and is idempotent"""
+        response = self.post('logout', self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.post('refresh', self.refresh).json(), {'message': ['Invalid or expired refresh token']})
+        self.assertEqual(self.post('logout', 'garbage').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_processes_sync_through_the_generation(self):
+        """Test a revocation recorded elsewhere reaches a filter built before it"""
+        blacklist.sync()
+        RevokedToken.objects.create(jti='elsewhere', expires_at=timezone.now() + timedelta(days=1))
+        self.assertFalse(blacklist.is_revoked('elsewhere'))
+        bump_generation()
+        self.assertTrue(blacklist.is_revoked('elsewhere'))
+
+    @override_settings(JWT_BLACKLIST_SYNC_SECONDS=0)
+    def test_stale_filters_sync_without_the_generation(self):
+        """Test a revocation whose generation bump never arrives (per-process cache) still reaches the filter"""
+        blacklist.sync()
+        RevokedToken.objects.create(jti='other-worker', expires_at=timezone.now() + timedelta(days=1))
+        self.assertTrue(blacklist.is_revoked('other-worker'))
+
+    def test_deactivated_user_cannot_refresh(self):
+        """Test refresh honours is_active from the user state"""
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.post('refresh', self.refresh).status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(JWT_BLACKLIST_PRUNE_SECONDS=60)
+    def test_expired_rows_are_pruned(self):
+        """Test revoking deletes rows whose tokens have expired, once per interval"""
+        RevokedToken.objects.create(jti='expired', expires_at=timezone.now() - timedelta(seconds=1))
+        self.post('logout', self.refresh)
+        self.assertFalse(RevokedToken.objects.filter(jti='expired').exists())
+        RevokedToken.objects.create(jti='expired', expires_at=timezone.now() - timedelta(seconds=1))
+        self.post('logout', create_tokens_for_user(self.user)['refresh'])
+        self.assertTrue(RevokedToken.objects.filter(jti='expired').exists())
+
+    def test_bloom_filter(self):
+        """Test the filter has no false negatives and roughly its configured false positive rate"""
+        bloom = BloomFilter(1000, 0.01)
+        for n in range(1000):
+            bloom.add(f'revoked-{n}')
+        self.assertTrue(all(f'revoked-{n}' in bloom for n in range(1000)))
+        false_positives = sum(f'other-{n}' in bloom for n in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_resync_overlap_does_not_fill_the_filter(self):
+        """Test rows re-read inside SYNC_OVERLAP are not counted again, so the filter is not rebuilt"""
+        blacklist.forget()
+        RevokedToken.objects.create(jti='revoked', expires_at=timezone.now() + timedelta(days=1))
+        blacklist.sync()
+        bloom = blacklist.filter
+        for _ in range(3):
+            blacklist.synced_at -= timedelta(seconds=settings.JWT_BLACKLIST_SYNC_SECONDS + 1)
+            blacklist.sync()
+        self.assertIs(blacklist.filter, bloom)
+        self.assertEqual(bloom.count, 1)
+
+
+@override_settings(LOGIN_FLUSH_SECONDS=3600)
+class LoginThroughputTestCase(APITestCase):
+    """Test cases for the login hashing executor and batched last_login writes"""
+
+    def setUp(self):
+        last_logins.forget()
+        self.user = User.objects.create_user(email='storm@test.com', password='testpass123')
+
+    def login(self, url='login', password='testpass123'):
+        return self.client.post(f'/api/authentication/{url}/', {'email': 'storm@test.com', 'password': password}, format='json')
+
+    def test_login_hashes_on_the_executor(self):
+        """Test the password check runs on the login-hash threads"""
+        completed = hashing.stats()['completed']
+        with patch('authentication.login.check_password', side_effect=lambda *args: threading.current_thread().name.startswith('login-hash')):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.assertEqual(hashing.stats()['completed'], completed + 1)
+        self.assertEqual(self.login(password='wrong').json(), {'message': ['Invalid Password']})
+
+    @override_settings(LOGIN_HASH_WORKERS=1, LOGIN_HASH_QUEUE=1)
+    def test_saturated_executor_rejects(self):
+        """Test submissions past workers + queue fail fast and are counted"""
+        executor, release = HashingExecutor(), threading.Event()
+        futures = [executor.submit(release.wait) for _ in range(2)]
+        with self.assertRaises(LoginBusy):
+            executor.submit(release.wait)
+        self.assertEqual({k: executor.stats()[k] for k in ('in_flight', 'queued', 'rejected')}, {'in_flight': 2, 'queued': 1, 'rejected': 1})
+        release.set()
+        for future in futures:
+            future.result()
+        self.assertEqual(executor.stats()['in_flight'], 0)
+
+    def test_busy_login_answers_503(self):
+        """Test a saturated executor turns logins away with Retry-After"""
+        with patch.object(hashing, 'submit', side_effect=LoginBusy):
+            response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_last_login_is_batched(self):
+        """Test logins only buffer last_login, and one UPDATE writes the batch"""
+        other = User.objects.create_user(email='storm2@test.com', password='testpass123')
+        with CaptureQueriesContext(connection) as queries:
+            self.login()
+            self.client.post('/api/authentication/login/', {'email': 'storm2@test.com', 'password': 'testpass123'}, format='json')
+        self.assertFalse(any(q['sql'].startswith('UPDATE') for q in queries))
+        self.assertIsNone(User.objects.get(pk=self.user.pk).last_login)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(last_logins.flush(), 2)
+        self.assertEqual(len(queries), 1)
+        self.assertIsNotNone(User.objects.get(pk=self.user.pk).last_login)
+        self.assertIsNotNone(User.objects.get(pk=other.pk).last_login)
+
+    def test_failed_flush_keeps_the_batch(self):
+        """Test a flush the database refuses is logged, kept for the next flush and does not fail the login"""
+        last_logins.record(self.user.pk)
+        last_logins.due = 0
+        with patch.object(last_logins, 'write', side_effect=OperationalError('database is locked')), \
+                self.assertLogs('authentication.login', 'ERROR'):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.assertIn(self.user.pk, last_logins.logins)
+        self.assertIsNone(User.objects.get(pk=self.user.pk).last_login)
+
+        self.assertEqual(last_logins.flush(), 1)
+        self.assertIsNotNone(User.objects.get(pk=self.user.pk).last_login)
+
+    def test_timer_flushes_once_logins_stop(self):
+        """Test a buffered login is written by the timer without another login coming due"""
+        written = threading.Event()
+        # the write queue's own transaction would wait on the test's open one
+        with override_settings(LOGIN_FLUSH_SECONDS=0.05), \
+                patch('authentication.login.write_queue.run', side_effect=lambda func, *args: func(*args)), \
+                patch.object(last_logins, 'write', side_effect=lambda *args: written.set()) as write:
+            last_logins.forget()
+            last_logins.record(self.user.pk)
+            self.assertTrue(written.wait(5))
+        self.assertEqual(list(write.call_args.args[0]), [self.user.pk])
+        self.assertEqual(last_logins.logins, {})
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher',
+    ])
+    def test_outdated_hash_is_upgraded_off_the_request(self):
+        """Test a login with a legacy hash succeeds without writing, then the rehash lands with the flush"""
+        User.objects.filter(pk=self.user.pk).update(password=make_password('testpass123', hasher='md5'))
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.assertTrue(User.objects.get(pk=self.user.pk).password.startswith('md5$'))
+
+        # the rehash runs on the executor after the response
+        for _ in range(200):
+            if self.user.pk in last_logins.passwords:
+                break
+            threading.Event().wait(0.01)
+        last_logins.flush()
+        password = User.objects.get(pk=self.user.pk).password
+        self.assertTrue(password.startswith('pbkdf2_sha256$'))
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    async def test_async_login(self):
+        """Test the async view issues the same tokens and errors"""
+        response = await self.async_client.post('/api/authentication/async/login/', {'email': 'STORM@test.com', 'password': 'testpass123'}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.json()), {'access', 'refresh', 'role'})
+
+        response = await self.async_client.post('/api/authentication/async/login/', {'email': 'storm@test.com', 'password': 'wrong'}, content_type='application/json')
+        self.assertEqual(response.json(), {'message': ['Invalid Password']})
+        response = await self.async_client.post('/api/authentication/async/login/', {}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(self.user.pk, await sync_to_async(lambda: dict(last_logins.logins))())
@@ -1,9 +1,15 @@
 from django.urls import path
-from .views import RegisterView, LoginView
+from .async_views import AsyncLoginView
+from .views import RegisterView, LoginView, LogoutView, RefreshView, ResendOTPView, VerifyOTPView
 
 
 
 urlpatterns =  [
     path('register/', RegisterView.as_view(), name='auth_register'),
-    path('login/', LoginView.as_view(), name='auth_login')
+    path('login/', LoginView.as_view(), name='auth_login'),
+    path('async/login/', AsyncLoginView.as_view(), name='auth_async_login'),
+    path('refresh/', RefreshView.as_view(), name='auth_refresh'),
+    path('logout/', LogoutView.as_view(), name='auth_logout'),
+    path('verify/', VerifyOTPView.as_view(), name='auth_verify'),
+    path('verify/resend/', ResendOTPView.as_view(), name='auth_verify_resend'),
 ]
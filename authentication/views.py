@@ -4,7 +4,14 @@ from rest_framework.permissions import AllowAny
 from rest_framework import status, mixins
 from rest_framework.response import Response
 
-from authentication.serializers import LoginSerializer, RegisterSerializer
+from django.db import transaction
+
+from authentication import otp
+from authentication.login import LoginBusy
+from authentication.outbox import enqueue_email
+from authentication.serializers import (
+    LoginSerializer, LogoutSerializer, RefreshSerializer, RegisterSerializer, ResendOTPSerializer, VerifyOTPSerializer,
+)
 User = get_user_model()
 
 
@@ -12,16 +19,102 @@ class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = (AllowAny,)
     serializer_class = RegisterSerializer
+    # user and outbox inserts in one transaction (savepoint in tests)
+    query_budget = 4
 
 
 class LoginView(mixins.CreateModelMixin, generics.GenericAPIView):
     queryset = User.objects.all()
     permission_classes = (AllowAny,)
     serializer_class = LoginSerializer
+    # user lookup, plus the batched last_login UPDATE when it comes due
+    query_budget = 2
 
     def post(self, request, *args, **kwargs):
         if not request.data.get('email') or not request.data.get('password'):
             return Response({"message": "Invalid operation. Please provide email and password"}, status=status.HTTP_400_BAD_REQUEST)
         serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except LoginBusy:
+            return login_busy()
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
+
+
+def login_busy():
+    return Response(
+        {"message": "Too many logins in progress. Please try again shortly"},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'},
+    )
+
+
+class RefreshView(generics.GenericAPIView):
+    """
+    Exchanges a refresh token for a new access token and, with
+    ROTATE_REFRESH_TOKENS, a new refresh token while revoking the old one.
+    """
+    permission_classes = (AllowAny,)
+    authentication_classes = ()
+    serializer_class = RefreshSerializer
+    # blacklist load (once per process), user state (cached), the revoke
+    # insert in a savepoint, the hourly prune
+    query_budget = 6
+
+    def post(self, request, *args, **kwargs):
+        if not request.data.get('refresh'):
+            return Response({"message": "Invalid operation. Please provide refresh"}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        return Response(serializer.validated_data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
+
+
+class LogoutView(RefreshView):
+    serializer_class = LogoutSerializer
+    query_budget = 5
+
+
+class VerifyOTPView(generics.GenericAPIView):
+    """
+    Activates a registered user. Wrong, expired and throttled codes are
+    answered from the cache alone; only a correct code runs a query.
+    """
+    permission_classes = (AllowAny,)
+    authentication_classes = ()
+    serializer_class = VerifyOTPSerializer
+    query_budget = 1
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({"message": "Invalid operation. Please provide email and otp"}, status=status.HTTP_400_BAD_REQUEST)
+        result = otp.verify_otp(serializer.validated_data['email'], serializer.validated_data['otp'])
+        if result == otp.VERIFIED:
+            return Response({"message": "Email verified successfully", "status": "success"}, status=status.HTTP_200_OK)
+        if result == otp.LOCKED:
+            return Response({"message": "Too many attempts. Please request a new OTP"}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        return Response({"message": "Invalid or expired OTP"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ResendOTPView(generics.GenericAPIView):
+    permission_classes = (AllowAny,)
+    authentication_classes = ()
+    serializer_class = ResendOTPSerializer
+    # user lookup, then the outbox insert in a transaction (savepoint in tests)
+    query_budget = 4
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({"message": "Invalid operation. Please provide email"}, status=status.HTTP_400_BAD_REQUEST)
+        email = serializer.validated_data['email']
+        if not otp.can_resend(email):
+            return Response({"message": "Please wait before requesting another OTP"}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        user = User.objects.filter(email=User.objects.normalize_email(email), is_active=False).only('email', 'first_name').first()
+        # same answer whether or not the address is pending, it does not reveal accounts
+        if user is not None:
+            with transaction.atomic():
+                enqueue_email(
+                    user.email, 'Your Zippee verification code', 'authentication/email/otp',
+                    {'email': user.email, 'first_name': user.first_name, 'otp': otp.issue_otp(user.email)},
+                )
+        return Response({"message": "If the account is awaiting verification, a new OTP has been sent", "status": "success"}, status=status.HTTP_200_OK)
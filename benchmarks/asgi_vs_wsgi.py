@@ -0,0 +1,117 @@
+"""
+Compare the task list/detail endpoints under concurrency:
+
+* wsgi-sync:  TaskView through the WSGI handler, one thread per in-flight client
+* asgi-sync:  TaskView through the ASGI handler (each request hops to a thread)
+* asgi-async: AsyncTaskView through the ASGI handler, on the event loop
+
+Usage:
+    python -m benchmarks.asgi_vs_wsgi --tasks 5000 --requests 2000 --concurrency 200
+
+Prints one JSON object per run with latency percentiles (ms) and requests/s.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.test import AsyncClient, Client  # noqa: E402
+
+from benchmarks.seed import seed  # noqa: E402
+from tasks.models import Task  # noqa: E402
+
+SCENARIOS = {
+    'list': '{prefix}tasks/?completed=false',
+    'search': '{prefix}tasks/?search=task',
+    'detail': '{prefix}tasks/{id}/',
+}
+
+
+def summarise(mode, scenario, latencies, elapsed, errors):
+    latencies.sort()
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+
+    return {
+        'mode': mode,
+        'scenario': scenario,
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+    }
+
+
+def urls(scenario, prefix, ids, total):
+    return [SCENARIOS[scenario].format(prefix=prefix, id=ids[n % len(ids)]) for n in range(total)]
+
+
+def run_wsgi(scenario, ids, total, concurrency):
+    client = Client()
+    errors = 0
+
+    def fetch(url):
+        started = time.perf_counter()
+        response = client.get(url)
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, urls(scenario, '/api/', ids, total)))
+    elapsed = time.perf_counter() - started
+    errors = sum(1 for _, code in results if code != 200)
+    return summarise('wsgi-sync', scenario, [latency for latency, _ in results], elapsed, errors)
+
+
+async def run_asgi(mode, prefix, scenario, ids, total, concurrency):
+    client = AsyncClient()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(url):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(url)
+            return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(fetch(url) for url in urls(scenario, prefix, ids, total)))
+    elapsed = time.perf_counter() - started
+    errors = sum(1 for _, code in results if code != 200)
+    return summarise(mode, scenario, [latency for latency, _ in results], elapsed, errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--tasks', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--scenario', choices=SCENARIOS, action='append')
+    args = parser.parse_args()
+
+    seed(args.tasks)
+    ids = list(Task.objects.values_list('id', flat=True)[:100])
+    for scenario in args.scenario or list(SCENARIOS):
+        results = [
+            run_wsgi(scenario, ids, args.requests, args.concurrency),
+            asyncio.run(run_asgi('asgi-sync', '/api/', scenario, ids, args.requests, args.concurrency)),
+            asyncio.run(run_asgi('asgi-async', '/api/async/', scenario, ids, args.requests, args.concurrency)),
+        ]
+        for result in results:
+            print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
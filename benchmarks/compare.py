@@ -0,0 +1,60 @@
+"""
+Diff two benchmarks.load reports.
+
+Usage:
+    python -m benchmarks.compare before.json after.json [--threshold 10]
+
+Exits with status 1 when a scenario's p95 latency or queries per request got
+worse by more than --threshold percent.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request')
+# lower is better for everything but throughput
+HIGHER_IS_BETTER = {'rps'}
+GATED = ('p95_ms', 'queries_per_request')
+
+
+def change(before, after):
+    if not before:
+        return 0.0 if not after else float('inf')
+    return (after - before) / before * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10.0)
+    args = parser.parse_args()
+
+    with open(args.before) as handle:
+        before = json.load(handle)
+    with open(args.after) as handle:
+        after = json.load(handle)
+
+    print(f"{before['meta'].get('commit')} -> {after['meta'].get('commit')}")
+    regressed = []
+    for name, new in after['scenarios'].items():
+        old = before['scenarios'].get(name)
+        if old is None:
+            print(f'{name}: new scenario')
+            continue
+        cells = []
+        for metric in METRICS:
+            delta = change(old[metric], new[metric])
+            cells.append(f'{metric} {old[metric]} -> {new[metric]} ({delta:+.1f}%)')
+            worse = -delta if metric in HIGHER_IS_BETTER else delta
+            if metric in GATED and worse > args.threshold:
+                regressed.append(f'{name}.{metric}')
+        print(f'{name}: ' + ', '.join(cells))
+
+    if regressed:
+        print('regressed: ' + ', '.join(regressed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
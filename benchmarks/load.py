@@ -0,0 +1,162 @@
+"""
+Concurrent load test of the API flows in zippee.postman_collection.json.
+
+Usage:
+    python -m benchmarks.load --size small --requests 500 --concurrency 32 --output before.json
+    python -m benchmarks.compare before.json after.json
+
+Each scenario is run on its own against a seeded database. The JSON report has
+p50/p95/p99 latency (ms), requests/s, queries per request and error counts per
+scenario, plus the commit and dataset it was measured on.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from authentication.utils import create_tokens_for_user  # noqa: E402
+from benchmarks import scenarios as scenario_module  # noqa: E402
+from benchmarks.seed import PASSWORD, SIZES, seed, user_email  # noqa: E402
+from tasks.bulk import create_tasks  # noqa: E402
+from tasks.models import Task  # noqa: E402
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def summarise(results, elapsed):
+    latencies = sorted(latency for latency, _, _ in results)
+    queries = [count for _, count, _ in results]
+    return {
+        'requests': len(results),
+        'errors': sum(1 for _, _, code in results if code >= 400),
+        'rps': round(len(results) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+        'queries_per_request': round(statistics.fmean(queries), 2),
+        'max_queries': max(queries),
+    }
+
+
+class Runner:
+    def __init__(self, users, concurrency):
+        User = get_user_model()
+        self.concurrency = concurrency
+        self.login_emails = [user_email(User.Role.USER, n) for n in range(users)]
+        self.headers = {
+            role: {'Authorization': f"Bearer {create_tokens_for_user(User.objects.get(email=user_email(role, 0)))['access']}"}
+            for role in (User.Role.USER, User.Role.MANAGER)
+        }
+        self.read_ids = list(Task.objects.order_by('-id').values_list('id', flat=True)[:1000])
+        self.local = threading.local()
+
+    def client(self):
+        if not hasattr(self.local, 'client'):
+            # a crashing view is counted as a 500, not raised into the worker
+            self.local.client = Client(raise_request_exception=False)
+        return self.local.client
+
+    def task_ids(self, scenario, total):
+        if not scenario.consumes_task:
+            return [self.read_ids[n % len(self.read_ids)] for n in range(total)]
+        # fresh rows so deletes never hit a 404 and the read set stays intact
+        tasks = create_tasks([Task(title=f'disposable {n}') for n in range(total)])
+        return [task.id for task in tasks]
+
+    def request(self, scenario, n, task_id):
+        body = scenario.body
+        if scenario.name == 'login':
+            body = {'email': self.login_emails[n % len(self.login_emails)], 'password': PASSWORD}
+        headers = self.headers.get(scenario.role, {})
+
+        started = time.perf_counter()
+        response = self.client().generic(
+            scenario.method, scenario.url(task_id),
+            json.dumps(body) if body else '', content_type='application/json', headers=headers,
+        )
+        elapsed = time.perf_counter() - started
+        # QueryCountMiddleware's count follows the request into the write queue's
+        # thread, a connection wrapper here would only see this thread's queries
+        return elapsed, response.wsgi_request.query_stats.count, response.status_code
+
+    def run(self, scenario, total):
+        ids = self.task_ids(scenario, total)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            results = list(pool.map(lambda n: self.request(scenario, n, ids[n]), range(total)))
+        return summarise(results, time.perf_counter() - started)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', choices=SIZES, default='small', help='Seeded task count preset')
+    parser.add_argument('--tasks', type=int, help='Seeded task count, overrides --size')
+    parser.add_argument('--users', type=int, default=20, help='Seeded USER accounts')
+    parser.add_argument('--managers', type=int, default=2)
+    parser.add_argument('--admins', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=500, help='Requests per scenario')
+    parser.add_argument('--login-requests', type=int, default=50, help='Requests for the login scenario (password hashing bound)')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--scenario', action='append', help='Only run these scenarios (repeatable)')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    tasks = args.tasks if args.tasks is not None else SIZES[args.size]
+    seed(tasks, users=args.users, managers=args.managers, admins=args.admins)
+
+    runner = Runner(args.users, args.concurrency)
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'tasks': tasks,
+            'users': {'USER': args.users, 'MANAGER': args.managers, 'ADMIN': args.admins},
+            'concurrency': args.concurrency,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        },
+        'scenarios': {},
+    }
+    for scenario in scenario_module.load():
+        if args.scenario and scenario.name not in args.scenario:
+            continue
+        total = args.login_requests if scenario.name == 'login' else args.requests
+        report['scenarios'][scenario.name] = runner.run(scenario, total)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Login storm benchmark for the hashing executor and batched last_login.
+
+Each mode runs in its own process on a fresh SQLite file, with many clients
+logging in at once as the seeded users:
+
+* unbounded: LoginView with as many hashing workers as clients, every
+             request hashes as soon as it arrives (the old behaviour)
+* bounded:   LoginView with LOGIN_HASH_WORKERS (default: one per core)
+* async:     AsyncLoginView through the ASGI handler, same executor
+
+Usage:
+    python -m benchmarks.logins [--clients 64] [--logins 20] [--mode bounded --mode async]
+
+Prints one JSON object per mode: logins/s, logins/s per core, latency
+percentiles, 503s from a full queue, and the executor's queue metrics.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MODES = ('unbounded', 'bounded', 'async')
+
+
+def percentile(values, p):
+    return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 2) if values else None
+
+
+def bench(mode, clients, logins):
+    """Runs inside the per-mode process, DJANGO_SETTINGS_MODULE and the mode's env are set."""
+    import django
+
+    django.setup()
+
+    from django.db import connections
+    from django.test import AsyncClient, Client
+
+    from authentication.login import hashing, last_logins
+    from benchmarks.seed import PASSWORD, seed, user_email
+
+    seed(0, users=clients, managers=0, admins=0)
+    payloads = [{'email': user_email('USER', n), 'password': PASSWORD} for n in range(clients)]
+
+    if mode == 'async':
+        async def storm():
+            client = AsyncClient()
+
+            async def worker(n):
+                latencies, failed = [], 0
+                for _ in range(logins):
+                    began = time.perf_counter()
+                    response = await client.post('/api/authentication/async/login/', payloads[n], content_type='application/json')
+                    latencies.append(time.perf_counter() - began)
+                    failed += response.status_code != 200
+                return latencies, failed
+
+            return await asyncio.gather(*(worker(n) for n in range(clients)))
+
+        began = time.perf_counter()
+        results = asyncio.run(storm())
+    else:
+        local = threading.local()
+        start = threading.Barrier(clients)
+
+        def worker(n):
+            local.client = Client(raise_request_exception=False)
+            latencies, failed = [], 0
+            start.wait()
+            for _ in range(logins):
+                began = time.perf_counter()
+                response = local.client.post('/api/authentication/login/', payloads[n], content_type='application/json')
+                latencies.append(time.perf_counter() - began)
+                failed += response.status_code != 200
+            connections.close_all()
+            return latencies, failed
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(clients) as pool:
+            results = list(pool.map(worker, range(clients)))
+    elapsed = time.perf_counter() - began
+    last_logins.flush()
+
+    latencies = sorted(latency for result, _ in results for latency in result)
+    failed = sum(failed for _, failed in results)
+    logins_per_s = (len(latencies) - failed) / elapsed
+    cores = os.cpu_count() or 1
+    return {
+        'mode': mode,
+        'clients': clients,
+        'cores': cores,
+        'logins': len(latencies),
+        'failed': failed,
+        'logins_per_s': round(logins_per_s, 1),
+        'logins_per_s_per_core': round(logins_per_s / cores, 1),
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'hashing': hashing.stats(),
+        'last_login_flushes': last_logins.flushes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--logins', type=int, default=20, help='Logins per client')
+    parser.add_argument('--mode', action='append', choices=MODES)
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(bench(args.run, args.clients, args.logins)))
+        return
+
+    for mode in args.mode or MODES:
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                'DJANGO_SETTINGS_MODULE': 'benchmarks.settings',
+                'BENCHMARK_DB': os.path.join(directory, 'logins.sqlite3'),
+                # clients that cannot get a worker wait rather than get a 503
+                'LOGIN_HASH_QUEUE': os.environ.get('LOGIN_HASH_QUEUE', str(args.clients)),
+                'QUERY_LOG_LEVEL': 'ERROR',
+            }
+            if mode == 'unbounded':
+                env['LOGIN_HASH_WORKERS'] = str(args.clients)
+            command = [sys.executable, '-m', 'benchmarks.logins', '--run', mode,
+                       '--clients', str(args.clients), '--logins', str(args.logins)]
+            output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+            print(output.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    main()
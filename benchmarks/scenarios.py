@@ -0,0 +1,92 @@
+"""
+Benchmark scenarios generated from zippee.postman_collection.json.
+
+Every request in the collection becomes a Scenario: the host is dropped, numeric
+path segments become `{task_id}` and form bodies are sent as JSON. The role
+needed to call it is taken from TaskView's permission mapping. The list request
+also yields the `list_filtered` and `search` variants the collection lacks.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+COLLECTION = Path(__file__).resolve().parent.parent / 'zippee.postman_collection.json'
+
+# mirrors TaskView.get_permissions()
+ROLES = {'GET': None, 'POST': 'USER', 'PUT': 'MANAGER', 'DELETE': 'MANAGER'}
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: str
+    body: dict = field(default_factory=dict)
+    role: str = None
+    # each request consumes its own task (delete)
+    consumes_task: bool = False
+
+    def url(self, task_id):
+        return self.path.format(task_id=task_id)
+
+
+def _slug(name):
+    return re.sub(r'\W+', '_', name.strip().lower()).strip('_')
+
+
+def _path(url):
+    raw = url if isinstance(url, str) else url['raw']
+    path = re.sub(r'^\w+://[^/]+', '', raw)
+    path = re.sub(r'/\d+(?=/|$)', '/{task_id}', path)
+    return path if path.endswith('/') else path + '/'
+
+
+def _body(request):
+    body = request.get('body') or {}
+    if body.get('mode') == 'formdata':
+        return {item['key']: item['value'] for item in body['formdata'] if not item.get('disabled')}
+    if body.get('mode') == 'raw' and body.get('raw'):
+        return json.loads(body['raw'])
+    return {}
+
+
+def _walk(items, group=''):
+    for item in items:
+        if 'item' in item:
+            yield from _walk(item['item'], _slug(item['name']))
+        else:
+            yield group, item
+
+
+def load(collection=COLLECTION):
+    with open(collection) as handle:
+        items = json.load(handle)['item']
+
+    scenarios = []
+    for group, item in _walk(items):
+        request = item['request']
+        method = request['method'].upper()
+        path = _path(request['url'])
+        body = _body(request)
+
+        if group == 'authentication':
+            if path.endswith('/login/'):
+                # credentials are filled in per request with a seeded user
+                scenarios.append(Scenario('login', method, path, {}))
+            # registration grows the users table without bound, it is left out
+            continue
+
+        if method == 'GET' and '{task_id}' not in path:
+            scenarios.append(Scenario('list', method, path))
+            scenarios.append(Scenario('list_filtered', method, path + '?completed=false'))
+            scenarios.append(Scenario('search', method, path + '?search=alpha%20task'))
+            continue
+
+        # the collection's slug is fixed, it would collide on the second create
+        body.pop('slug', None)
+        if method == 'PUT':
+            body.setdefault('completed', True)
+        name = {'GET': 'detail', 'POST': 'create', 'PUT': 'update', 'DELETE': 'delete'}.get(method, _slug(item['name']))
+        scenarios.append(Scenario(name, method, path, body, ROLES.get(method), consumes_task=method == 'DELETE'))
+    return scenarios
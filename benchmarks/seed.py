@@ -0,0 +1,82 @@
+"""
+Dataset seeding for the benchmarks.
+
+Tasks go through tasks.bulk.create_tasks() so the summary counters stay right,
+with the search index suspended and rebuilt once for large loads. Users are
+bulk inserted with one shared password hash, `role` set explicitly because
+bulk_create skips CustomUser.save().
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection
+
+from tasks.bulk import create_tasks
+from tasks.models import Task
+from tasks.search import resume_search_index, suspend_search_index
+
+SIZES = {
+    'small': 10_000,
+    'large': 1_000_000,
+    'xlarge': 10_000_000,
+}
+
+PASSWORD = 'Bench@123'
+
+# word pool so `search` has selective and broad terms
+WORDS = ('alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliet')
+
+
+def user_email(role, n):
+    return f'{role.lower()}{n}@bench.test'
+
+
+def seed_tasks(count, batch_size=5000, stdout=None):
+    existing = Task.objects.count()
+    missing = count - existing
+    if missing <= 0:
+        return 0
+
+    suspend = missing > batch_size
+    if suspend:
+        suspend_search_index(connection)
+    try:
+        for start in range(existing, count, batch_size):
+            create_tasks([
+                Task(
+                    title=f'{WORDS[n % len(WORDS)]} task {n}',
+                    description=f'{WORDS[(n // len(WORDS)) % len(WORDS)]} benchmark row {n}',
+                    completed=n % 3 == 0,
+                )
+                for n in range(start, min(start + batch_size, count))
+            ], batch_size=batch_size)
+            if stdout is not None:
+                stdout.write(f'seeded {min(start + batch_size, count)}/{count} tasks\n')
+    finally:
+        if suspend:
+            resume_search_index(connection)
+    return missing
+
+
+def seed_users(roles):
+    """`roles` maps a CustomUser.Role value to how many users of it should exist."""
+    User = get_user_model()
+    password = make_password(PASSWORD)
+    created = 0
+    for role, count in roles.items():
+        emails = [user_email(role, n) for n in range(count)]
+        existing = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+        users = [
+            User(email=email, password=password, role=role, first_name=email.split('@')[0])
+            for email in emails if email not in existing
+        ]
+        User.objects.bulk_create(users, batch_size=1000)
+        created += len(users)
+    return created
+
+
+def seed(tasks, users=10, managers=2, admins=1, stdout=None):
+    call_command('migrate', verbosity=0)
+    User = get_user_model()
+    seed_users({User.Role.USER: users, User.Role.MANAGER: managers, User.Role.ADMIN: admins})
+    seed_tasks(tasks, stdout=stdout)
@@ -0,0 +1,80 @@
+"""
+Micro-benchmark of list serialization: TaskSerializer(many=True) over Task
+instances versus TaskValuesSerializer over values() rows.
+
+Usage:
+    python -m benchmarks.serialization [--tasks 10000] [--repeat 200]
+
+For each page size it times the fetch + serialize + JSON render of one page,
+and serialization alone on pre-fetched rows, and prints JSON lines.
+"""
+import argparse
+import json
+import os
+import timeit
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from benchmarks.seed import seed  # noqa: E402
+from tasks.models import Task  # noqa: E402
+from tasks.serializers import TaskSerializer, TaskValuesSerializer  # noqa: E402
+
+renderer = JSONRenderer()
+
+
+def best(func, repeat):
+    # best of 5 runs of `repeat` calls, in µs per call
+    return min(timeit.repeat(func, number=repeat, repeat=5)) / repeat * 1e6
+
+
+def measure(page_size, repeat, fields=None):
+    queryset = Task.objects.order_by('-created_at', '-id')
+    values_serializer = TaskValuesSerializer(fields)
+
+    def models_page():
+        return renderer.render(TaskSerializer(list(queryset[:page_size]), many=True).data)
+
+    def values_page():
+        rows = list(queryset.values(*values_serializer.select_fields)[:page_size])
+        return renderer.render(values_serializer.to_representation(rows))
+
+    instances = list(queryset[:page_size])
+    rows = list(queryset.values(*values_serializer.select_fields)[:page_size])
+    if fields is None:
+        assert models_page() == values_page()
+
+    result = {
+        'page_size': page_size,
+        'fields': ','.join(values_serializer.fields),
+        'models_page_us': best(models_page, repeat),
+        'values_page_us': best(values_page, repeat),
+        'models_serialize_us': best(lambda: TaskSerializer(instances, many=True).data, repeat),
+        'values_serialize_us': best(lambda: values_serializer.to_representation(rows), repeat),
+    }
+    result['page_speedup'] = result['models_page_us'] / result['values_page_us']
+    result['serialize_speedup'] = result['models_serialize_us'] / result['values_serialize_us']
+    return {key: round(value, 2) if isinstance(value, float) else value for key, value in result.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--tasks', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--page-size', type=int, action='append')
+    args = parser.parse_args()
+
+    seed(args.tasks, users=1, managers=1, admins=0)
+    for page_size in args.page_size or [10, 100, 1000]:
+        repeat = max(1, args.repeat * 10 // page_size)
+        print(json.dumps(measure(page_size, repeat)))
+        print(json.dumps(measure(page_size, repeat, fields={'id', 'title', 'completed'})))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+"""
+Settings for the benchmark scripts: a throwaway SQLite file and the response
+cache off, so every request reaches the view and the database.
+"""
+import os
+import tempfile
+
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+# writers queue for the lock much longer than in production under benchmark load
+os.environ.setdefault('SQLITE_BUSY_TIMEOUT_MS', '30000')
+
+from zippee_assessment.settings import *  # noqa: E402,F401,F403
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCHMARK_DB', os.path.join(tempfile.gettempdir(), 'zippee-benchmark.sqlite3')),
+        # the SQLITE_PROFILE connection options, SQLITE_PROFILE=default for stock SQLite
+        'OPTIONS': SQLITE_OPTIONS,  # noqa: F405
+    }
+}
+
+TASKS_CACHE_TTL = int(os.environ.get('BENCHMARK_CACHE_TTL', 0))
@@ -0,0 +1,134 @@
+"""
+Idle-subscriber benchmark for /api/tasks/stream/.
+
+Opens N concurrent SSE connections against the ASGI application in-process
+(no sockets, the ASGI protocol is driven directly), then measures:
+
+* connect time and Python heap per idle subscriber (tracemalloc)
+* fan-out latency: one published event until every subscriber was sent it
+* that disconnecting every client releases every subscription
+
+Usage:
+    python -m benchmarks.stream [--subscribers 10000] [--events 20]
+
+Prints one JSON object.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import time
+import tracemalloc
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from tasks import stream  # noqa: E402
+from zippee_assessment.asgi import application  # noqa: E402
+
+
+class Connection:
+    """One client: sends the request, then stays idle until told to disconnect."""
+
+    def __init__(self, path, disconnected, received):
+        self.scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': b'', 'root_path': '', 'headers': [(b'host', b'testserver')],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        self.disconnected = disconnected
+        self.received = received
+        self.requested = False
+        self.status = None
+        self.streaming = False
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        elif message.get('body', b'').startswith(b'retry: '):
+            self.streaming = True
+        elif message.get('body', b'').startswith(b'id: '):
+            self.received()
+
+    def run(self):
+        return application(self.scope, self.receive, self.send)
+
+
+async def bench(subscribers, events):
+    broker = stream.get_broker()
+    disconnected = asyncio.Event()
+    pending = {'count': 0}
+    done = asyncio.Event()
+
+    def received():
+        pending['count'] -= 1
+        if pending['count'] == 0:
+            done.set()
+
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    connections = [Connection('/api/tasks/stream/', disconnected, received) for _ in range(subscribers)]
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(connection.run()) for connection in connections]
+    # connected once the response headers and the first frame went out
+    while not all(connection.streaming for connection in connections):
+        if any(task.done() for task in tasks):
+            raise SystemExit(f'a connection ended early: status {[c.status for c in connections if c.status != 200][:1]}')
+        await asyncio.sleep(0.01)
+    connect_s = time.perf_counter() - started
+    heap = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(baseline, 'filename'))
+    tracemalloc.stop()
+
+    latencies = []
+    for n in range(events):
+        pending['count'] = subscribers
+        done.clear()
+        event = stream.TaskEvent('updated', n, data={'id': n, 'title': f'Task {n}'}, completed=False, words=['task'])
+        started = time.perf_counter()
+        stream.publish(event)
+        await done.wait()
+        latencies.append(time.perf_counter() - started)
+
+    disconnected.set()
+    await asyncio.gather(*tasks)
+    return {
+        'subscribers': subscribers,
+        'connect_s': round(connect_s, 2),
+        'heap_mb': round(heap / 2**20, 2),
+        'heap_per_subscriber_kb': round(heap / subscribers / 1024, 2),
+        'events': events,
+        'fanout_mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+        'fanout_max_ms': round(max(latencies) * 1000, 2),
+        'stats': broker.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--subscribers', type=int, default=10_000)
+    parser.add_argument('--events', type=int, default=20)
+    args = parser.parse_args()
+
+    # one access log line per connection would dominate the run
+    logging.getLogger('zippee_assessment.queries').setLevel(logging.WARNING)
+    settings.TASKS_STREAM_MAX_SUBSCRIBERS = max(settings.TASKS_STREAM_MAX_SUBSCRIBERS, args.subscribers)
+    print(json.dumps(asyncio.run(bench(args.subscribers, args.events))))
+
+
+if __name__ == '__main__':
+    main()
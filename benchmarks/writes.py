@@ -0,0 +1,125 @@
+"""
+Concurrent write benchmark for the SQLite profile and the write queue.
+
+Each mode runs in its own process on a fresh SQLite file, with every thread
+creating and then updating tasks through TaskView (POST, PATCH):
+
+* stock:   SQLITE_PROFILE=default, no write queue (Django's SQLite defaults)
+* profile: SQLITE_PROFILE=production (WAL, pragmas, BEGIN IMMEDIATE)
+* queue:   the production profile plus the group-committing write queue
+
+Usage:
+    python -m benchmarks.writes [--threads 32] [--writes 50] [--mode stock --mode queue]
+
+Prints one JSON object per mode: writes/s, latency percentiles, failed
+requests (mostly "database is locked") and the write queue's commits.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MODES = {
+    'stock': {'SQLITE_PROFILE': 'default', 'SQLITE_WRITE_QUEUE': 'False'},
+    'profile': {'SQLITE_PROFILE': 'production', 'SQLITE_WRITE_QUEUE': 'False'},
+    'queue': {'SQLITE_PROFILE': 'production', 'SQLITE_WRITE_QUEUE': 'True'},
+}
+
+
+def percentile(values, p):
+    return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 2) if values else None
+
+
+def bench(mode, threads, writes):
+    """Runs inside the per-mode process, DJANGO_SETTINGS_MODULE and the mode's env are set."""
+    import django
+
+    django.setup()
+
+    from django.db import connections
+    from django.test import Client
+
+    from authentication.utils import create_tokens_for_user
+    from benchmarks.seed import seed, user_email
+    from django.contrib.auth import get_user_model
+    from zippee_assessment.write_queue import write_queue
+
+    seed(0, users=0, managers=1, admins=0)
+    manager = get_user_model().objects.get(email=user_email('MANAGER', 0))
+    headers = {'Authorization': f"Bearer {create_tokens_for_user(manager)['access']}"}
+    local = threading.local()
+    start = threading.Barrier(threads)
+
+    def worker(n):
+        local.client = Client(raise_request_exception=False)
+        latencies, failed = [], 0
+        start.wait()
+        for i in range(writes):
+            began = time.perf_counter()
+            if i % 2 == 0 or not hasattr(local, 'task_id'):
+                response = local.client.post('/api/tasks/', {'title': f'write {n}-{i}'}, content_type='application/json', headers=headers)
+                if response.status_code == 201:
+                    local.task_id = response.json()['id']
+            else:
+                response = local.client.patch(f'/api/tasks/{local.task_id}/', {'completed': i % 4 == 1}, content_type='application/json', headers=headers)
+            latencies.append(time.perf_counter() - began)
+            failed += response.status_code >= 400
+        connections.close_all()
+        return latencies, failed
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(worker, range(threads)))
+    elapsed = time.perf_counter() - began
+
+    latencies = sorted(latency for result, _ in results for latency in result)
+    failed = sum(failed for _, failed in results)
+    return {
+        'mode': mode,
+        'threads': threads,
+        'requests': len(latencies),
+        'failed': failed,
+        'writes_per_s': round((len(latencies) - failed) / elapsed, 1),
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'write_queue': write_queue.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--writes', type=int, default=50, help='Requests per thread')
+    parser.add_argument('--mode', action='append', choices=MODES)
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(bench(args.run, args.threads, args.writes)))
+        return
+
+    for mode in args.mode or MODES:
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                **MODES[mode],
+                'DJANGO_SETTINGS_MODULE': 'benchmarks.settings',
+                'BENCHMARK_DB': os.path.join(directory, 'writes.sqlite3'),
+                # the production busy timeout, not the benchmark's long one
+                'SQLITE_BUSY_TIMEOUT_MS': os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'),
+                'QUERY_LOG_LEVEL': 'ERROR',
+            }
+            command = [sys.executable, '-m', 'benchmarks.writes', '--run', mode,
+                       '--threads', str(args.threads), '--writes', str(args.writes)]
+            output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+            print(output.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    main()
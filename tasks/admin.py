@@ -1,11 +1,22 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Task
+from .models import Task, TaskSummary
 
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
     list_display = ('id', 'title', 'description', 'completed', 'created_at', 'updated_at')
     search_fields = ('title', 'description')
     list_filter = ('completed', 'created_at', 'updated_at')
-    ordering = ('-created_at',)
\ No newline at end of file
+    ordering = ('-created_at',)
+
+@admin.register(TaskSummary)
+class TaskSummaryAdmin(admin.ModelAdmin):
+    list_display = ('total_tasks', 'completed_tasks', 'incomplete_tasks')
+    readonly_fields = ('total_tasks', 'completed_tasks')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
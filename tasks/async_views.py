@@ -0,0 +1,271 @@
+"""
+Native async twin of TaskView for ASGI deployments.
+
+DRF's APIView is synchronous, so under ASGI every TaskView request is handed
+to a worker thread. AsyncTaskView serves the same URLs' contract with Django's
+async ORM: authentication, permissions and the response cache run on the
+event loop, reads go through the ORM's async methods (in Django 5.2 these
+still run the query in a thread) and writes, which need transaction.atomic
+and the model save/delete hooks, make a single thread hop.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.decorators import classonlymethod
+from django.utils.module_loading import import_string
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from tasks import cache as task_cache, conditional, counts, stream
+from tasks.bulk import PATCH_RETRIES, patch_task
+from tasks.filters import filter_tasks, parse_completed
+from tasks.models import Task, TaskSummary
+from tasks.pagination import TaskListPagination
+from tasks.serializers import TaskSerializer, TaskValuesSerializer
+from zippee_assessment.permissions import AdminPermission, ManagerPermission, UserPermission
+from zippee_assessment.write_queue import write_queue
+
+
+class AsyncTaskView(View):
+    authentication_class = import_string(settings.REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'][0])
+    query_budget = {'GET': 3, 'POST': 5, 'PUT': 7, 'PATCH': 7, 'DELETE': 5}
+    renderer = JSONRenderer()
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # JWT bearer tokens, no session cookie to protect
+        view.csrf_exempt = True
+        return view
+
+    def get_permissions(self):
+        """
+        Instantiates and returns the list of permissions that this view requires.
+        """
+        if self.request.method == 'GET':
+            permission_classes = [AllowAny]
+
+        elif self.request.method == 'POST':
+            permission_classes = [IsAuthenticated, UserPermission]
+
+        elif self.request.method in ['PUT', 'PATCH']:
+            permission_classes = [IsAuthenticated, ManagerPermission]
+
+        elif self.request.method == 'DELETE':
+            permission_classes = [IsAuthenticated, ManagerPermission]
+        else:
+            permission_classes = [IsAuthenticated, AdminPermission]
+
+        return [permission() for permission in permission_classes]
+
+    async def dispatch(self, request, *args, **kwargs):
+        # a DRF Request gives the paginator query_params; the body is read by the handlers
+        self.drf_request = Request(request)
+        try:
+            denied = await self.check_permissions(request)
+            if denied is not None:
+                return denied
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+            return self.render(detail, exc.status_code)
+
+    async def check_permissions(self, request):
+        permissions = self.get_permissions()
+        if any(not isinstance(permission, AllowAny) for permission in permissions):
+            result = await self.authenticate()
+            if result is None:
+                return self.render({'detail': 'Authentication credentials were not provided.'}, status.HTTP_401_UNAUTHORIZED)
+            request.user, request.auth = result
+        for permission in permissions:
+            # the role permissions only read request.user attributes, no I/O
+            if not permission.has_permission(request, self):
+                return self.render({'detail': 'You do not have permission to perform this action.'}, status.HTTP_403_FORBIDDEN)
+        return None
+
+    async def authenticate(self):
+        authenticator = self.authentication_class()
+        if hasattr(authenticator, 'aauthenticate'):
+            return await authenticator.aauthenticate(self.request)
+        # e.g. simplejwt's JWTAuthentication, which loads the user from the database
+        return await sync_to_async(authenticator.authenticate)(self.drf_request)
+
+    def render(self, data, status_code=status.HTTP_200_OK, headers=None):
+        content = b'' if data is None else self.renderer.render(data)
+        return HttpResponse(content, status=status_code, content_type='application/json', headers=headers)
+
+    def cached_response(self, request, entry, cache_status):
+        not_modified = conditional.evaluate(request, entry['etag'], entry['last_modified'])
+        if not_modified is not None:
+            not_modified['X-Cache'] = cache_status
+            return not_modified
+        response = self.render(entry['data'], headers={'X-Cache': cache_status})
+        return conditional.set_validators(response, entry['etag'], entry['last_modified'])
+
+    def parse_body(self, request):
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+
+    async def get(self, request, id=None):
+        if id is not None:
+            return await self.retrieve(request, id)
+        return await self.list(request)
+
+    async def retrieve(self, request, id):
+        key = await task_cache.adetail_key(id)
+        entry = await task_cache.aget(key)
+        cache_status = 'HIT'
+        if entry is None:
+            cache_status = 'MISS'
+            task = await Task.objects.filter(id=id).afirst()
+            if task is None:
+                return self.render(None, status.HTTP_404_NOT_FOUND)
+            entry = {
+                'data': TaskSerializer(task).data,
+                'etag': conditional.task_etag(task.id, task.updated_at),
+                'last_modified': task.updated_at,
+            }
+            await task_cache.aset(key, entry)
+        return self.cached_response(request, entry, cache_status)
+
+    async def list(self, request):
+        drf_request = self.drf_request
+        try:
+            fields = TaskValuesSerializer.parse_fields(drf_request.query_params.get('fields'))
+            count_mode = counts.parse_mode(drf_request.query_params.get('count'))
+        except ValueError as exc:
+            return self.render({"message": str(exc)}, status.HTTP_400_BAD_REQUEST)
+
+        key = await task_cache.alist_key(drf_request)
+        entry = await task_cache.aget(key)
+        cache_status = 'HIT'
+        if entry is None:
+            cache_status = 'MISS'
+            filtered_tasks = filter_tasks(Task.objects.all(), drf_request.query_params)
+            summary = await TaskSummary.acurrent()
+
+            serializer = TaskValuesSerializer(fields)
+            paginator = TaskListPagination()
+            rows = await paginator.apaginate_values(filtered_tasks, drf_request, *serializer.select_fields, view=self)
+            filtered_count = await counts.afiltered_count(filtered_tasks, drf_request, summary, count_mode, paginator)
+            data = paginator.get_paginated_response(serializer.to_representation(rows)).data
+            data['task_summary'] = {
+                'total_tasks': summary.total_tasks,
+                'completed_tasks': summary.completed_tasks,
+                'incomplete_tasks': summary.incomplete_tasks,
+                'filtered_count': filtered_count,
+                'count': count_mode,
+            }
+            entry = {
+                'data': data,
+                'etag': conditional.list_etag(
+                    task_cache.list_params(drf_request), [(row['id'], row['updated_at']) for row in rows], summary,
+                    filtered_count, paginator.has_next, paginator.has_previous,
+                ),
+                # no Last-Modified for lists, see TaskView.list_etag
+                'last_modified': None,
+            }
+            await task_cache.aset(key, entry)
+        return self.cached_response(request, entry, cache_status)
+
+    async def post(self, request):
+        data = self.parse_body(request)
+        serializer = TaskSerializer(data=data)
+        if not await self.is_valid(serializer):
+            return self.render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+        await sync_to_async(write_queue.run)(serializer.save)
+        return self.render(serializer.data, status.HTTP_201_CREATED)
+
+    async def put(self, request, id):
+        task = await Task.objects.filter(id=id).afirst()
+        if task is None:
+            return self.render({'detail': 'No Task matches the given query.'}, status.HTTP_404_NOT_FOUND)
+        serializer = TaskSerializer(task, data=self.parse_body(request))
+        if not await self.is_valid(serializer):
+            return self.render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+        await sync_to_async(write_queue.run)(serializer.save)
+        return self.render(serializer.data)
+
+    async def patch(self, request, id):
+        task = await Task.objects.filter(id=id).afirst()
+        if task is None:
+            return self.render({'detail': 'No Task matches the given query.'}, status.HTTP_404_NOT_FOUND)
+        if not conditional.if_match(request, task.id, task.updated_at):
+            return self.precondition_failed()
+        serializer = TaskSerializer(task, data=self.parse_body(request), partial=True)
+        if not await self.is_valid(serializer):
+            return self.render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+        pinned = conditional.pins_version(request)
+        task = await sync_to_async(write_queue.run)(
+            patch_task, task, serializer.validated_data, 0 if pinned else PATCH_RETRIES
+        )
+        if task is None:
+            return self.precondition_failed() if pinned else self.conflict()
+        response = self.render(TaskSerializer(task).data)
+        return conditional.set_validators(response, conditional.task_etag(task.id, task.updated_at), task.updated_at)
+
+    def precondition_failed(self):
+        return self.render({"message": "Task was modified since it was read, fetch it again"}, status.HTTP_412_PRECONDITION_FAILED)
+
+    def conflict(self):
+        return self.render({"message": "Task kept changing or was deleted, try again"}, status.HTTP_409_CONFLICT)
+
+    async def delete(self, request, id):
+        task = await Task.objects.filter(id=id).afirst()
+        if task is None:
+            return self.render({'detail': 'No Task matches the given query.'}, status.HTTP_404_NOT_FOUND)
+        await sync_to_async(write_queue.run)(task.delete)
+        return self.render({"message": "Task deleted successfully"}, status.HTTP_204_NO_CONTENT)
+
+    async def is_valid(self, serializer):
+        # only the slug UniqueValidator queries the database, skip the thread hop otherwise
+        if isinstance(serializer.initial_data, dict) and serializer.initial_data.get('slug'):
+            return await sync_to_async(serializer.is_valid)()
+        return serializer.is_valid()
+
+
+class TaskStreamView(View):
+    """
+    Server-sent events for task creates, updates and deletes, ASGI only.
+    `?completed=` and `?search=` filter server side with the list semantics.
+    A `resync` event means the client fell behind and should refetch the list.
+    """
+    retry_ms = 5000
+
+    async def get(self, request):
+        if not hasattr(request, 'scope'):
+            # a WSGI worker would be tied up for the lifetime of the stream
+            return HttpResponse(
+                json.dumps({"message": "The task stream is only served over ASGI"}),
+                status=status.HTTP_501_NOT_IMPLEMENTED, content_type='application/json',
+            )
+        broker = stream.get_broker()
+        subscription = broker.subscribe(parse_completed(request.GET.get('completed')), request.GET.get('search'))
+        if subscription is None:
+            return HttpResponse(
+                json.dumps({"message": "Too many stream subscribers, retry later"}),
+                status=status.HTTP_503_SERVICE_UNAVAILABLE, content_type='application/json',
+                headers={'Retry-After': str(self.retry_ms // 1000)},
+            )
+        response = StreamingHttpResponse(self.events(broker, subscription), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # keep reverse proxies from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def events(self, broker, subscription):
+        try:
+            yield f'retry: {self.retry_ms}\n\n'.encode()
+            async for frame in subscription.frames(settings.TASKS_STREAM_KEEPALIVE_SECONDS):
+                yield frame
+        finally:
+            broker.unsubscribe(subscription)
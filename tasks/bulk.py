@@ -0,0 +1,129 @@
+"""
+Set-based task writes used by the bulk endpoints and importers.
+
+These skip the per-row save()/delete() hooks, so each helper announces the
+change through `tasks_bulk_changed` inside its transaction; receivers in
+tasks/signals.py keep derived state (summary counters, ...) in step.
+"""
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .models import Task
+from .signals import tasks_bulk_changed
+
+# how often patch_task() reapplies a PATCH sent without If-Match over a concurrent write
+PATCH_RETRIES = 3
+
+
+def create_tasks(tasks, batch_size=None, using=None):
+    using = using or router.db_for_write(Task)
+    for task in tasks:
+        if not task.slug:
+            task.slug = Task.build_slug(task.title)
+    with transaction.atomic(using=using):
+        created = Task.objects.using(using).bulk_create(tasks, batch_size=batch_size)
+        tasks_bulk_changed.send(sender=Task, action='create', tasks=created, using=using)
+    return created
+
+
+def update_tasks(tasks, fields, batch_size=None, using=None):
+    """
+    `tasks` must already carry their new values. When `completed` is among
+    `fields`, its previous values are re-read under the row locks of the
+    update, not taken from when `tasks` were loaded, and tasks deleted since
+    are dropped.
+    """
+    using = using or router.db_for_write(Task)
+    now = timezone.now()
+    for task in tasks:
+        task.updated_at = now
+    fields = list(dict.fromkeys([*fields, 'updated_at']))
+    with transaction.atomic(using=using):
+        if 'completed' in fields:
+            previous = dict(
+                Task.objects.using(using).select_for_update()
+                .filter(id__in=[task.id for task in tasks]).values_list('id', 'completed')
+            )
+            tasks = [task for task in tasks if task.id in previous]
+        else:
+            previous = {task.id: task.completed for task in tasks}
+        Task.objects.using(using).bulk_update(tasks, fields, batch_size=batch_size)
+        tasks_bulk_changed.send(sender=Task, action='update', tasks=tasks, previous=previous, using=using)
+    for task in tasks:
+        task._loaded_completed = task.completed
+    return tasks
+
+
+def update_task(task, fields, using=None):
+    """
+    Write `fields` of one loaded `task` with a single UPDATE ... SET <fields>,
+    updated_at, guarded by the `updated_at` it was loaded with. Returns False,
+    writing nothing, when the row changed (or went away) since it was read.
+    """
+    using = using or router.db_for_write(Task)
+    if 'slug' in fields and not task.slug:
+        task.slug = Task.build_slug(task.title)
+    loaded_at, task.updated_at = task.updated_at, timezone.now()
+    with transaction.atomic(using=using):
+        updated = Task.objects.using(using).filter(pk=task.pk, updated_at=loaded_at).update(
+            updated_at=task.updated_at, **{field: getattr(task, field) for field in fields}
+        )
+        if not updated:
+            task.updated_at = loaded_at
+            return False
+        # the updated_at guard makes the loaded value the one this UPDATE replaced
+        previous = {task.id: getattr(task, '_loaded_completed', task.completed)}
+        tasks_bulk_changed.send(sender=Task, action='update', tasks=[task], previous=previous, using=using)
+    task._loaded_completed = task.completed
+    return True
+
+
+def patch_task(task, values, retries=0, using=None):
+    """
+    Set `values` on the loaded `task` and write the ones that change through
+    update_task(), nothing when none does. When the row changed since it was
+    read it is reloaded and `values` applied again, up to `retries` times, so
+    fields the caller did not send keep the concurrent write. Returns the
+    written task, or None when the row went away or kept changing.
+    """
+    using = using or router.db_for_write(Task)
+    for attempt in range(retries + 1):
+        if attempt:
+            task = Task.objects.using(using).filter(pk=task.pk).first()
+            if task is None:
+                return None
+        changed = [attr for attr, value in values.items() if getattr(task, attr) != value]
+        for attr in changed:
+            setattr(task, attr, values[attr])
+        if not changed or update_task(task, changed, using=using):
+            return task
+    return None
+
+
+def delete_tasks(tasks, using=None):
+    """
+    Delete `tasks` with a single DELETE ... WHERE id IN (...) RETURNING id,
+    completed. Derived state follows the rows the DELETE returned, so a task
+    toggled or deleted since `tasks` were loaded is counted as it was stored.
+    Returns the number of tasks deleted.
+    """
+    using = using or router.db_for_write(Task)
+    connection = connections[using]
+    ids = [task.id for task in tasks]
+    if not ids:
+        return 0
+    # QuerySet.delete() would fetch and signal row by row because of the
+    # post_delete receivers, the bulk signal below covers them instead
+    sql = 'DELETE FROM {table} WHERE {id} IN ({params}) RETURNING {id}, {completed}'.format(
+        table=connection.ops.quote_name(Task._meta.db_table),
+        id=connection.ops.quote_name('id'),
+        completed=connection.ops.quote_name('completed'),
+        params=', '.join(['%s'] * len(ids)),
+    )
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, ids)
+            rows = cursor.fetchall()
+        deleted = [Task.from_db(using, ['id', 'completed'], (pk, bool(completed))) for pk, completed in rows]
+        tasks_bulk_changed.send(sender=Task, action='delete', tasks=deleted, using=using)
+    return len(deleted)
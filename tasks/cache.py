@@ -0,0 +1,202 @@
+"""
+Response cache for the public task GET endpoints.
+
+Every key embeds a global "tasks generation" number. Any task write bumps it
+(see tasks/signals.py), which orphans all cached pages at once instead of
+tracking which list pages a task appears on; orphaned entries expire via TTL.
+
+With read replicas a page rendered from a lagging replica may predate the
+bump, so such entries live at most DATABASE_REPLICA_MAX_LAG_SECONDS, and
+clients pinned to the primary after a write bypass the cache.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from zippee_assessment import routers
+
+from .filters import parse_completed
+
+GENERATION_KEY = 'tasks:generation'
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def as_dict(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[settings.TASKS_CACHE_ALIAS]
+
+
+def get_generation():
+    cache = get_cache()
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # seed from the clock so a restarted/evicted counter never reuses an old generation
+        cache.add(GENERATION_KEY, time.time_ns() // 1000, timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+async def aget_generation():
+    cache = get_cache()
+    generation = await cache.aget(GENERATION_KEY)
+    if generation is None:
+        await cache.aadd(GENERATION_KEY, time.time_ns() // 1000, timeout=None)
+        generation = await cache.aget(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    cache = get_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, time.time_ns() // 1000, timeout=None)
+
+
+def detail_key(task_id):
+    return f'tasks:{get_generation()}:detail:{task_id}'
+
+
+async def adetail_key(task_id):
+    return f'tasks:{await aget_generation()}:detail:{task_id}'
+
+
+def list_params(request):
+    """The list query parameters that change the response, normalised into one string."""
+    params = request.query_params
+    completed = parse_completed(params.get('completed'))
+    return '|'.join([
+        # next/previous links are absolute, so host and path are part of the key
+        request.build_absolute_uri(request.path),
+        '' if completed is None else str(completed),
+        params.get('search', ''),
+        params.get('ordering', '').strip(),
+        params.get('cursor', ''),
+        params.get('fields', ''),
+        params.get('count', ''),
+    ])
+
+
+def count_params(request):
+    """Only the filter parameters, shared by every page and ordering of one filter."""
+    params = request.query_params
+    completed = parse_completed(params.get('completed'))
+    return f"{'' if completed is None else completed}|{params.get('search', '')}"
+
+
+def list_key(request):
+    digest = hashlib.sha256(list_params(request).encode()).hexdigest()
+    return f'tasks:{get_generation()}:list:{digest}'
+
+
+async def alist_key(request):
+    digest = hashlib.sha256(list_params(request).encode()).hexdigest()
+    return f'tasks:{await aget_generation()}:list:{digest}'
+
+
+def count_key(request):
+    digest = hashlib.sha256(count_params(request).encode()).hexdigest()
+    return f'tasks:{get_generation()}:count:{digest}'
+
+
+async def acount_key(request):
+    digest = hashlib.sha256(count_params(request).encode()).hexdigest()
+    return f'tasks:{await aget_generation()}:count:{digest}'
+
+
+def facets_key(request):
+    params = request.query_params
+    parts = '|'.join(params.get(name, '').strip() for name in ('bucket', 'search', 'since'))
+    return f'tasks:{get_generation()}:facets:{hashlib.sha256(parts.encode()).hexdigest()}'
+
+
+def entry_timeout():
+    if routers.reading_replicas():
+        return min(settings.TASKS_CACHE_TTL, settings.DATABASE_REPLICA_MAX_LAG_SECONDS)
+    return settings.TASKS_CACHE_TTL
+
+
+def count_timeout():
+    if routers.reading_replicas():
+        return min(settings.TASKS_COUNT_CACHE_TTL, settings.DATABASE_REPLICA_MAX_LAG_SECONDS)
+    return settings.TASKS_COUNT_CACHE_TTL
+
+
+def get_count(key):
+    # the generation in the key retires counts on any write, so they outlive pages
+    if not settings.TASKS_COUNT_CACHE_TTL or routers.pinned():
+        return None
+    return get_cache().get(key)
+
+
+def set_count(key, count):
+    if settings.TASKS_COUNT_CACHE_TTL:
+        get_cache().set(key, count, timeout=count_timeout())
+
+
+async def aget_count(key):
+    if not settings.TASKS_COUNT_CACHE_TTL or routers.pinned():
+        return None
+    return await get_cache().aget(key)
+
+
+async def aset_count(key, count):
+    if settings.TASKS_COUNT_CACHE_TTL:
+        await get_cache().aset(key, count, timeout=count_timeout())
+
+
+def get(key):
+    if not settings.TASKS_CACHE_TTL or routers.pinned():
+        return None
+    value = get_cache().get(key)
+    stats.record(value is not None)
+    return value
+
+
+def set(key, value):
+    if settings.TASKS_CACHE_TTL:
+        get_cache().set(key, value, timeout=entry_timeout())
+
+
+async def aget(key):
+    if not settings.TASKS_CACHE_TTL or routers.pinned():
+        return None
+    value = await get_cache().aget(key)
+    stats.record(value is not None)
+    return value
+
+
+async def aset(key, value):
+    if settings.TASKS_CACHE_TTL:
+        await get_cache().aset(key, value, timeout=entry_timeout())
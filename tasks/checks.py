@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches)
+def check_task_cache_is_shared(app_configs, **kwargs):
+    """
+    The task caches are invalidated by a generation counter in TASKS_CACHE_ALIAS,
+    which a per-process backend cannot share between workers.
+    """
+    backend = settings.CACHES[settings.TASKS_CACHE_ALIAS]['BACKEND']
+    if backend not in settings.PER_PROCESS_CACHE_BACKENDS:
+        return []
+    enabled = [name for name in ('TASKS_CACHE_TTL', 'TASKS_COUNT_CACHE_TTL') if getattr(settings, name)]
+    if not enabled:
+        return []
+    return [Warning(
+        f"{' and '.join(enabled)} enabled on the per-process {backend.rsplit('.', 1)[-1]}",
+        hint="With several workers, writes in one leave the others serving stale task pages, "
+             "counts and facets. Point CACHE_BACKEND at a shared cache, or set these to 0.",
+        id='tasks.W001',
+    )]
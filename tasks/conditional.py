@@ -0,0 +1,83 @@
+"""
+ETag / Last-Modified validators for the task GET endpoints.
+
+A detail ETag is `"<id>-<updated_at in µs>"`, reversible so write paths can
+turn an `If-Match` header back into the `updated_at` it was issued for. A list ETag
+hashes the filters and cursor, the `(id, updated_at)` pairs of the page, the
+summary counters and `filtered_count` shown next to it, and whether it links
+a next and previous page, so a match entering or leaving the filtered set off
+this page changes it too. Lists carry no Last-Modified: a delete can change a
+page without moving its newest `updated_at`.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _microseconds(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def task_etag(task_id, updated_at):
+    return f'"{task_id}-{_microseconds(updated_at)}"'
+
+
+def parse_task_etag(etag):
+    """Return `(id, updated_at)` for an ETag built by task_etag(), or None."""
+    try:
+        task_id, micros = etag.strip().removeprefix('W/').strip('"').split('-')
+        return int(task_id), EPOCH + timedelta(microseconds=int(micros))
+    except (ValueError, OverflowError):
+        return None
+
+
+def if_match(request, task_id, updated_at):
+    """
+    Whether a write may go ahead under the request's `If-Match` header: absent,
+    `*`, or listing the task's current ETag.
+    """
+    header = request.headers.get('If-Match')
+    if header is None or header.strip() == '*':
+        return True
+    return (task_id, updated_at) in {parse_task_etag(etag) for etag in header.split(',')}
+
+
+def pins_version(request):
+    """Whether `If-Match` names ETags, so a write must fail rather than land on a newer version."""
+    return request.headers.get('If-Match', '').strip() not in ('', '*')
+
+
+def list_etag(params, rows, summary, filtered_count=None, has_next=False, has_previous=False):
+    """`params` is the normalised filter/cursor string, `rows` the page's (id, updated_at) pairs."""
+    digest = hashlib.sha256(params.encode())
+    for task_id, updated_at in rows:
+        digest.update(f'{task_id}-{_microseconds(updated_at)};'.encode())
+    digest.update(f'{summary.total_tasks}-{summary.completed_tasks}-{filtered_count}'.encode())
+    digest.update(f'-{has_next:d}{has_previous:d}'.encode())
+    return f'"{digest.hexdigest()[:40]}"'
+
+
+def evaluate(request, etag, last_modified):
+    """
+    The 304 (or 412) answer to the request's conditional headers, or None when
+    the full response has to be sent.
+    """
+    response = get_conditional_response(
+        request._request if hasattr(request, '_request') else request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
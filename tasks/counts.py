@@ -0,0 +1,124 @@
+"""
+`filtered_count` for the task list, by `?count=`:
+
+* exact (default): without `search`, read off TaskSummary at no cost.
+  With it, counted once per filter and carried in the page's next/previous
+  cursors, so the later pages of a scroll reuse it without a shared cache.
+  With TASKS_COUNT_CACHE_TTL it is also cached under the tasks generation
+  for other first pages of the same filter, until a task write bumps it.
+* estimate: PostgreSQL's planner estimate for the filtered query. On SQLite
+  a probe of the full-text index that stops after TASKS_COUNT_SAMPLE_SIZE
+  matches (see search.estimate_matches), times the summary's share of
+  completed or open tasks when `completed` is filtered too.
+* none: no count, `filtered_count` is null.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from tasks import cache as task_cache, search
+from tasks.filters import parse_completed
+
+EXACT = 'exact'
+ESTIMATE = 'estimate'
+NONE = 'none'
+MODES = (EXACT, ESTIMATE, NONE)
+
+
+def parse_mode(value):
+    """`?count=` as one of MODES, ValueError when not understood."""
+    mode = (value or EXACT).strip().lower()
+    if mode not in MODES:
+        raise ValueError(f"count must be one of: {', '.join(MODES)}")
+    return mode
+
+
+def summary_count(summary, query_params):
+    """The count straight from the summary counters, None when `search` narrows it."""
+    if query_params.get('search'):
+        return None
+    completed = parse_completed(query_params.get('completed'))
+    if completed is None:
+        return summary.total_tasks
+    return summary.completed_tasks if completed else summary.incomplete_tasks
+
+
+def uses_planner(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def plan_rows(plan):
+    return int(json.loads(plan)[0]['Plan']['Plan Rows'])
+
+
+def scale(matches, query_params, summary):
+    completed = parse_completed(query_params.get('completed'))
+    if completed is not None and summary.total_tasks:
+        share = summary.completed_tasks if completed else summary.incomplete_tasks
+        matches = round(matches * share / summary.total_tasks)
+    return min(matches, summary.total_tasks)
+
+
+def estimate_count(queryset, query_params, summary):
+    if summary.total_tasks <= settings.TASKS_COUNT_SAMPLE_SIZE:
+        return queryset.count()
+    if uses_planner(queryset):
+        return plan_rows(queryset.explain(format='json'))
+    matches = search.estimate_matches(query_params['search'], settings.TASKS_COUNT_SAMPLE_SIZE, queryset.db)
+    if matches is None:
+        return queryset.count()
+    return scale(matches, query_params, summary)
+
+
+def filtered_count(queryset, request, summary, mode, paginator=None):
+    """`paginator`, when given, supplies the count its cursor carries and carries the one returned."""
+    if mode == NONE:
+        return None
+    count = summary_count(summary, request.query_params)
+    if count is not None:
+        return count
+    if mode == ESTIMATE:
+        return estimate_count(queryset, request.query_params, summary)
+
+    count = getattr(paginator, 'cursor_count', None)
+    if count is None:
+        key = task_cache.count_key(request)
+        count = task_cache.get_count(key)
+        if count is None:
+            count = queryset.count()
+            task_cache.set_count(key, count)
+    if paginator is not None:
+        paginator.count = count
+    return count
+
+
+async def afiltered_count(queryset, request, summary, mode, paginator=None):
+    if mode == NONE:
+        return None
+    count = summary_count(summary, request.query_params)
+    if count is not None:
+        return count
+    if mode == ESTIMATE:
+        if summary.total_tasks <= settings.TASKS_COUNT_SAMPLE_SIZE:
+            return await queryset.acount()
+        if uses_planner(queryset):
+            return plan_rows(await queryset.aexplain(format='json'))
+        matches = await sync_to_async(search.estimate_matches)(
+            request.query_params['search'], settings.TASKS_COUNT_SAMPLE_SIZE, queryset.db,
+        )
+        if matches is None:
+            return await queryset.acount()
+        return scale(matches, request.query_params, summary)
+
+    count = getattr(paginator, 'cursor_count', None)
+    if count is None:
+        key = await task_cache.acount_key(request)
+        count = await task_cache.aget_count(key)
+        if count is None:
+            count = await queryset.acount()
+            await task_cache.aset_count(key, count)
+    if paginator is not None:
+        paginator.count = count
+    return count
@@ -0,0 +1,54 @@
+"""
+Row encoders for the streaming task export. Rows come from `values_list()`
+so no Task instances are built, values are formatted the way TaskSerializer
+renders them.
+"""
+import csv
+import json
+
+from .formatting import format_datetime
+
+EXPORT_FIELDS = ('id', 'slug', 'title', 'description', 'completed', 'created_at', 'updated_at')
+
+
+def encode_row(row):
+    row = list(row)
+    row[5] = format_datetime(row[5])
+    row[6] = format_datetime(row[6])
+    return row
+
+
+class Echo:
+    """File-like object whose write() hands the line back, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def ndjson_chunks(rows, chunk_size):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(EXPORT_FIELDS, encode_row(row)))))
+        if len(lines) >= chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def csv_chunks(rows, chunk_size):
+    writer = csv.writer(Echo())
+    lines = [writer.writerow(EXPORT_FIELDS)]
+    for row in rows:
+        lines.append(writer.writerow(encode_row(row)))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+FORMATS = {
+    'ndjson': ('application/x-ndjson', ndjson_chunks),
+    'csv': ('text/csv', csv_chunks),
+}
@@ -0,0 +1,24 @@
+from .search import search_tasks
+
+
+def parse_completed(value):
+    """`?completed=` as True/False, or None when absent or not understood."""
+    if value is None:
+        return None
+    if value.lower() in ['true', '1']:
+        return True
+    if value.lower() in ['false', '0']:
+        return False
+    return None
+
+
+def filter_tasks(queryset, query_params):
+    """Apply the `completed` and `search` query parameters shared by the task list endpoints."""
+    completed = parse_completed(query_params.get('completed'))
+    if completed is not None:
+        queryset = queryset.filter(completed=completed)
+
+    search = query_params.get('search')
+    if search:
+        queryset = search_tasks(queryset, search)
+    return queryset
@@ -0,0 +1,14 @@
+"""
+Value formatting shared by the serializers and the streaming export, which
+render the same fields without going through DRF's field classes.
+"""
+from django.utils import timezone
+
+
+def format_datetime(value, tz=None):
+    # mirrors rest_framework.fields.DateTimeField with the default ISO_8601 format,
+    # pass `tz` when formatting many values, looking up the current one is not free
+    value = timezone.localtime(value, tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
@@ -0,0 +1,114 @@
+import json
+import time
+from itertools import islice
+from multiprocessing import Pool
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from rest_framework.exceptions import ValidationError
+
+from tasks.bulk import create_tasks
+from tasks.models import Task
+from tasks.search import resume_search_index, suspend_search_index
+from tasks.serializers import TaskSerializer
+
+
+def parse_lines(numbered_lines):
+    """
+    Decode and validate one chunk of `(line_no, line)`, returns (valid rows,
+    errors, number of the chunk's last line). Blank lines are skipped but
+    still count towards the last line.
+    """
+    # one serializer for the whole chunk, building its fields per row costs more than validating
+    serializer = TaskSerializer()
+    rows, errors = [], []
+    for line_no, line in numbered_lines:
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            errors.append((line_no, str(exc)))
+            continue
+        try:
+            rows.append(serializer.run_validation(data))
+        except ValidationError as exc:
+            errors.append((line_no, exc.detail))
+    return rows, errors, numbered_lines[-1][0]
+
+
+def chunked(lines, size, start):
+    numbered = enumerate(lines, start=start + 1)
+    while chunk := list(islice(numbered, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Import tasks from a JSONL file, one task object per line'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Path of the .jsonl file')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT batch and per transaction')
+        parser.add_argument('--offset', type=int, default=0, help='Skip this many lines, to resume an interrupted import')
+        parser.add_argument('--workers', type=int, default=1, help='Processes used to decode and validate lines')
+        parser.add_argument('--defer-indexes', action='store_true', help='Suspend search index maintenance and rebuild it once at the end')
+        parser.add_argument('--database', default='default', help='Database alias to import into')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        using = options['database']
+        connection = connections[using]
+
+        try:
+            source = open(options['file'], encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(exc)
+
+        pool = None
+        with source:
+            lines = islice(source, options['offset'], None)
+            chunks = chunked(lines, batch_size, options['offset'])
+            if options['workers'] > 1:
+                # children must not share the parent's database connections
+                connections.close_all()
+                pool = Pool(options['workers'], initializer=django.setup)
+                parsed = pool.imap(parse_lines, chunks)
+            else:
+                parsed = map(parse_lines, chunks)
+
+            if options['defer_indexes']:
+                suspend_search_index(connection)
+            started = time.monotonic()
+            imported = failed = 0
+            position = options['offset']
+            try:
+                for rows, errors, last_line in parsed:
+                    create_tasks([Task(**row) for row in rows], batch_size=batch_size, using=using)
+                    imported += len(rows)
+                    failed += len(errors)
+                    position = last_line
+                    for line_no, error in errors[:5]:
+                        self.stderr.write(f"line {line_no}: {error}")
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f"{imported} imported, {failed} rejected, committed up to line {position} "
+                        f"({imported / elapsed if elapsed else 0:.0f} rows/s)"
+                    )
+            except BaseException:
+                self.stderr.write(f"Import interrupted, resume with --offset {position}")
+                raise
+            finally:
+                if pool is not None:
+                    pool.terminate()
+                if options['defer_indexes']:
+                    resume_search_index(connection)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} tasks ({failed} rejected) in {elapsed:.1f}s, "
+            f"{imported / elapsed if elapsed else 0:.0f} rows/s"
+        ))
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.models import TaskTombstone
+
+
+class Command(BaseCommand):
+    help = 'Delete task tombstones older than TASKS_TOMBSTONE_RETENTION_DAYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Retention in days (default: TASKS_TOMBSTONE_RETENTION_DAYS)')
+        parser.add_argument('--database', default=None, help='Database alias to prune')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.TASKS_TOMBSTONE_RETENTION_DAYS
+        cutoff = timezone.now() - timedelta(days=days)
+        deleted, _ = TaskTombstone.objects.using(options['database']).filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} task tombstones older than {days} days"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from tasks.models import TaskSummary
+
+
+class Command(BaseCommand):
+    help = 'Recompute the task summary counters from the tasks table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None, help='Database alias to rebuild')
+
+    def handle(self, *args, **options):
+        summary = TaskSummary.rebuild(using=options['database'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Task summary rebuilt: total={summary.total_tasks} "
+            f"completed={summary.completed_tasks} incomplete={summary.incomplete_tasks}"
+        ))
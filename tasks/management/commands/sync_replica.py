@@ -0,0 +1,41 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def copy_database(source, path):
+    """Copy the open SQLite `source` connection to the file at `path` with the online backup API."""
+    source.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database onto the SQLite replicas in REPLICA_DATABASES. '
+        'With --interval it keeps copying, so replicas lag the primary by up to that many seconds'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0, help='Seconds between copies, 0 copies once')
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        replicas = [alias for alias in settings.REPLICA_DATABASES if connections[alias].vendor == 'sqlite']
+        if primary.vendor != 'sqlite' or not replicas:
+            raise CommandError('sync_replica needs a SQLite primary and SQLite aliases in REPLICA_DATABASES')
+
+        while True:
+            started = time.monotonic()
+            for alias in replicas:
+                copy_database(primary, connections[alias].settings_dict['NAME'])
+            self.stdout.write(self.style.SUCCESS(f"Copied the primary to {', '.join(replicas)} in {time.monotonic() - started:.2f}s"))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:30
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_summary(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    TaskSummary = apps.get_model('tasks', 'TaskSummary')
+    db_alias = schema_editor.connection.alias
+    counts = Task.objects.using(db_alias).aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(completed=True)),
+    )
+    TaskSummary.objects.using(db_alias).create(
+        pk=1, total_tasks=counts['total'], completed_tasks=counts['completed']
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0002_alter_task_slug'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_tasks', models.BigIntegerField(default=0)),
+                ('completed_tasks', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'task summary',
+            },
+        ),
+        migrations.RunPython(backfill_summary, migrations.RunPython.noop),
+    ]
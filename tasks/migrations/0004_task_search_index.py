@@ -0,0 +1,77 @@
+from django.db import migrations
+
+# the DDL is frozen here rather than imported from tasks.search, so later
+# changes to the live search module cannot alter what this migration applies
+
+SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE tasks_task_fts USING fts5(
+        title, description,
+        content='tasks_task', content_rowid='id',
+        tokenize='unicode61', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER tasks_task_fts_ai AFTER INSERT ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER tasks_task_fts_ad AFTER DELETE ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts(tasks_task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER tasks_task_fts_au AFTER UPDATE OF title, description ON tasks_task
+    WHEN old.title IS NOT new.title OR old.description IS NOT new.description BEGIN
+        INSERT INTO tasks_task_fts(tasks_task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO tasks_task_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    "INSERT INTO tasks_task_fts(tasks_task_fts) VALUES ('rebuild')",
+]
+
+SQLITE_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS tasks_task_fts_ai",
+    "DROP TRIGGER IF EXISTS tasks_task_fts_ad",
+    "DROP TRIGGER IF EXISTS tasks_task_fts_au",
+    "DROP TABLE IF EXISTS tasks_task_fts",
+]
+
+POSTGRES_SETUP = [
+    "CREATE INDEX IF NOT EXISTS tasks_task_search_gin ON tasks_task USING GIN ("
+    "to_tsvector('simple', COALESCE(title, '') || ' ' || COALESCE(description, '')))",
+]
+
+POSTGRES_TEARDOWN = [
+    "DROP INDEX IF EXISTS tasks_task_search_gin",
+]
+
+
+def execute(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    # creates the FTS5 table + triggers (sqlite) or the GIN index (postgresql) and backfills it
+    execute(schema_editor, {'sqlite': SQLITE_SETUP, 'postgresql': POSTGRES_SETUP})
+
+
+def drop_search_index(apps, schema_editor):
+    execute(schema_editor, {'sqlite': SQLITE_TEARDOWN, 'postgresql': POSTGRES_TEARDOWN})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_tasksummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
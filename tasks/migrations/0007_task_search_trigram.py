@@ -0,0 +1,70 @@
+from django.db import migrations
+
+# the DDL is frozen here rather than imported from tasks.search, so later
+# changes to the live search module cannot alter what this migration applies
+
+# trigram tokens match any substring of 3+ characters, as the icontains scan
+# did before 0004; the triggers of 0004 write to the table by name and carry over
+SQLITE_SETUP = [
+    "DROP TABLE tasks_task_fts",
+    """
+    CREATE VIRTUAL TABLE tasks_task_fts USING fts5(
+        title, description,
+        content='tasks_task', content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    "INSERT INTO tasks_task_fts(tasks_task_fts) VALUES ('rebuild')",
+]
+
+SQLITE_TEARDOWN = [
+    "DROP TABLE tasks_task_fts",
+    """
+    CREATE VIRTUAL TABLE tasks_task_fts USING fts5(
+        title, description,
+        content='tasks_task', content_rowid='id',
+        tokenize='unicode61', prefix='2 3'
+    )
+    """,
+    "INSERT INTO tasks_task_fts(tasks_task_fts) VALUES ('rebuild')",
+]
+
+# icontains compiles to UPPER(column::text) LIKE UPPER(%s), index that expression
+POSTGRES_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS tasks_task_title_trgm ON tasks_task USING GIN (UPPER(title::text) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS tasks_task_description_trgm ON tasks_task "
+    "USING GIN (UPPER(description::text) gin_trgm_ops)",
+    "DROP INDEX IF EXISTS tasks_task_search_gin",
+]
+
+POSTGRES_TEARDOWN = [
+    "CREATE INDEX IF NOT EXISTS tasks_task_search_gin ON tasks_task USING GIN ("
+    "to_tsvector('simple', COALESCE(title, '') || ' ' || COALESCE(description, '')))",
+    "DROP INDEX IF EXISTS tasks_task_title_trgm",
+    "DROP INDEX IF EXISTS tasks_task_description_trgm",
+]
+
+
+def execute(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def use_trigram_index(apps, schema_editor):
+    execute(schema_editor, {'sqlite': SQLITE_SETUP, 'postgresql': POSTGRES_SETUP})
+
+
+def use_word_index(apps, schema_editor):
+    execute(schema_editor, {'sqlite': SQLITE_TEARDOWN, 'postgresql': POSTGRES_TEARDOWN})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_task_tombstone'),
+    ]
+
+    operations = [
+        migrations.RunPython(use_trigram_index, use_word_index),
+    ]
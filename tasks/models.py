@@ -1,5 +1,8 @@
 import uuid
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.db import models, router, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
 from django.utils.text import slugify
 
 # Create your models here.
@@ -13,13 +16,135 @@ class Task(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        # one (field, id) index per list ordering, plus a completed-prefixed twin
+        # for ?completed= so each page is an index range scan (see TaskListPagination)
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='task_created_id_idx'),
+            models.Index(fields=['completed', 'created_at', 'id'], name='task_done_created_id_idx'),
+            models.Index(fields=['updated_at', 'id'], name='task_updated_id_idx'),
+            models.Index(fields=['completed', 'updated_at', 'id'], name='task_done_updated_id_idx'),
+            models.Index(fields=['title', 'id'], name='task_title_id_idx'),
+            models.Index(fields=['completed', 'title', 'id'], name='task_done_title_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember the stored value so the summary counters can apply a delta on save
+        instance._loaded_completed = instance.__dict__.get('completed')
+        return instance
+
+    @staticmethod
+    def build_slug(title):
+        unique_id = str(uuid.uuid4())[:8]
+        return slugify(f"{title}-{unique_id}")
+
     def save(self, *args, **kwargs):
         if not self.slug:
-            unique_id = str(uuid.uuid4())[:8]
-            self.slug = slugify(f"{self.title}-{unique_id}")
-        super().save(*args, **kwargs)
+            self.slug = self.build_slug(self.title)
+        using = kwargs.get('using') or router.db_for_write(self.__class__, instance=self)
+        # the post_save receiver updates TaskSummary, keep both writes in one transaction
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic(using=using):
+            if not self._state.adding and (update_fields is None or 'completed' in update_fields):
+                self._loaded_completed = self.write_completed(using)
+            # post_save receivers read the previous value from _loaded_completed,
+            # it only moves on once every one of them has run
+            super().save(*args, **kwargs)
+        self._loaded_completed = self.completed
+
+    def write_completed(self, using):
+        """
+        Write `completed` ahead of the save and return the value it replaced.
+
+        The conditional UPDATE only matches while the stored value differs, and
+        it is evaluated against the row as committed (waiting out a concurrent
+        writer's lock), so of two saves flipping the same task only one sees a
+        row count and moves the summary counters. A read of the old value
+        outside the write would let both count the flip.
+        """
+        flipped = Task.objects.using(using).filter(pk=self.pk).exclude(completed=self.completed).update(completed=self.completed)
+        return not self.completed if flipped else self.completed
+
+
+class TaskSummary(models.Model):
+    """
+    Single row holding the task counters shown in the list `task_summary` block.
+    Kept up to date by the receivers in tasks/signals.py, rebuilt with
+    `python manage.py rebuild_task_summary`.
+    """
+    SINGLETON_ID = 1
+
+    total_tasks = models.BigIntegerField(default=0)
+    completed_tasks = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'task summary'
+
+    def __str__(self):
+        return f"{self.completed_tasks}/{self.total_tasks} completed"
+
+    @property
+    def incomplete_tasks(self):
+        return self.total_tasks - self.completed_tasks
+
+    @classmethod
+    def current(cls, using=None):
+        summary = cls.objects.using(using).filter(pk=cls.SINGLETON_ID).first()
+        if summary is None:
+            summary = cls.rebuild(using=using)
+        return summary
+
+    @classmethod
+    async def acurrent(cls, using=None):
+        summary = await cls.objects.using(using).filter(pk=cls.SINGLETON_ID).afirst()
+        if summary is None:
+            summary = await sync_to_async(cls.rebuild)(using=using)
+        return summary
+
+    @classmethod
+    def apply_delta(cls, total=0, completed=0, using=None):
+        if not total and not completed:
+            return
+        updated = cls.objects.using(using).filter(pk=cls.SINGLETON_ID).update(
+            total_tasks=F('total_tasks') + total,
+            completed_tasks=F('completed_tasks') + completed,
+        )
+        if not updated:
+            # row missing (fresh db or flushed table), the rebuild already sees this write
+            cls.rebuild(using=using)
+
+    @classmethod
+    def rebuild(cls, using=None):
+        using = using or router.db_for_write(cls)
+        with transaction.atomic(using=using):
+            counts = Task.objects.using(using).aggregate(
+                total=Count('id'),
+                completed=Count('id', filter=Q(completed=True)),
+            )
+            summary, _ = cls.objects.using(using).update_or_create(
+                pk=cls.SINGLETON_ID,
+                defaults={'total_tasks': counts['total'], 'completed_tasks': counts['completed']},
+            )
+        return summary
 
+
+class TaskTombstone(models.Model):
+    """
+    Marker left behind by every task delete so /api/tasks/changes/ can tell
+    mirrors what to drop. Pruned after TASKS_TOMBSTONE_RETENTION_DAYS with
+    `python manage.py prune_task_tombstones`.
+    """
+    task_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"task {self.task_id} deleted at {self.deleted_at}"
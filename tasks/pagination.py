@@ -0,0 +1,177 @@
+import json
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .models import Task
+
+
+class TaskListPagination(pagination.CursorPagination):
+    """
+    Keyset pagination over `(<ordering field>, id)`.
+
+    The cursor carries the last row's sort value *and* id, so rows sharing a
+    timestamp are never skipped or repeated, and every page is a range scan on
+    one of the composite indexes declared on Task.Meta instead of an OFFSET.
+
+    Cursors also carry `count`, the exact filtered count set by the view, so
+    the later pages of a scroll read it back as `cursor_count` instead of
+    counting again.
+    """
+    count = None
+    cursor_count = None
+    ordering = '-created_at'
+    page_size = 10
+    ordering_param = 'ordering'
+    ordering_fields = ('created_at', 'updated_at', 'title')
+    tie_breaker = 'id'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get(self.ordering_param, '').strip()
+        if ordering.lstrip('-') not in self.ordering_fields:
+            # full-text search results default to most relevant first
+            if 'search_rank' in queryset.query.annotations:
+                ordering = '-search_rank'
+            else:
+                ordering = self.ordering
+        direction = '-' if ordering.startswith('-') else ''
+        return (ordering, direction + self.tie_breaker)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, fetching the page with the async ORM."""
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        return self.set_page([obj async for obj in page_queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        if self.cursor is None:
+            self.reverse, self.position = False, None
+        else:
+            self.reverse, self.position = self.cursor.reverse, self._decode_position(self.cursor.position)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = tuple(_reverse_order(field) for field in ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self._seek(ordering, self.position))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = self.position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+        return self.page
+
+    def paginate_values(self, queryset, request, *fields, view=None):
+        """Same page as paginate_queryset(), as dicts holding only `fields` (plus the cursor columns)."""
+        return self.paginate_queryset(self._values(queryset, request, fields, view), request, view=view)
+
+    async def apaginate_values(self, queryset, request, *fields, view=None):
+        return await self.apaginate_queryset(self._values(queryset, request, fields, view), request, view=view)
+
+    def _values(self, queryset, request, fields, view):
+        ordering = self.get_ordering(request, queryset, view)
+        names = dict.fromkeys([*fields, ordering[0].lstrip('-'), self.tie_breaker])
+        return queryset.values(*names)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(pagination.Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(pagination.Cursor(offset=0, reverse=True, position=position))
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None:
+            return None
+        # super() validated the encoding already
+        querystring = b64decode(request.query_params[self.cursor_query_param].encode('ascii')).decode('ascii')
+        count = parse.parse_qs(querystring).get('c', [None])[0]
+        if count is not None:
+            if not count.isdigit():
+                raise NotFound(self.invalid_cursor_message)
+            self.cursor_count = int(count)
+        return cursor
+
+    def encode_cursor(self, cursor):
+        tokens = {}
+        if cursor.reverse:
+            tokens['r'] = '1'
+        if cursor.position is not None:
+            tokens['p'] = cursor.position
+        if self.count is not None:
+            tokens['c'] = str(self.count)
+        encoded = b64encode(parse.urlencode(tokens).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_position_from_instance(self, instance, ordering):
+        field_name = ordering[0].lstrip('-')
+        if isinstance(instance, dict):
+            value, pk = instance[field_name], instance[self.tie_breaker]
+        else:
+            value, pk = getattr(instance, field_name), getattr(instance, self.tie_breaker)
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        return json.dumps([value, pk])
+
+    def _decode_position(self, position):
+        field_name = self.ordering[0].lstrip('-')
+        try:
+            value, pk = json.loads(position)
+            if field_name == 'search_rank':
+                value = float(value)
+            else:
+                value = Task._meta.get_field(field_name).to_python(value)
+            return value, int(pk)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _seek(self, ordering, position):
+        # `field <= v AND (field < v OR id < pk)` keeps the leading column a plain
+        # range bound, so the planner walks the composite index from the cursor on
+        field, tie_breaker = (name.lstrip('-') for name in ordering)
+        lookup = 'lt' if ordering[0].startswith('-') else 'gt'
+        value, pk = position
+        return Q(**{f'{field}__{lookup}e': value}) & (
+            Q(**{f'{field}__{lookup}': value}) | Q(**{f'{tie_breaker}__{lookup}': pk})
+        )
+
+
+def _reverse_order(field):
+    return field[1:] if field.startswith('-') else '-' + field
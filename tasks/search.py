@@ -0,0 +1,160 @@
+"""
+Full-text search over Task.title and Task.description.
+
+`?search=` keeps its substring contract: a task matches when its title or
+description contains the whole search string, case-insensitively. SQLite
+answers that from the `tasks_task_fts` FTS5 table (trigram tokens, kept in
+sync by triggers), PostgreSQL from pg_trgm GIN indexes under icontains, both
+set up by migrations 0004 and 0007. Searches shorter than a trigram and other
+backends fall back to the plain icontains scan.
+"""
+
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'tasks_task_fts'
+
+# the schema of migrations 0004 and 0007, suspend/resume_search_index() recreate parts of it
+SQLITE_SETUP = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, description,
+        content='tasks_task', content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON tasks_task BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON tasks_task BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF title, description ON tasks_task
+    WHEN old.title IS NOT new.title OR old.description IS NOT new.description BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+SQLITE_REBUILD = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+SQLITE_TEARDOWN = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_SETUP = [
+    "CREATE INDEX IF NOT EXISTS tasks_task_title_trgm ON tasks_task USING GIN (UPPER(title::text) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS tasks_task_description_trgm ON tasks_task "
+    "USING GIN (UPPER(description::text) gin_trgm_ops)",
+]
+
+POSTGRES_TEARDOWN = [
+    "DROP INDEX IF EXISTS tasks_task_title_trgm",
+    "DROP INDEX IF EXISTS tasks_task_description_trgm",
+]
+
+# trigram tokens cannot match anything shorter
+MIN_INDEXED_LENGTH = 3
+
+
+def sqlite_match(search):
+    """`search` as one FTS5 phrase, which the trigram tokenizer matches as a substring."""
+    if len(search) < MIN_INDEXED_LENGTH:
+        return None
+    return '"' + search.replace('"', '""') + '"'
+
+
+def _sqlite_rank(connection):
+    # bm25() is lower-is-better, negate it so every backend sorts rank descending
+    if connection.Database.sqlite_version_info < (3, 35):
+        return (
+            f"SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = \"tasks_task\".\"id\""
+        )
+    # a correlated MATCH re-runs the full-text query for every matching row, a
+    # materialized CTE runs it once and is probed through an automatic index
+    return (
+        f"WITH ranked AS MATERIALIZED (SELECT rowid AS id, -bm25({FTS_TABLE}) AS rank "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s) "
+        f"SELECT rank FROM ranked WHERE ranked.id = \"tasks_task\".\"id\""
+    )
+
+
+def search_tasks(queryset, search):
+    """
+    Filter `queryset` down to tasks whose title or description contains
+    `search` and annotate them with `search_rank`, higher is more relevant.
+    """
+    connection = connections[queryset.db]
+    vendor = connection.vendor
+    match = sqlite_match(search) if vendor == 'sqlite' else None
+
+    if match is not None:
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        ).annotate(search_rank=RawSQL(_sqlite_rank(connection), [match], output_field=FloatField()))
+
+    queryset = queryset.filter(Q(title__icontains=search) | Q(description__icontains=search))
+    if vendor == 'postgresql':
+        return queryset.annotate(search_rank=RawSQL(
+            "word_similarity(%s, COALESCE(\"tasks_task\".\"title\", '') || ' ' || "
+            "COALESCE(\"tasks_task\".\"description\", ''))",
+            [search], output_field=FloatField(),
+        ))
+    return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def estimate_matches(search, limit, using):
+    """
+    Estimated number of tasks matching `search` from the SQLite index alone:
+    the first `limit` matches in rowid order, scaled by the share of the id
+    range they cover. Exact when fewer than `limit` match. None when there
+    is no such index to probe.
+    """
+    connection = connections[using]
+    match = sqlite_match(search) if connection.vendor == 'sqlite' else None
+    if match is None:
+        return None
+    with connection.cursor() as cursor:
+        # single MIN()/MAX() subqueries are rowid lookups, the MATCH stops at `limit`
+        cursor.execute(
+            f"SELECT COUNT(*), MAX(rowid), (SELECT MIN(id) FROM tasks_task), (SELECT MAX(id) FROM tasks_task) "
+            f"FROM (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rowid LIMIT %s)",
+            [match, limit],
+        )
+        matched, last_id, first_id, max_id = cursor.fetchone()
+    if matched < limit:
+        return matched
+    return round(matched * (max_id - first_id + 1) / (last_id - first_id + 1))
+
+
+def _execute(connection, statements):
+    with connection.cursor() as cursor:
+        for statement in statements.get(connection.vendor, []):
+            cursor.execute(statement)
+
+
+def suspend_search_index(connection):
+    """
+    Stop maintaining the index on writes (for bulk loads), resume_search_index()
+    rebuilds it in one pass afterwards.
+    """
+    _execute(connection, {'sqlite': SQLITE_TEARDOWN[:-1], 'postgresql': POSTGRES_TEARDOWN})
+
+
+def resume_search_index(connection):
+    _execute(connection, {'sqlite': SQLITE_SETUP[1:] + [SQLITE_REBUILD], 'postgresql': POSTGRES_SETUP})
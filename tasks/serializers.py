@@ -1,8 +1,74 @@
 from .models import Task
 
-from rest_framework import serializers
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .formatting import format_datetime
 
 class TaskSerializer(serializers.ModelSerializer):
     class Meta:
         model = Task
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+def _identity(field):
+    # to_representation() is a no-op for the Python types these columns come back as
+    return isinstance(field, (serializers.CharField, serializers.BooleanField, serializers.IntegerField))
+
+
+def _converter(field):
+    """None for pass-through values, else a `convert(value, tz)` callable."""
+    if _identity(field):
+        return None
+    if isinstance(field, serializers.DateTimeField) and not hasattr(field, 'timezone'):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        if isinstance(output_format, str) and output_format.lower() == ISO_8601:
+            return format_datetime
+    to_representation = field.to_representation
+    return lambda value, tz: to_representation(value)
+
+
+class TaskValuesSerializer:
+    """
+    Renders `values()` rows exactly as TaskSerializer(many=True).data would
+    render Task instances, without building models or running DRF fields.
+    Converters are resolved once from TaskSerializer's fields; `fields`
+    narrows the output (and the selected columns) to a sparse fieldset.
+    """
+    declared_fields = tuple(TaskSerializer().fields)
+    # needed for the list ETag / Last-Modified whatever the fieldset
+    validator_fields = ('id', 'updated_at')
+
+    def __init__(self, fields=None):
+        declared = TaskSerializer().fields
+        self.fields = [name for name in declared if fields is None or name in fields]
+        self.converters = [(name, _converter(declared[name])) for name in self.fields]
+
+    @classmethod
+    def parse_fields(cls, value):
+        """`?fields=` as a set of field names, None when absent. Raises ValueError on unknown names."""
+        if not value:
+            return None
+        fields = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = fields.difference(cls.declared_fields)
+        if unknown or not fields:
+            raise ValueError(f"fields must be a comma separated subset of {', '.join(cls.declared_fields)}")
+        return fields
+
+    @property
+    def select_fields(self):
+        return list(dict.fromkeys([*self.fields, *self.validator_fields]))
+
+    def to_representation(self, rows):
+        converters = self.converters
+        # resolved once per page rather than per datetime value
+        tz = timezone.get_current_timezone()
+        return [
+            {
+                name: value if convert is None or value is None else convert(value, tz)
+                for name, convert in converters
+                for value in (row[name],)
+            }
+            for row in rows
+        ]
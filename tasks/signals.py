@@ -0,0 +1,97 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from . import cache, stream
+from .models import Task, TaskSummary, TaskTombstone
+
+# sent by tasks.bulk with action='create'|'update'|'delete', tasks=[...], using=alias,
+# and for updates previous={task id: completed before the write}
+tasks_bulk_changed = Signal()
+
+BULK_EVENT_KINDS = {'create': 'created', 'update': 'updated', 'delete': 'deleted'}
+
+
+# receivers only read `_loaded_completed` (the value before this save), Task.save
+# moves it on after all of them ran
+@receiver(post_save, sender=Task)
+def stream_task_saved(sender, instance, created, using, **kwargs):
+    event = stream.task_event('created' if created else 'updated', instance, getattr(instance, '_loaded_completed', None))
+    if event is not None:
+        transaction.on_commit(partial(stream.publish, event), using=using)
+
+
+@receiver(post_delete, sender=Task)
+def stream_task_deleted(sender, instance, using, **kwargs):
+    event = stream.task_event('deleted', instance)
+    if event is not None:
+        transaction.on_commit(partial(stream.publish, event), using=using)
+
+
+@receiver(tasks_bulk_changed, sender=Task)
+def stream_bulk_change(sender, action, tasks, using, previous=None, **kwargs):
+    previous = previous or {}
+    events = [stream.task_event(BULK_EVENT_KINDS[action], task, previous.get(task.id)) for task in tasks]
+    events = [event for event in events if event is not None]
+    if events:
+        transaction.on_commit(partial(_publish_all, events), using=using)
+
+
+def _publish_all(events):
+    for event in events:
+        stream.publish(event)
+
+
+@receiver(post_save, sender=Task)
+def update_summary_on_save(sender, instance, created, using, update_fields=None, **kwargs):
+    if created:
+        TaskSummary.apply_delta(total=1, completed=int(instance.completed), using=using)
+    elif update_fields is None or 'completed' in update_fields:
+        previous = getattr(instance, '_loaded_completed', None)
+        if previous is not None and previous != instance.completed:
+            TaskSummary.apply_delta(completed=1 if instance.completed else -1, using=using)
+
+
+@receiver(post_delete, sender=Task)
+def update_summary_on_delete(sender, instance, using, **kwargs):
+    # sent inside the deletion transaction for Model.delete() and QuerySet.delete() alike
+    TaskSummary.apply_delta(total=-1, completed=-int(instance.completed), using=using)
+
+
+@receiver(tasks_bulk_changed, sender=Task)
+def update_summary_on_bulk_change(sender, action, tasks, using, previous=None, **kwargs):
+    completed = sum(task.completed for task in tasks)
+    if action == 'create':
+        TaskSummary.apply_delta(total=len(tasks), completed=completed, using=using)
+    elif action == 'update':
+        before = sum(bool(previous[task.id]) for task in tasks)
+        TaskSummary.apply_delta(completed=completed - before, using=using)
+    elif action == 'delete':
+        TaskSummary.apply_delta(total=-len(tasks), completed=-completed, using=using)
+
+
+@receiver(post_delete, sender=Task)
+def record_tombstone(sender, instance, using, **kwargs):
+    TaskTombstone.objects.using(using).create(task_id=instance.id)
+
+
+@receiver(tasks_bulk_changed, sender=Task)
+def record_bulk_tombstones(sender, action, tasks, using, **kwargs):
+    if action == 'delete':
+        now = timezone.now()
+        TaskTombstone.objects.using(using).bulk_create(
+            [TaskTombstone(task_id=task.id, deleted_at=now) for task in tasks]
+        )
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(tasks_bulk_changed, sender=Task)
+def invalidate_task_cache(sender, using, **kwargs):
+    # bump now so reads inside this transaction miss, and again once committed to
+    # drop anything other requests cached from the pre-commit state meanwhile
+    cache.bump_generation()
+    transaction.on_commit(cache.bump_generation, using=using)
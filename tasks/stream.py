@@ -0,0 +1,304 @@
+"""
+Push stream of task create/update/delete events for /api/tasks/stream/.
+
+Writes publish a TaskEvent once their transaction commits (tasks/signals.py).
+The process-wide Broker fans each event out to the subscribed SSE responses,
+which live on the ASGI event loop. Each subscriber has a bounded queue: a
+client that cannot keep up gets its backlog replaced by a single `resync`
+event instead of growing memory or slowing the other subscribers.
+
+Where events come from is the backend's job (TASKS_STREAM_BACKEND):
+
+* LocalBackend: events published by this process only (one worker).
+* ChangesFeedBackend: each process polls the /api/tasks/changes/ feed while it
+  has subscribers, so writes made by any worker reach every worker. It is a
+  database-backed stand-in for a real pub/sub transport.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import changes
+from .serializers import TaskSerializer, TaskValuesSerializer
+
+logger = logging.getLogger(__name__)
+
+RESYNC_FRAME = b'event: resync\ndata: {}\n\n'
+KEEPALIVE_FRAME = b': keep-alive\n\n'
+
+
+def search_text(title, description):
+    return (title.lower(), (description or '').lower())
+
+
+class TaskEvent:
+    """
+    One change, serialized once whatever the number of subscribers. `text`
+    (lowercased title and description) and `completed` are kept for
+    server-side filtering; `previous_completed` lets a filtered subscriber see
+    a task leave its set. None means unknown, and the event is delivered.
+    """
+
+    def __init__(self, kind, task_id, data=None, completed=None, previous_completed=None, text=None):
+        self.kind = kind
+        self.task_id = task_id
+        self.data = data
+        self.completed = completed
+        self.previous_completed = previous_completed
+        self.text = text
+
+    @classmethod
+    def from_task(cls, kind, task, previous_completed=None):
+        loaded = task.__dict__
+        text = None
+        if 'title' in loaded and 'description' in loaded:
+            text = search_text(task.title, task.description)
+        return cls(
+            kind,
+            task.id,
+            data=TaskSerializer(task).data if kind != 'deleted' else None,
+            completed=loaded.get('completed'),
+            previous_completed=previous_completed,
+            text=text,
+        )
+
+    def frame(self, sequence):
+        payload = json.dumps({'type': self.kind, 'id': self.task_id, 'task': self.data})
+        return f'id: {sequence}\nevent: {self.kind}\ndata: {payload}\n\n'.encode()
+
+
+class Subscription:
+    def __init__(self, completed=None, search=None, queue_size=100):
+        self.completed = completed
+        self.search = search.lower() if search else None
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.resyncs = 0
+
+    def matches(self, event):
+        if self.completed is not None and event.completed is not None:
+            if self.completed not in (event.completed, event.previous_completed):
+                return False
+        if self.search and event.text is not None:
+            # the substring test of ?search= on the list
+            return any(self.search in field for field in event.text)
+        return True
+
+    def put(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # too slow to keep up: drop the backlog, the client refetches instead
+            self.resync()
+
+    def resync(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(RESYNC_FRAME)
+        self.resyncs += 1
+
+    async def frames(self, keepalive):
+        while True:
+            try:
+                # asyncio.timeout only arms a timer, wait_for would start a task per frame
+                async with asyncio.timeout(keepalive):
+                    frame = await self.queue.get()
+            except TimeoutError:
+                frame = KEEPALIVE_FRAME
+            yield frame
+
+
+class Broker:
+    """
+    Subscriptions of this process, all owned by one event loop. publish()
+    and deliver() may be called from any thread.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.subscriptions = set()
+        self.loop = None
+        self.sequence = 0
+        self.published = 0
+        self.delivered = 0
+
+    @property
+    def wants_local_events(self):
+        return bool(self.subscriptions) and self.backend.local_events
+
+    def subscribe(self, completed=None, search=None):
+        if len(self.subscriptions) >= settings.TASKS_STREAM_MAX_SUBSCRIBERS:
+            return None
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            # first subscriber, or the previous loop went away (tests, reloads)
+            self.subscriptions.clear()
+            self.backend.stop(self)
+            self.loop = loop
+        subscription = Subscription(completed, search, settings.TASKS_STREAM_QUEUE_SIZE)
+        self.subscriptions.add(subscription)
+        if len(self.subscriptions) == 1:
+            self.backend.start(self)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.discard(subscription)
+        if not self.subscriptions:
+            self.backend.stop(self)
+
+    def publish(self, event):
+        self.backend.publish(self, event)
+
+    def deliver(self, event):
+        loop = self.loop
+        if loop is None or not self.subscriptions:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self.fanout(event)
+            return
+        try:
+            loop.call_soon_threadsafe(self.fanout, event)
+        except RuntimeError:
+            # loop closed under us, nobody is listening any more
+            self.loop = None
+
+    def fanout(self, event):
+        self.sequence += 1
+        self.published += 1
+        frame = event.frame(self.sequence)
+        for subscription in list(self.subscriptions):
+            if subscription.matches(event):
+                subscription.put(frame)
+                self.delivered += 1
+
+    def stats(self):
+        return {
+            'subscribers': len(self.subscriptions),
+            'published': self.published,
+            'delivered': self.delivered,
+            'resyncs': sum(subscription.resyncs for subscription in self.subscriptions),
+        }
+
+
+class LocalBackend:
+    """Events published by this process, for single-worker deployments."""
+    local_events = True
+
+    def publish(self, broker, event):
+        broker.deliver(event)
+
+    def start(self, broker):
+        pass
+
+    def stop(self, broker):
+        pass
+
+
+class ChangesFeedBackend:
+    """
+    Polls the changes feed every TASKS_STREAM_POLL_SECONDS while the process
+    has subscribers, so every worker sees every worker's writes. Local
+    publishes are ignored, they arrive through the feed like everyone else's.
+    Events are delayed by the poll interval plus TASKS_CHANGES_SETTLE_SECONDS.
+
+    A failing poll is logged and retried from the same position with doubling
+    delays up to `max_backoff` seconds. A position the feed no longer accepts
+    restarts the feed from now and sends every subscriber a resync.
+    """
+    local_events = False
+    batch_size = 500
+    max_backoff = 30
+
+    def __init__(self):
+        self.task = None
+
+    def publish(self, broker, event):
+        pass
+
+    def start(self, broker):
+        # position taken now, not when the task first runs, so nothing written after subscribing is missed
+        token = changes.token_at(timezone.now())
+        self.task = asyncio.get_running_loop().create_task(self.poll(broker, token))
+
+    def stop(self, broker):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def poll(self, broker, token):
+        serializer = TaskValuesSerializer()
+        failures = 0
+        while True:
+            try:
+                token, has_more = await self.fetch(broker, token, serializer)
+            except (changes.InvalidToken, changes.ExpiredToken):
+                logger.exception("Task stream lost its changes feed position, resyncing subscribers")
+                token = changes.token_at(timezone.now())
+                for subscription in list(broker.subscriptions):
+                    subscription.resync()
+                continue
+            except Exception:
+                failures += 1
+                delay = min(settings.TASKS_STREAM_POLL_SECONDS * 2 ** failures, self.max_backoff)
+                logger.exception("Task stream poll failed, retrying in %.1fs", delay)
+                await sync_to_async(close_old_connections)()
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+            if not has_more:
+                await asyncio.sleep(settings.TASKS_STREAM_POLL_SECONDS)
+
+    async def fetch(self, broker, token, serializer):
+        """Fan out one batch of the feed after `token`, returns the next token and whether more is waiting."""
+        (since, _), _ = changes.decode_token(token)
+        rows, tombstones, token, has_more = await sync_to_async(changes.changes_since)(
+            token, self.batch_size, *serializer.select_fields
+        )
+        for row, data in zip(rows, serializer.to_representation(rows)):
+            broker.fanout(TaskEvent(
+                # created after the previous position, otherwise an update
+                'created' if row['created_at'] > since else 'updated',
+                row['id'],
+                data=data,
+                completed=row['completed'],
+                text=search_text(row['title'], row['description']),
+            ))
+        for task_id, _ in tombstones:
+            broker.fanout(TaskEvent('deleted', task_id))
+        return token, has_more
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = Broker(import_string(settings.TASKS_STREAM_BACKEND)())
+        return _broker
+
+
+def task_event(kind, task, previous_completed=None):
+    """
+    The event for a task write, built while the instance still holds its id,
+    or None when nobody in this process listens for local events.
+    """
+    if not get_broker().wants_local_events:
+        return None
+    return TaskEvent.from_task(kind, task, previous_completed)
+
+
+def publish(event):
+    get_broker().publish(event)
@@ -1,13 +1,49 @@
+import asyncio
+import base64
+import csv
 import json
-from django.test import TestCase
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from django.core.cache import cache as django_cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.http import HttpResponse
+from django.db import OperationalError, connection, transaction
+from django.db.models.signals import post_save
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
 from django.urls import reverse, NoReverseMatch
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from unittest.mock import patch, MagicMock
-from .models import Task
-from .serializers import TaskSerializer
-from .views import TaskView, TaskListPagination
+from . import cache as task_cache, changes, conditional, stream
+from .bulk import PATCH_RETRIES, create_tasks, delete_tasks, patch_task, update_task, update_tasks
+from .search import search_tasks
+from .models import Task, TaskSummary, TaskTombstone
+from .signals import tasks_bulk_changed
+from .checks import check_task_cache_is_shared
+from authentication.utils import create_tokens_for_user
+from zippee_assessment.authentication import user_state
+from .serializers import TaskSerializer, TaskValuesSerializer
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from .views import TaskBulkView, TaskExportView, TaskView, TaskListPagination
+from .async_views import AsyncTaskView
+from zippee_assessment.middleware import QueryBudgetExceeded, ReplicaRoutingMiddleware, query_budget
+from zippee_assessment import routers
+from zippee_assessment.routers import PrimaryReplicaRouter
+from zippee_assessment.write_queue import WriteQueue
+from .management.commands.sync_replica import copy_database
 
 User = get_user_model()
 
@@ -433,6 +469,1637 @@ class TaskSerializerTestCase(TestCase):
         self.assertFalse(serializer.is_valid())
 
 
+class TaskSummaryTestCase(APITestCase):
+    """Test cases for the incrementally maintained TaskSummary counters"""
+
+    def assertSummary(self, total, completed):
+        summary = TaskSummary.current()
+        self.assertEqual(summary.total_tasks, total)
+        self.assertEqual(summary.completed_tasks, completed)
+        self.assertEqual(summary.incomplete_tasks, total - completed)
+
+    def test_create_update_delete_keep_counters_in_sync(self):
+        """Test counters follow create, completed toggles and deletes"""
+        task = Task.objects.create(title="Counter Task")
+        Task.objects.create(title="Done Task", completed=True)
+        self.assertSummary(2, 1)
+
+        task.completed = True
+        task.save()
+        self.assertSummary(2, 2)
+
+        task.title = "Renamed"
+        task.save()
+        self.assertSummary(2, 2)
+
+        task.delete()
+        self.assertSummary(1, 1)
+
+    def test_reloaded_instance_update(self):
+        """Test toggling completed on a freshly fetched task"""
+        task_id = Task.objects.create(title="Fetched", completed=True).id
+        task = Task.objects.get(id=task_id)
+        task.completed = False
+        task.save(update_fields=['completed', 'updated_at'])
+        self.assertSummary(1, 0)
+
+    def test_stale_instances_flip_once(self):
+        """Test two saves that both loaded completed=False count the flip once"""
+        task_id = Task.objects.create(title="Raced").id
+        first, second = Task.objects.get(id=task_id), Task.objects.get(id=task_id)
+        first.completed = second.completed = True
+        first.save()
+        second.save()
+        self.assertSummary(1, 1)
+
+        # and a stale instance flipping back still counts against the stored value
+        first.completed = False
+        first.save()
+        second.completed = False
+        second.title = "Raced again"
+        second.save()
+        self.assertSummary(1, 0)
+
+    def test_queryset_delete_updates_counters(self):
+        """Test bulk queryset deletes (admin action path) decrement the counters"""
+        for i in range(3):
+            Task.objects.create(title=f"Bulk {i}", completed=i % 2 == 0)
+        Task.objects.filter(completed=True).delete()
+        self.assertSummary(1, 0)
+
+    def test_rebuild_command_fixes_drift(self):
+        """Test rebuild_task_summary recomputes counters from the tasks table"""
+        Task.objects.create(title="One", completed=True)
+        Task.objects.create(title="Two")
+        TaskSummary.objects.update(total_tasks=100, completed_tasks=7)
+
+        out = StringIO()
+        call_command('rebuild_task_summary', stdout=out)
+
+        self.assertSummary(2, 1)
+        self.assertIn('total=2', out.getvalue())
+
+    def test_list_reads_summary_row(self):
+        """Test the list endpoint reports the stored counters"""
+        Task.objects.create(title="Listed", completed=True)
+        Task.objects.create(title="Listed too")
+
+        response = self.client.get('/api/tasks/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['task_summary']['total_tasks'], 2)
+        self.assertEqual(response.data['task_summary']['completed_tasks'], 1)
+        self.assertEqual(response.data['task_summary']['incomplete_tasks'], 1)
+
+
+class TaskSearchTestCase(APITestCase):
+    """Test cases for the full-text ?search= backend"""
+
+    def setUp(self):
+        self.alpha = Task.objects.create(title="Quarterly report", description="Finance numbers")
+        self.beta = Task.objects.create(title="Groceries", description="Buy milk for the report party")
+        self.gamma = Task.objects.create(title="Report report", description="report the report")
+
+    def search(self, term, **params):
+        response = self.client.get('/api/tasks/', {'search': term, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_search_matches_title_and_description(self):
+        """Test every task mentioning the word is returned"""
+        response = self.search('report')
+        ids = {task['id'] for task in response.data['results']}
+        self.assertEqual(ids, {self.alpha.id, self.beta.id, self.gamma.id})
+        self.assertEqual(response.data['task_summary']['filtered_count'], 3)
+
+    def test_search_results_are_ranked(self):
+        """Test the most relevant task is listed first"""
+        response = self.search('report')
+        self.assertEqual(response.data['results'][0]['id'], self.gamma.id)
+
+    def test_search_matches_the_whole_string(self):
+        """Test the search string matches as one substring, spaces included"""
+        response = self.search('rly rep')
+        self.assertEqual([task['id'] for task in response.data['results']], [self.alpha.id])
+        self.assertEqual(self.search('report quarterly').data['results'], [])
+
+    def test_search_matches_inside_words(self):
+        """Test the old substring contract: 'PORT' finds every 'report', whatever the case"""
+        response = self.search('PORT')
+        self.assertEqual(
+            {task['id'] for task in response.data['results']}, {self.alpha.id, self.beta.id, self.gamma.id}
+        )
+
+    def test_short_search_falls_back_to_substring(self):
+        """Test searches shorter than a trigram still match"""
+        response = self.search('ly')
+        self.assertEqual([task['id'] for task in response.data['results']], [self.alpha.id])
+
+    def test_search_index_follows_updates_and_deletes(self):
+        """Test the index is kept in sync with writes"""
+        self.beta.description = "Buy bread"
+        self.beta.save()
+        self.gamma.delete()
+
+        response = self.search('report')
+        self.assertEqual([task['id'] for task in response.data['results']], [self.alpha.id])
+
+    def test_search_combined_with_completed_filter(self):
+        """Test search and completed filters combine"""
+        self.alpha.completed = True
+        self.alpha.save()
+
+        response = self.search('report', completed='true')
+        self.assertEqual([task['id'] for task in response.data['results']], [self.alpha.id])
+
+    def test_search_rank_runs_the_match_once(self):
+        """Test the rank comes from one materialized MATCH probed by id, not a MATCH per matching row"""
+        if connection.vendor != 'sqlite' or sqlite3.sqlite_version_info < (3, 35):
+            self.skipTest("materialized CTEs need SQLite 3.35")
+        queryset = search_tasks(Task.objects.all(), 'report').order_by('-search_rank')
+        plan = queryset.explain()
+        self.assertIn('MATERIALIZE ranked', plan)
+        self.assertRegex(plan, r'SEARCH ranked USING AUTOMATIC (COVERING )?INDEX')
+        self.assertEqual([task.id for task in queryset][0], self.gamma.id)
+
+    def test_search_quotes_do_not_break_the_match_syntax(self):
+        """Test punctuation and quotes are matched literally, not parsed as FTS query syntax"""
+        Task.objects.create(title='C++ "quoted"')
+        self.assertEqual(len(self.search('++').data['results']), 1)
+        self.assertEqual(len(self.search('+ "quo').data['results']), 1)
+
+
+class TaskKeysetPaginationTestCase(APITestCase):
+    """Test cases for the (field, id) keyset cursor"""
+
+    def setUp(self):
+        for i in range(25):
+            Task.objects.create(title=f"Task {i:02d}", completed=i % 2 == 0)
+        # every row shares one timestamp, the old single-column cursor broke on this
+        Task.objects.update(created_at=timezone.now())
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [task['id'] for task in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_pages_with_tied_timestamps_are_complete(self):
+        """Test no row is skipped or repeated when created_at ties"""
+        ids = self.walk('/api/tasks/')
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_completed_filter_pages(self):
+        """Test walking a filtered list"""
+        ids = self.walk('/api/tasks/?completed=true')
+        self.assertEqual(ids, list(Task.objects.filter(completed=True).order_by('-id').values_list('id', flat=True)))
+
+    def test_ordering_param(self):
+        """Test ?ordering= selects the sort column and direction"""
+        titles = [Task.objects.get(id=i).title for i in self.walk('/api/tasks/?ordering=title')]
+        self.assertEqual(titles, sorted(titles))
+        ids = self.walk('/api/tasks/?ordering=-updated_at')
+        self.assertEqual(len(set(ids)), 25)
+
+    def test_invalid_ordering_falls_back_to_default(self):
+        """Test unknown ordering values are ignored"""
+        response = self.client.get('/api/tasks/?ordering=description')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['id'], Task.objects.order_by('-id').first().id)
+
+    def test_previous_link_returns_previous_page(self):
+        """Test following next then previous lands on the first page again"""
+        first = self.client.get('/api/tasks/')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [task['id'] for task in back.data['results']],
+            [task['id'] for task in first.data['results']],
+        )
+        self.assertIsNone(back.data['previous'])
+
+    def test_invalid_cursor(self):
+        """Test a garbage cursor is rejected"""
+        response = self.client.get('/api/tasks/?cursor=bm90LWEtY3Vyc29y')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_query_uses_composite_index(self):
+        """Test a deep page is an index range scan without a sort step"""
+        if connection.vendor != 'sqlite':
+            self.skipTest("query plan assertions are written for SQLite")
+        task = Task.objects.order_by('-created_at', '-id')[12]
+        paginator = TaskListPagination()
+        queryset = Task.objects.filter(completed=True).order_by('-created_at', '-id').filter(
+            paginator._seek(('-created_at', '-id'), (task.created_at, task.id))
+        )
+        plan = queryset[:11].explain()
+        self.assertRegex(plan, r'USING (COVERING )?INDEX task_(done_)?created_id_idx')
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class TaskBulkViewTestCase(APITestCase):
+    """Test cases for the /tasks/bulk/ endpoints"""
+
+    url = '/api/tasks/bulk/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='bulk-user@test.com', password='testpass123')
+        self.manager = User.objects.create_user(email='bulk-manager@test.com', password='testpass123')
+        User.objects.filter(pk=self.manager.pk).update(role='MANAGER')
+        self.manager.refresh_from_db()
+        self.task1 = Task.objects.create(title="Existing 1")
+        self.task2 = Task.objects.create(title="Existing 2", completed=True)
+
+    def test_bulk_create(self):
+        """Test creating many tasks in one request"""
+        self.client.force_authenticate(user=self.user)
+        payload = [{'title': f'Bulk {i}', 'completed': i == 0} for i in range(5)]
+
+        with self.assertNumQueries(6):  # one INSERT, one summary UPDATE and two savepoint pairs
+            response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 5)
+        self.assertTrue(all(task['slug'] for task in response.data))
+        self.assertEqual(Task.objects.count(), 7)
+        self.assertEqual(TaskSummary.current().completed_tasks, 2)
+
+    def test_bulk_create_reports_per_item_errors(self):
+        """Test one invalid item rejects the batch and is reported at its index"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(self.url, {'tasks': [{'title': 'ok'}, {'title': ''}]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('title', response.data[1])
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_bulk_duplicate_slugs(self):
+        """Test a slug repeated within one payload is reported per item, not left to the database"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(self.url, [{'title': 'a', 'slug': 'dup-slug'}, {'title': 'b', 'slug': 'dup-slug'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, [{}, {'slug': ['Duplicate slug.']}])
+
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.patch(self.url, [
+            {'id': self.task1.id, 'slug': 'dup-slug'}, {'id': self.task2.id, 'slug': 'dup-slug'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, [{}, {'slug': ['Duplicate slug.']}])
+        self.assertEqual(Task.objects.filter(slug='dup-slug').count(), 0)
+
+    @override_settings(TASKS_BULK_MAX_ITEMS=2)
+    def test_bulk_create_limit(self):
+        """Test payloads over TASKS_BULK_MAX_ITEMS are rejected"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(self.url, [{'title': 'x'}] * 3, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_requires_manager(self):
+        """Test bulk updates keep ManagerPermission"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.patch(self.url, [{'id': self.task1.id, 'completed': True}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_partial_update(self):
+        """Test PATCH toggles many tasks and keeps the counters right"""
+        self.client.force_authenticate(user=self.manager)
+        before = Task.objects.get(id=self.task1.id).updated_at
+        response = self.client.patch(self.url, [
+            {'id': self.task1.id, 'completed': True},
+            {'id': self.task2.id, 'completed': False, 'title': 'Reopened'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        task1, task2 = Task.objects.get(id=self.task1.id), Task.objects.get(id=self.task2.id)
+        self.assertTrue(task1.completed)
+        self.assertGreater(task1.updated_at, before)
+        self.assertEqual((task2.title, task2.completed), ('Reopened', False))
+        self.assertEqual(TaskSummary.current().completed_tasks, 1)
+
+    def test_bulk_update_unknown_id(self):
+        """Test unknown and missing ids are reported per item"""
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.put(self.url, [
+            {'id': self.task1.id, 'title': 'Full', 'completed': True},
+            {'id': 99999, 'title': 'Nope'},
+            {'title': 'No id'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('id', response.data[1])
+        self.assertIn('id', response.data[2])
+        self.assertFalse(Task.objects.get(id=self.task1.id).completed)
+
+    def test_bulk_ids_reject_booleans(self):
+        """Test JSON true/false are not taken for task ids 1 and 0"""
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.patch(self.url, [{'id': True, 'completed': True}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.delete(self.url, {'ids': [True]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_stale_instances_count_stored_values(self):
+        """Test bulk writes adjust the counters by what the rows held, not what was loaded"""
+        stale = list(Task.objects.order_by('id'))
+        other = Task.objects.get(id=self.task1.id)
+        other.completed = True
+        other.save()
+        for task in stale:
+            task.completed = True
+        update_tasks(stale, ['completed'])
+        self.assertEqual(TaskSummary.current().completed_tasks, 2)
+
+        stale = list(Task.objects.order_by('id'))
+        other = Task.objects.get(id=self.task2.id)
+        other.completed = False
+        other.save()
+        Task.objects.get(id=self.task1.id).delete()
+        self.assertEqual(delete_tasks(stale), 1)
+        summary = TaskSummary.current()
+        self.assertEqual((summary.total_tasks, summary.completed_tasks), (0, 0))
+
+    def test_bulk_delete(self):
+        """Test deleting many tasks with one request"""
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.delete(self.url, {'ids': [self.task1.id, self.task2.id]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Task.objects.exists())
+        summary = TaskSummary.current()
+        self.assertEqual((summary.total_tasks, summary.completed_tasks), (0, 0))
+
+    def test_bulk_delete_unknown_id(self):
+        """Test nothing is deleted when an id is unknown"""
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.delete(self.url, [self.task1.id, 424242], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Task.objects.count(), 2)
+
+
+@override_settings(TASKS_CACHE_TTL=60)
+class TaskResponseCacheTestCase(APITestCase):
+    """Test cases for the generation-versioned GET response cache"""
+
+    def setUp(self):
+        task_cache.get_cache().clear()
+        task_cache.stats.reset()
+        self.task = Task.objects.create(title="Cached", description="cached task")
+
+    def test_repeated_list_is_served_without_queries(self):
+        """Test the second identical list request never touches the database"""
+        first = self.client.get('/api/tasks/?completed=false')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/tasks/?completed=0')
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(task_cache.stats.as_dict()['hits'], 1)
+
+    def test_repeated_detail_is_served_without_queries(self):
+        """Test the task detail is cached by id"""
+        self.client.get(f'/api/tasks/{self.task.id}/')
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/tasks/{self.task.id}/')
+        self.assertEqual(response.data['title'], "Cached")
+
+    def test_writes_invalidate_cached_responses(self):
+        """Test save, delete and bulk writes bump the generation"""
+        self.client.get('/api/tasks/')
+        self.client.get(f'/api/tasks/{self.task.id}/')
+
+        self.task.title = "Changed"
+        self.task.save()
+        self.assertEqual(self.client.get(f'/api/tasks/{self.task.id}/').data['title'], "Changed")
+
+        create_tasks([Task(title="Bulk cached")])
+        response = self.client.get('/api/tasks/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['task_summary']['total_tasks'], 2)
+
+        self.task.delete()
+        self.assertEqual(self.client.get(f'/api/tasks/{self.task.id}/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_generation_bumped_again_on_commit(self):
+        """Test a second bump runs after the transaction commits"""
+        generation = task_cache.get_generation()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Task.objects.create(title="Committed")
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(task_cache.get_generation(), generation + 2)
+
+    @override_settings(TASKS_CACHE_TTL=0)
+    def test_zero_ttl_disables_cache(self):
+        """Test TASKS_CACHE_TTL=0 turns caching off"""
+        self.client.get('/api/tasks/')
+        response = self.client.get('/api/tasks/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+
+class TaskCacheCheckTestCase(TestCase):
+    """Test the system check guarding the generation-keyed task caches"""
+
+    def test_per_process_backend_warns_when_enabled(self):
+        """Test enabling the caches on LocMemCache is flagged and the defaults are not"""
+        with override_settings(TASKS_CACHE_TTL=0, TASKS_COUNT_CACHE_TTL=0):
+            self.assertEqual(check_task_cache_is_shared(None), [])
+        with override_settings(TASKS_CACHE_TTL=60, TASKS_COUNT_CACHE_TTL=0):
+            self.assertEqual([warning.id for warning in check_task_cache_is_shared(None)], ['tasks.W001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+        with override_settings(CACHES=shared, TASKS_CACHE_TTL=60):
+            self.assertEqual(check_task_cache_is_shared(None), [])
+
+
+@override_settings(TASKS_CACHE_TTL=0, TASKS_COUNT_CACHE_TTL=300)
+class TaskListCountTestCase(APITestCase):
+    """Test cases for the `?count=exact|estimate|none` modes of filtered_count"""
+
+    def setUp(self):
+        task_cache.get_cache().clear()
+        create_tasks([Task(title=f"{'alpha' if n % 4 == 0 else 'bravo'} count {n}", completed=n % 2 == 0) for n in range(40)])
+
+    def summary(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tasks/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['task_summary'], len(queries)
+
+    def test_filters_without_search_come_from_the_summary(self):
+        """Test completed filters are answered by the counters without a COUNT query"""
+        self.assertEqual(self.summary(completed='true'), ({
+            'total_tasks': 40, 'completed_tasks': 20, 'incomplete_tasks': 20, 'filtered_count': 20, 'count': 'exact',
+        }, 2))
+
+    def test_exact_count_is_reused_across_pages(self):
+        """Test later pages and orderings of one filter reuse the cached count"""
+        first = self.client.get('/api/tasks/', {'search': 'bravo'})
+        self.assertEqual(first.data['task_summary']['filtered_count'], 30)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(first.data['next'])
+            self.client.get('/api/tasks/', {'search': 'bravo', 'ordering': 'title'})
+        self.assertEqual(second.data['task_summary']['filtered_count'], 30)
+        self.assertFalse(any('COUNT' in q['sql'] for q in queries))
+
+        # a write retires the cached count
+        create_tasks([Task(title='bravo late')])
+        self.assertEqual(self.summary(search='bravo')[0]['filtered_count'], 31)
+
+    def test_none_skips_the_count(self):
+        """Test count=none leaves filtered_count null without counting"""
+        summary, queries = self.summary(search='alpha', count='none')
+        self.assertEqual((summary['filtered_count'], summary['count'], queries), (None, 'none', 2))
+
+    @override_settings(TASKS_COUNT_SAMPLE_SIZE=5)
+    def test_estimate_probes_the_search_index(self):
+        """Test count=estimate scales the first matches of a bounded index probe to the id range"""
+        summary, queries = self.summary(search='alpha', count='estimate')
+        self.assertEqual((summary['count'], queries), ('estimate', 3))
+        self.assertAlmostEqual(summary['filtered_count'], 10, delta=2)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.summary(search='alpha', count='estimate', completed='true')
+        self.assertIn('LIMIT', queries[-1]['sql'])
+        self.assertNotIn('COUNT("tasks_task"', queries[-1]['sql'])
+
+    @override_settings(TASKS_COUNT_CACHE_TTL=0)
+    def test_exact_count_rides_in_the_cursor(self):
+        """Test next and previous links carry the count, so later pages do not recount without a cache"""
+        first = self.client.get('/api/tasks/', {'search': 'bravo'})
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(first.data['next'])
+            back = self.client.get(second.data['previous'])
+        self.assertEqual((second.data['task_summary']['filtered_count'], back.data['task_summary']['filtered_count']), (30, 30))
+        self.assertFalse(any('COUNT' in q['sql'] for q in queries))
+
+    def test_estimate_counts_small_tables(self):
+        """Test tables within the sample size are simply counted"""
+        self.assertEqual(self.summary(search='alpha', count='estimate')[0]['filtered_count'], 10)
+
+    def test_invalid_mode(self):
+        """Test an unknown count mode is rejected"""
+        response = self.client.get('/api/tasks/', {'count': 'some'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'message': 'count must be one of: exact, estimate, none'})
+
+    async def test_async_modes(self):
+        """Test the async list honours the same modes"""
+        client = AsyncClient()
+        response = await client.get('/api/async/tasks/', {'search': 'alpha', 'count': 'none'})
+        self.assertIsNone(response.json()['task_summary']['filtered_count'])
+        response = await client.get('/api/async/tasks/', {'search': 'alpha'})
+        self.assertEqual(response.json()['task_summary']['filtered_count'], 10)
+        response = await client.get('/api/async/tasks/', {'search': 'alpha', 'count': 'estimate'})
+        self.assertEqual(response.json()['task_summary']['count'], 'estimate')
+
+
+@override_settings(TASKS_CACHE_TTL=60)
+class TaskFacetsViewTestCase(APITestCase):
+    """Test cases for the single-query dashboard facets"""
+
+    def setUp(self):
+        task_cache.get_cache().clear()
+        self.now = timezone.now().replace(minute=30)
+        tasks = create_tasks([Task(title=f"{'alpha' if n < 3 else 'bravo'} facet {n}", completed=n % 2 == 0) for n in range(6)])
+        # created an hour apart, updated 30 minutes, 2 hours, 2 days... ago
+        ages = [timedelta(minutes=30), timedelta(hours=2), timedelta(days=2), timedelta(days=8), timedelta(days=9), timedelta(days=10)]
+        for n, (task, age) in enumerate(zip(tasks, ages)):
+            Task.objects.filter(pk=task.pk).update(created_at=self.now - timedelta(hours=n), updated_at=self.now - age)
+
+    def test_single_query(self):
+        """Test every facet comes from one GROUP BY with conditional aggregates"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tasks/facets/', {'bucket': 'hour'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('GROUP BY', queries[0]['sql'])
+
+        data = response.json()
+        self.assertEqual(data['total'], 6)
+        self.assertEqual(data['completed'], {'true': 3, 'false': 3})
+        self.assertEqual(data['updated_within'], {'hour': 1, 'day': 2, 'week': 3, 'older': 3})
+        self.assertEqual([bucket['count'] for bucket in data['created']], [1] * 6)
+        self.assertEqual(data['created'][-1]['completed'], 1)
+
+    def test_day_buckets_and_search(self):
+        """Test coarser buckets and the search filter"""
+        data = self.client.get('/api/tasks/facets/', {'search': 'alpha'}).json()
+        self.assertEqual((data['bucket'], data['total'], sum(b['count'] for b in data['created'])), ('day', 3, 3))
+        self.assertEqual(data['completed'], {'true': 2, 'false': 1})
+
+    def test_since(self):
+        """Test since limits the created buckets to recently created tasks, not the other facets"""
+        since = (self.now - timedelta(hours=1, minutes=1)).isoformat()
+        data = self.client.get('/api/tasks/facets/', {'since': since, 'bucket': 'hour'}).json()
+        self.assertEqual([bucket['count'] for bucket in data['created']], [1, 1])
+        self.assertEqual((data['total'], data['updated_within']['week']), (6, 3))
+        self.assertEqual(self.client.get('/api/tasks/facets/', {'since': 'yesterday'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/tasks/facets/', {'since': '2026-13-01T00:00:00'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cached_until_a_write(self):
+        """Test facets are cached under the tasks generation"""
+        self.client.get('/api/tasks/facets/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/tasks/facets/')['X-Cache'], 'HIT')
+        Task.objects.create(title='another')
+        response = self.client.get('/api/tasks/facets/')
+        self.assertEqual((response['X-Cache'], response.json()['total']), ('MISS', 7))
+
+    def test_default_window(self):
+        """Test without since the created buckets cover the bucket's window, however old the data"""
+        old = create_tasks([Task(title=f"ancient {n}") for n in range(3)])
+        for n, task in enumerate(old):
+            Task.objects.filter(pk=task.pk).update(created_at=self.now - timedelta(days=400 * (n + 1)))
+        with override_settings(TASKS_FACETS_MAX_BUCKETS=100):
+            hourly = self.client.get('/api/tasks/facets/', {'bucket': 'hour'})
+            daily = self.client.get('/api/tasks/facets/')
+        def created(response):
+            return sum(bucket['count'] for bucket in response.json()['created'])
+
+        self.assertEqual((hourly.status_code, created(hourly), hourly.json()['total']), (status.HTTP_200_OK, 6, 9))
+        self.assertEqual((daily.status_code, created(daily), daily.json()['total']), (status.HTTP_200_OK, 6, 9))
+        self.assertEqual(created(self.client.get('/api/tasks/facets/', {'bucket': 'week'})), 7)
+        since = parse_datetime(daily.json()['since'])
+        self.assertAlmostEqual(since, timezone.now() - timedelta(days=90), delta=timedelta(minutes=1))
+
+    def test_recency_covers_tasks_created_before_the_window(self):
+        """Test a task created long ago and edited just now counts as updated within the hour"""
+        task = Task.objects.create(title='long lived')
+        Task.objects.filter(pk=task.pk).update(created_at=self.now - timedelta(days=100), updated_at=timezone.now())
+        data = self.client.get('/api/tasks/facets/').json()
+        self.assertEqual((data['total'], data['updated_within']['hour']), (7, 2))
+        self.assertEqual(sum(bucket['count'] for bucket in data['created']), 6)
+
+    @override_settings(TASKS_FACETS_MAX_BUCKETS=3)
+    def test_bucket_limit(self):
+        """Test too many buckets ask for a coarser one"""
+        response = self.client.get('/api/tasks/facets/', {'bucket': 'hour'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/tasks/facets/', {'bucket': 'month'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TaskConditionalGetTestCase(APITestCase):
+    """Test cases for ETag / Last-Modified handling on task GETs"""
+
+    def setUp(self):
+        task_cache.get_cache().clear()
+        self.task = Task.objects.create(title="Polled", description="polled task")
+
+    def test_detail_etag_round_trip(self):
+        """Test a matching If-None-Match on a task returns 304"""
+        response = self.client.get(f'/api/tasks/{self.task.id}/')
+        etag = response['ETag']
+        self.assertEqual(etag, conditional.task_etag(self.task.id, self.task.updated_at))
+        self.assertEqual(conditional.parse_task_etag(etag), (self.task.id, self.task.updated_at))
+
+        response = self.client.get(f'/api/tasks/{self.task.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_detail_probe_without_cache(self):
+        """Test a cache miss answers a conditional request with one updated_at probe"""
+        etag = conditional.task_etag(self.task.id, self.task.updated_at)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/tasks/{self.task.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_changed_after_update(self):
+        """Test a stale ETag gets the full, updated body"""
+        etag = self.client.get(f'/api/tasks/{self.task.id}/')['ETag']
+        self.task.title = "Changed"
+        self.task.save()
+
+        response = self.client.get(f'/api/tasks/{self.task.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['title'], "Changed")
+
+    def test_detail_if_modified_since(self):
+        """Test If-Modified-Since against the task's updated_at"""
+        last_modified = self.client.get(f'/api/tasks/{self.task.id}/')['Last-Modified']
+        response = self.client.get(f'/api/tasks/{self.task.id}/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_etag(self):
+        """Test list pages revalidate through the page probe and change with the data"""
+        etag = self.client.get('/api/tasks/?completed=false')['ETag']
+
+        task_cache.get_cache().clear()
+        with self.assertNumQueries(2):  # summary row + (id, updated_at) page probe
+            response = self.client.get('/api/tasks/?completed=false', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        other = self.client.get('/api/tasks/?completed=true', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(other.status_code, status.HTTP_200_OK)
+
+        Task.objects.create(title="Another")
+        response = self.client.get('/api/tasks/?completed=false', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_has_no_last_modified(self):
+        """Test a delete pulling an older task onto the page is not hidden by If-Modified-Since"""
+        for i in range(10):
+            Task.objects.create(title=f"Page {i}")
+        first = self.client.get('/api/tasks/')
+        self.assertNotIn('Last-Modified', first)
+        Task.objects.get(id=first.data['results'][3]['id']).delete()
+
+        response = self.client.get('/api/tasks/', HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(self.task.id, [task['id'] for task in response.data['results']])
+
+    def test_list_etag_covers_off_page_matches(self):
+        """Test a task entering the search set behind a full page changes the ETag"""
+        for i in range(10):
+            Task.objects.create(title=f"Alpha {i}")
+        url = '/api/tasks/?search=alpha'
+        first = self.client.get(url)
+        self.assertEqual(first.data['task_summary']['filtered_count'], 10)
+        self.assertIsNone(first.data['next'])
+
+        # the oldest task, so it sorts after the page it would change
+        self.task.title = "Alpha polled"
+        self.task.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['task_summary']['filtered_count'], 11)
+        self.assertIsNotNone(response.data['next'])
+
+
+class TaskExportViewTestCase(APITestCase):
+    """Test cases for the streaming /tasks/export/ endpoint"""
+
+    url = '/api/tasks/export/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='export@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        for i in range(5):
+            Task.objects.create(title=f"Export {i}", description=f"line {i}, \"quoted\"", completed=i % 2 == 0)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_matches_serializer_output(self):
+        """Test every exported line equals the TaskSerializer representation"""
+        response = self.client.get(self.url, {'format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        lines = [json.loads(line) for line in self.read(response).splitlines()]
+        expected = TaskSerializer(Task.objects.order_by('id'), many=True).data
+        self.assertEqual(lines, [dict(task) for task in expected])
+
+    def test_csv_export_with_filters(self):
+        """Test CSV export honours the completed filter"""
+        response = self.client.get(self.url, {'format': 'csv', 'completed': 'true'})
+        rows = list(csv.reader(StringIO(self.read(response))))
+
+        self.assertEqual(rows[0], ['id', 'slug', 'title', 'description', 'completed', 'created_at', 'updated_at'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual({row[4] for row in rows[1:]}, {'True'})
+
+    def test_export_streams_in_chunks(self):
+        """Test the body is produced chunk by chunk"""
+        with patch.object(TaskExportView, 'chunk_size', 2):
+            response = self.client.get(self.url)
+            chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 3)
+
+    @override_settings(REPLICA_DATABASES=['replica_1'])
+    def test_export_reads_where_the_request_was_routed(self):
+        """Test the stream, consumed after the routing middleware returned, keeps the request's replica routing"""
+        states = []
+
+        def db_for_read(router, model, **hints):
+            if model is Task:
+                states.append(routers._routing.get())
+            return 'default'
+
+        with patch.object(PrimaryReplicaRouter, 'db_for_read', db_for_read):
+            response = self.client.get(self.url)
+            self.assertEqual(len(self.read(response).splitlines()), 5)
+        self.assertEqual(states, [routers.REPLICA])
+
+    def test_invalid_format(self):
+        """Test an unknown format is rejected"""
+        response = self.client.get(self.url, {'format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_requires_authentication(self):
+        """Test anonymous exports are refused"""
+        self.client.force_authenticate(user=None)
+        response = self.client.get(self.url)
+        self.assertIn(response.status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
+
+
+class ImportTasksCommandTestCase(TestCase):
+    """Test cases for the import_tasks management command"""
+
+    def setUp(self):
+        handle = tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False)
+        with handle:
+            for i in range(7):
+                handle.write(json.dumps({'title': f'Imported {i}', 'description': 'from jsonl', 'completed': i < 3}) + '\n')
+            handle.write('{"title": ""}\n')
+            handle.write('not json\n')
+        self.path = handle.name
+        self.addCleanup(os.remove, self.path)
+
+    def run_import(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_tasks', self.path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_in_batches(self):
+        """Test valid rows are imported, invalid ones reported, counters kept"""
+        out, err = self.run_import('--batch-size', '3')
+
+        self.assertEqual(Task.objects.count(), 7)
+        self.assertTrue(all(Task.objects.values_list('slug', flat=True)))
+        self.assertEqual(TaskSummary.current().completed_tasks, 3)
+        self.assertIn('Imported 7 tasks (2 rejected)', out)
+        self.assertIn('line 8', err)
+        self.assertIn('line 9', err)
+
+    def test_resume_from_offset(self):
+        """Test --offset skips lines already imported"""
+        self.run_import('--offset', '5')
+        self.assertEqual(sorted(Task.objects.values_list('title', flat=True)), ['Imported 5', 'Imported 6'])
+
+    def test_progress_counts_blank_lines(self):
+        """Test the reported resume line includes blank lines, so --offset does not re-import rows"""
+        with open(self.path, 'w') as handle:
+            for i in range(4):
+                handle.write(json.dumps({'title': f'Spaced {i}'}) + '\n\n')
+        out, _ = self.run_import('--batch-size', '4')
+        self.assertIn('committed up to line 4 (', out)
+        self.assertIn('committed up to line 8 (', out)
+
+        self.run_import('--offset', '4')
+        self.assertEqual(Task.objects.filter(title='Spaced 2').count(), 2)
+        self.assertEqual(Task.objects.filter(title='Spaced 1').count(), 1)
+
+    def test_deferred_index_is_rebuilt(self):
+        """Test --defer-indexes leaves a working search index behind"""
+        self.run_import('--defer-indexes')
+        response = APIClient().get('/api/tasks/', {'search': 'imported'})
+        self.assertEqual(response.data['task_summary']['filtered_count'], 7)
+
+    def test_parallel_parsing(self):
+        """Test --workers parses chunks in child processes"""
+        self.run_import('--workers', '2', '--batch-size', '2')
+        self.assertEqual(Task.objects.count(), 7)
+
+
+class AsyncTaskViewTestCase(TestCase):
+    """Test cases for the async /async/tasks/ endpoints"""
+
+    def setUp(self):
+        task_cache.get_cache().clear()
+        user_state.forget()
+        self.user = User.objects.create_user(email='async-user@test.com', password='testpass123')
+        self.manager = User.objects.create_user(email='async-manager@test.com', password='testpass123')
+        User.objects.filter(pk=self.manager.pk).update(role='MANAGER')
+        self.task = Task.objects.create(title="Async task", description="served from the event loop")
+        self.client = AsyncClient()
+
+    def auth(self, user):
+        return {'AUTHORIZATION': f"Bearer {create_tokens_for_user(user)['access']}"}
+
+    async def test_list_matches_sync_view(self):
+        """Test the async list returns the same body as TaskView"""
+        response = await self.client.get('/api/async/tasks/', {'completed': 'false'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.json()
+        self.assertEqual([task['id'] for task in body['results']], [self.task.id])
+        self.assertEqual(body['task_summary']['total_tasks'], 1)
+
+        expected = await sync_to_async(lambda: APIClient().get('/api/tasks/', {'completed': 'false'}).json())()
+        self.assertEqual(body['results'], expected['results'])
+        self.assertEqual(body['task_summary'], expected['task_summary'])
+
+    @override_settings(QUERY_BUDGET_ENFORCE=True, TASKS_CACHE_TTL=0)
+    async def test_list_query_budget(self):
+        """Test queries run through sync_to_async are counted against the budget"""
+        response = await self.client.get('/api/async/tasks/?search=async')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.asgi_request.query_stats.count, 3)
+        self.assertEqual(response.asgi_request.query_budget, 3)
+
+    async def test_detail_and_missing(self):
+        """Test the async detail endpoint"""
+        response = await self.client.get(f'/api/async/tasks/{self.task.id}/')
+        self.assertEqual(response.json()['title'], "Async task")
+        self.assertIn('ETag', response)
+        response = await self.client.get('/api/async/tasks/99999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_create_requires_authentication(self):
+        """Test anonymous writes are rejected"""
+        response = await self.client.post('/api/async/tasks/', {'title': 'nope'}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_create(self):
+        """Test an authenticated user creates a task"""
+        headers = await sync_to_async(self.auth)(self.user)
+        response = await self.client.post('/api/async/tasks/', {'title': 'Created async'}, content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(await Task.objects.filter(title='Created async').aexists())
+
+    async def test_create_with_sync_authentication_class(self):
+        """Test an authentication class without aauthenticate(), like simplejwt's own, still works"""
+        headers = await sync_to_async(self.auth)(self.user)
+        with patch.object(AsyncTaskView, 'authentication_class', JWTAuthentication):
+            response = await self.client.post('/api/async/tasks/', {'title': 'Sync auth'}, content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    async def test_update_and_delete_require_manager(self):
+        """Test PUT/DELETE keep ManagerPermission"""
+        headers = await sync_to_async(self.auth)(self.user)
+        response = await self.client.delete(f'/api/async/tasks/{self.task.id}/', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        headers = await sync_to_async(self.auth)(self.manager)
+        response = await self.client.put(
+            f'/api/async/tasks/{self.task.id}/', {'title': 'Updated async', 'completed': True},
+            content_type='application/json', headers=headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()['completed'])
+
+        response = await self.client.delete(f'/api/async/tasks/{self.task.id}/', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(await Task.objects.filter(id=self.task.id).aexists())
+
+    async def test_partial_update(self):
+        """Test PATCH with If-Match on the async view"""
+        headers = await sync_to_async(self.auth)(self.manager)
+        etag = conditional.task_etag(self.task.id, self.task.updated_at)
+        response = await self.client.patch(
+            f'/api/async/tasks/{self.task.id}/', {'completed': True},
+            content_type='application/json', headers={**headers, 'If-Match': etag},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.json()['completed'], response.json()['title']), (True, "Async task"))
+        self.assertNotEqual(response['ETag'], etag)
+
+        response = await self.client.patch(
+            f'/api/async/tasks/{self.task.id}/', {'completed': False},
+            content_type='application/json', headers={**headers, 'If-Match': etag},
+        )
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+
+
+class TaskPartialUpdateTestCase(APITestCase):
+    """Test cases for PATCH /tasks/{id}/"""
+
+    def setUp(self):
+        task_cache.get_cache().clear()
+        user_state.forget()
+        self.manager = User.objects.create_user(email='patch@test.com', password='testpass123')
+        User.objects.filter(pk=self.manager.pk).update(role='MANAGER')
+        self.task = Task.objects.create(title="Patch me", description="a long description", completed=False)
+        self.url = f'/api/tasks/{self.task.id}/'
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {create_tokens_for_user(self.manager)['access']}")
+
+    def updates(self, queries):
+        return [query['sql'] for query in queries if query['sql'].startswith('UPDATE "tasks_task"')]
+
+    def test_only_changed_columns_are_written(self):
+        """Test toggling completed writes completed and updated_at only"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, {'completed': True, 'title': 'Patch me'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['completed'], response.data['description']), (True, "a long description"))
+        [update] = self.updates(queries)
+        self.assertIn('"completed"', update)
+        self.assertIn('"updated_at"', update)
+        self.assertNotIn('"description"', update)
+        self.assertNotIn('"title"', update)
+        self.assertEqual(TaskSummary.current().completed_tasks, 1)
+        self.task.refresh_from_db()
+        self.assertTrue(self.task.completed)
+        self.assertEqual(response['ETag'], conditional.task_etag(self.task.id, self.task.updated_at))
+
+    def test_unchanged_values_skip_the_write(self):
+        """Test a PATCH that changes nothing issues no UPDATE"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, {'completed': False, 'title': 'Patch me'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.updates(queries), [])
+        self.assertEqual(Task.objects.get(id=self.task.id).updated_at, self.task.updated_at)
+
+    def test_only_supplied_fields_are_validated(self):
+        """Test omitted required fields are fine and supplied ones are validated"""
+        response = self.client.patch(self.url, {'description': 'shorter'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.patch(self.url, {'title': ''}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('title', response.data)
+
+    def test_if_match(self):
+        """Test If-Match with the current ETag applies and a stale one answers 412"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.patch(self.url, {'completed': True}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.patch(self.url, {'title': 'Lost update'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(Task.objects.get(id=self.task.id).title, "Patch me")
+
+        response = self.client.patch(self.url, {'title': 'Any version'}, format='json', HTTP_IF_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_concurrent_write_is_not_overwritten(self):
+        """Test the UPDATE is guarded by the updated_at that was read"""
+        stale = Task.objects.get(id=self.task.id)
+        Task.objects.filter(id=self.task.id).update(updated_at=timezone.now(), title="Written meanwhile")
+        stale.title = "Stale write"
+        self.assertFalse(update_task(stale, ['title']))
+        self.assertEqual(Task.objects.get(id=self.task.id).title, "Written meanwhile")
+
+    def test_concurrent_write_without_if_match_is_reapplied(self):
+        """Test a PATCH without If-Match lands over a concurrent write, keeping its other fields"""
+        def concurrent(task, *args):
+            Task.objects.filter(id=task.id).update(updated_at=timezone.now(), description="Written meanwhile")
+            return patch_task(task, *args)
+
+        with patch('tasks.views.patch_task', side_effect=concurrent):
+            response = self.client.patch(self.url, {'completed': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['completed'], response.data['description']), (True, "Written meanwhile"))
+        self.assertEqual(TaskSummary.current().completed_tasks, 1)
+
+        etag = self.client.get(self.url)['ETag']
+        with patch('tasks.views.patch_task', side_effect=concurrent):
+            response = self.client.patch(self.url, {'completed': False}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    def test_task_that_keeps_changing_is_a_conflict(self):
+        """Test a PATCH without If-Match gives up with 409 once its retries are spent"""
+        with patch('tasks.bulk.update_task', return_value=False) as guarded:
+            response = self.client.patch(self.url, {'completed': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(guarded.call_count, PATCH_RETRIES + 1)
+        self.assertFalse(Task.objects.get(id=self.task.id).completed)
+
+    def test_cache_and_slug(self):
+        """Test a PATCH invalidates cached reads and an emptied slug is regenerated"""
+        with override_settings(TASKS_CACHE_TTL=60):
+            self.client.get(self.url)
+            response = self.client.patch(self.url, {'title': 'Renamed', 'slug': ''}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response.data['slug'].startswith('renamed-'))
+            self.assertEqual(self.client.get(self.url).data['title'], 'Renamed')
+
+    def test_requires_manager(self):
+        """Test PATCH has the same permissions as PUT"""
+        user = User.objects.create_user(email='patch-user@test.com', password='testpass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {create_tokens_for_user(user)['access']}")
+        response = self.client.patch(self.url, {'completed': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.patch('/api/tasks/99999/', {'completed': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(QUERY_BUDGET_ENFORCE=True, TASKS_CACHE_TTL=0)
+class TaskQueryBudgetTestCase(APITestCase):
+    """Test the task views stay within their declared query budgets"""
+
+    def setUp(self):
+        user_state.forget()
+        self.manager = User.objects.create_user(email='budget@test.com', password='testpass123')
+        User.objects.filter(pk=self.manager.pk).update(role='MANAGER')
+        self.tasks = create_tasks([Task(title=f"Budget task {i}", completed=i % 2 == 0) for i in range(15)])
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {create_tokens_for_user(self.manager)['access']}")
+
+    def assertWithinBudget(self, response, view, expected_status):
+        self.assertEqual(response.status_code, expected_status)
+        budget = query_budget(view, response.wsgi_request.method)
+        self.assertIsNotNone(budget)
+        self.assertLessEqual(response.wsgi_request.query_stats.count, budget)
+        return response.wsgi_request.query_stats.count
+
+    def test_list_budget(self):
+        """Test the list is summary, page and a filtered count only a search needs"""
+        self.client.credentials()
+        for params, queries in (({}, 2), ({'completed': 'true'}, 2), ({'search': 'budget', 'ordering': 'title'}, 3)):
+            response = self.client.get('/api/tasks/', params)
+            self.assertEqual(self.assertWithinBudget(response, TaskView, status.HTTP_200_OK), queries)
+
+    def test_conditional_list_budget(self):
+        """Test a conditional miss does not add a probe query"""
+        self.client.credentials()
+        etag = self.client.get('/api/tasks/')['ETag']
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertLessEqual(self.assertWithinBudget(response, TaskView, status.HTTP_304_NOT_MODIFIED), 2)
+
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH='"stale"')
+        self.assertWithinBudget(response, TaskView, status.HTTP_200_OK)
+
+    def test_detail_budget(self):
+        """Test detail and conditional detail are one query"""
+        self.client.credentials()
+        response = self.client.get(f'/api/tasks/{self.tasks[0].id}/')
+        self.assertEqual(self.assertWithinBudget(response, TaskView, status.HTTP_200_OK), 1)
+        response = self.client.get(f'/api/tasks/{self.tasks[0].id}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(self.assertWithinBudget(response, TaskView, status.HTTP_304_NOT_MODIFIED), 1)
+
+    def test_write_budgets(self):
+        """Test create, update and delete with a cold user state cache"""
+        response = self.client.post('/api/tasks/', {'title': 'Budget create'}, format='json')
+        self.assertWithinBudget(response, TaskView, status.HTTP_201_CREATED)
+        user_state.forget()
+        # flips completed, so the summary counters are updated too
+        response = self.client.put(f'/api/tasks/{self.tasks[1].id}/', {'title': 'Budget update', 'completed': True}, format='json')
+        self.assertWithinBudget(response, TaskView, status.HTTP_200_OK)
+        user_state.forget()
+        response = self.client.patch(f'/api/tasks/{self.tasks[3].id}/', {'completed': True}, format='json')
+        self.assertWithinBudget(response, TaskView, status.HTTP_200_OK)
+        user_state.forget()
+        response = self.client.delete(f'/api/tasks/{self.tasks[0].id}/')
+        self.assertWithinBudget(response, TaskView, status.HTTP_204_NO_CONTENT)
+
+    def test_bulk_budget_is_constant(self):
+        """Test bulk writes do not scale their query count with the payload"""
+        for size in (1, 10):
+            user_state.forget()
+            response = self.client.post('/api/tasks/bulk/', [{'title': f'bulk {i}'} for i in range(size)], format='json')
+            self.assertWithinBudget(response, TaskBulkView, status.HTTP_201_CREATED)
+            user_state.forget()
+            payload = [{'id': task.id, 'completed': True} for task in self.tasks[:size]]
+            response = self.client.patch('/api/tasks/bulk/', payload, format='json')
+            self.assertWithinBudget(response, TaskBulkView, status.HTTP_200_OK)
+        user_state.forget()
+        response = self.client.delete('/api/tasks/bulk/', {'ids': [task.id for task in self.tasks]}, format='json')
+        self.assertWithinBudget(response, TaskBulkView, status.HTTP_200_OK)
+
+    def test_over_budget_raises(self):
+        """Test the middleware fails the request when a view goes over budget"""
+        with patch.object(TaskView, 'query_budget', {'GET': 2}), self.assertLogs('zippee_assessment.queries', 'WARNING'):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/tasks/')
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers(self):
+        """Test DEBUG responses expose the query stats"""
+        self.client.credentials()
+        response = self.client.get('/api/tasks/')
+        self.assertEqual(response['X-Query-Count'], '2')
+        self.assertEqual(response['X-Query-Budget'], '3')
+        self.assertIn('SELECT', response['X-Query-Slowest'])
+
+    def test_stats_are_logged(self):
+        """Test production requests log one JSON line"""
+        self.client.credentials()
+        with self.assertLogs('zippee_assessment.queries', level='INFO') as logs:
+            self.client.get('/api/tasks/')
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['path'], line['queries'], line['budget']), ('/api/tasks/', 2, 3))
+
+
+class TaskValuesSerializerTestCase(APITestCase):
+    """Test cases for the values() based list serializer"""
+
+    def setUp(self):
+        task_cache.get_cache().clear()
+        self.tasks = create_tasks([
+            Task(title=f"Values task {i}", description=None if i % 3 == 0 else f"Näive “quoted” {i}", completed=i % 2 == 0)
+            for i in range(12)
+        ])
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_output_is_byte_identical(self):
+        """Test rows render exactly like TaskSerializer(many=True)"""
+        for tz in ('UTC', 'Asia/Kolkata'):
+            with timezone.override(tz):
+                expected = TaskSerializer(Task.objects.order_by('id'), many=True).data
+                rows = Task.objects.order_by('id').values(*TaskValuesSerializer().select_fields)
+                self.assertEqual(self.render(TaskValuesSerializer().to_representation(rows)), self.render(expected))
+
+    def test_list_response_is_unchanged(self):
+        """Test the list body matches TaskSerializer output for the same page"""
+        response = self.client.get('/api/tasks/', {'completed': 'false'})
+        page = Task.objects.filter(completed=False).order_by('-created_at', '-id')[:10]
+        self.assertEqual(self.render(response.data['results']), self.render(TaskSerializer(page, many=True).data))
+
+    def test_sparse_fieldset(self):
+        """Test ?fields= narrows both the output and the selected columns"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tasks/', {'fields': 'id,title,completed'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data['results'][0]), ['id', 'title', 'completed'])
+        page_sql = next(q['sql'] for q in queries if 'LIMIT' in q['sql'] and 'tasks_task"' in q['sql'])
+        self.assertNotIn('"description"', page_sql)
+        self.assertNotIn('"slug"', page_sql)
+
+        # the cursor still works with the sort column left out of the fieldset
+        next_page = self.client.get(response.data['next'])
+        self.assertEqual(len(next_page.data['results']), 2)
+        self.assertEqual(list(next_page.data['results'][0]), ['id', 'title', 'completed'])
+
+    def test_sparse_fieldsets_are_cached_separately(self):
+        """Test the fieldset is part of the cache key and ETag"""
+        full = self.client.get('/api/tasks/')
+        sparse = self.client.get('/api/tasks/', {'fields': 'id'})
+        self.assertEqual(sparse['X-Cache'], 'MISS')
+        self.assertNotEqual(full['ETag'], sparse['ETag'])
+        self.assertEqual(list(sparse.data['results'][0]), ['id'])
+
+    def test_unknown_field_is_rejected(self):
+        """Test unknown field names are a 400"""
+        response = self.client.get('/api/tasks/', {'fields': 'id,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('message', response.data)
+
+
+@override_settings(TASKS_CHANGES_SETTLE_SECONDS=0, QUERY_BUDGET_ENFORCE=True)
+class TaskChangesFeedTestCase(APITestCase):
+    """Test cases for the /tasks/changes/ delta-sync feed"""
+
+    def setUp(self):
+        user_state.forget()
+        self.tasks = create_tasks([Task(title=f"Sync task {i}") for i in range(5)])
+        self.manager = User.objects.create_user(email='sync@test.com', password='testpass123')
+        User.objects.filter(pk=self.manager.pk).update(role='MANAGER')
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {create_tokens_for_user(self.manager)['access']}"}
+
+    def sync(self, token=None, **params):
+        if token:
+            params['since'] = token
+        response = self.client.get('/api/tasks/changes/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_initial_sync_pages_through_everything(self):
+        """Test a first sync returns every task in (updated_at, id) order, page by page"""
+        first = self.sync(limit=3)
+        self.assertTrue(first['has_more'])
+        self.assertEqual(first['deleted'], [])
+        second = self.sync(first['next'], limit=3)
+        self.assertFalse(second['has_more'])
+        ids = [task['id'] for task in first['changes'] + second['changes']]
+        self.assertEqual(ids, [task.id for task in self.tasks])
+        self.assertEqual(self.sync(second['next'])['changes'], [])
+
+    def test_incremental_sync_returns_only_changes(self):
+        """Test creates, updates and deletes after the token, including bulk deletes"""
+        token = self.sync()['next']
+
+        self.client.put(f'/api/tasks/{self.tasks[1].id}/', {'title': 'Renamed', 'completed': True}, format='json', **self.auth)
+        created = Task.objects.create(title="Created after sync")
+        self.client.delete(f'/api/tasks/{self.tasks[2].id}/', **self.auth)
+        self.client.delete('/api/tasks/bulk/', {'ids': [self.tasks[3].id, self.tasks[4].id]}, format='json', **self.auth)
+
+        data = self.sync(token)
+        self.assertEqual([task['id'] for task in data['changes']], [self.tasks[1].id, created.id])
+        self.assertEqual(data['changes'][0]['title'], 'Renamed')
+        self.assertEqual(
+            sorted(tombstone['id'] for tombstone in data['deleted']),
+            [self.tasks[2].id, self.tasks[3].id, self.tasks[4].id],
+        )
+
+        again = self.sync(data['next'])
+        self.assertEqual((again['changes'], again['deleted']), ([], []))
+
+    def test_feed_reads_are_bounded(self):
+        """Test the feed is two keyset queries whatever the table size"""
+        create_tasks([Task(title=f"Bulk {i}") for i in range(50)])
+        response = self.client.get('/api/tasks/changes/', {'limit': 10})
+        self.assertEqual(response.wsgi_request.query_stats.count, 2)
+        self.assertEqual(len(response.data['changes']), 10)
+
+    @override_settings(TASKS_CHANGES_SETTLE_SECONDS=60)
+    def test_settle_window_holds_back_fresh_writes(self):
+        """Test rows newer than the settle window are not served yet"""
+        self.assertEqual(self.sync()['changes'], [])
+
+    def test_bad_tokens(self):
+        """Test malformed tokens are a 400 and tokens past retention a 410"""
+        response = self.client.get('/api/tasks/changes/', {'since': 'not-a-token'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        missing = base64.urlsafe_b64encode(json.dumps({'t': None, 'd': None}).encode()).decode()
+        response = self.client.get('/api/tasks/changes/', {'since': missing})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        stale = changes.encode_token(None, (timezone.now() - timedelta(days=365), 0))
+        response = self.client.get('/api/tasks/changes/', {'since': stale})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+        response = self.client.get('/api/tasks/changes/', {'limit': 'many'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_prune_tombstones(self):
+        """Test the prune command drops tombstones past retention only"""
+        deleted_id = self.tasks[0].id
+        self.tasks[0].delete()
+        TaskTombstone.objects.create(task_id=999, deleted_at=timezone.now() - timedelta(days=90))
+        out = StringIO()
+        call_command('prune_task_tombstones', '--days', '30', stdout=out)
+        self.assertIn('Pruned 1', out.getvalue())
+        self.assertEqual(list(TaskTombstone.objects.values_list('task_id', flat=True)), [deleted_id])
+
+
+class TaskStreamTestCase(TestCase):
+    """Test cases for the /tasks/stream/ server-sent events"""
+
+    def setUp(self):
+        self.client = AsyncClient()
+
+    def write(self, action, *args, **kwargs):
+        # on_commit callbacks only run when captured inside TestCase
+        with self.captureOnCommitCallbacks(execute=True):
+            return action(*args, **kwargs)
+
+    async def open_stream(self, **params):
+        response = await self.client.get('/api/tasks/stream/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        frames = response.streaming_content.__aiter__()
+        self.assertTrue((await self.next_frame(frames)).startswith(b'retry:'))
+        return frames
+
+    async def next_frame(self, frames, timeout=5):
+        return await asyncio.wait_for(frames.__anext__(), timeout)
+
+    def parse(self, frame):
+        lines = dict(line.split(': ', 1) for line in frame.decode().strip().split('\n'))
+        return lines['event'], json.loads(lines['data'])
+
+    async def test_create_update_delete_events(self):
+        """Test committed writes are pushed to a subscriber"""
+        frames = await self.open_stream()
+        try:
+            task = await sync_to_async(self.write)(Task.objects.create, title="Streamed task")
+            kind, data = self.parse(await self.next_frame(frames))
+            self.assertEqual((kind, data['id'], data['task']['title']), ('created', task.id, 'Streamed task'))
+
+            task.completed = True
+            await sync_to_async(self.write)(task.save)
+            kind, data = self.parse(await self.next_frame(frames))
+            self.assertEqual((kind, data['task']['completed']), ('updated', True))
+
+            task_id = task.id
+            await sync_to_async(self.write)(task.delete)
+            self.assertEqual(self.parse(await self.next_frame(frames)), ('deleted', {'type': 'deleted', 'id': task_id, 'task': None}))
+        finally:
+            await frames.aclose()
+
+    async def test_disconnect_unsubscribes(self):
+        """Test a cancelled stream (client gone) releases its subscription"""
+        frames = await self.open_stream()
+        self.assertEqual(stream.get_broker().stats()['subscribers'], 1)
+        # the ASGI handler cancels the response task when the client disconnects
+        reader = asyncio.ensure_future(frames.__anext__())
+        await asyncio.sleep(0)
+        reader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reader
+        self.assertEqual(stream.get_broker().stats()['subscribers'], 0)
+
+    async def test_server_side_filters(self):
+        """Test completed/search filters, including a task leaving the filtered set"""
+        frames = await self.open_stream(completed='false', search='VOIC')
+        try:
+            await sync_to_async(self.write)(Task.objects.create, title="Unrelated", completed=False)
+            await sync_to_async(self.write)(Task.objects.create, title="Paid invoice", completed=True)
+            task = await sync_to_async(self.write)(Task.objects.create, title="Open invoice", completed=False)
+            kind, data = self.parse(await self.next_frame(frames))
+            self.assertEqual((kind, data['id']), ('created', task.id))
+
+            task.completed = True
+            await sync_to_async(self.write)(task.save)
+            kind, data = self.parse(await self.next_frame(frames))
+            self.assertEqual((kind, data['id'], data['task']['completed']), ('updated', task.id, True))
+        finally:
+            await frames.aclose()
+
+    async def test_bulk_writes_are_streamed(self):
+        """Test tasks.bulk writes publish one event per task"""
+        frames = await self.open_stream()
+        try:
+            tasks = await sync_to_async(self.write)(create_tasks, [Task(title=f"Bulk stream {i}") for i in range(3)])
+            events = [self.parse(await self.next_frame(frames)) for _ in tasks]
+            self.assertEqual([data['id'] for _, data in events], [task.id for task in tasks])
+        finally:
+            await frames.aclose()
+
+    def test_slow_subscriber_gets_resync(self):
+        """Test a full queue is replaced by a single resync event"""
+        subscription = stream.Subscription(queue_size=2)
+        for sequence in range(3):
+            subscription.put(stream.TaskEvent('created', sequence).frame(sequence))
+        self.assertEqual(subscription.queue.qsize(), 1)
+        self.assertEqual(subscription.queue.get_nowait(), stream.RESYNC_FRAME)
+        self.assertEqual(subscription.resyncs, 1)
+
+    @override_settings(TASKS_STREAM_MAX_SUBSCRIBERS=0)
+    async def test_subscriber_limit(self):
+        """Test subscribers beyond the per-process limit get a 503"""
+        response = await self.client.get('/api/tasks/stream/')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_wsgi_is_rejected(self):
+        """Test the stream refuses to tie up a WSGI worker"""
+        response = APIClient().get('/api/tasks/stream/')
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    @override_settings(TASKS_CHANGES_SETTLE_SECONDS=0, TASKS_STREAM_POLL_SECONDS=0.05)
+    async def test_changes_feed_backend(self):
+        """Test the multi-worker backend picks writes up from the changes feed"""
+        broker = stream.Broker(stream.ChangesFeedBackend())
+        subscription = broker.subscribe()
+        try:
+            self.assertFalse(broker.wants_local_events)
+            task = await sync_to_async(Task.objects.create)(title="Written by another worker")
+            kind, data = self.parse(await asyncio.wait_for(subscription.queue.get(), 5))
+            self.assertEqual((kind, data['id']), ('created', task.id))
+        finally:
+            broker.unsubscribe(subscription)
+        self.assertIsNone(broker.backend.task)
+
+    @override_settings(TASKS_CHANGES_SETTLE_SECONDS=0, TASKS_STREAM_POLL_SECONDS=0.01)
+    async def test_changes_feed_backend_survives_errors(self):
+        """Test a failing poll is logged and retried, and a lost position resyncs the subscribers"""
+        changes_since = changes.changes_since
+        failures = [OperationalError('database is locked')]
+
+        def flaky(*args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return changes_since(*args, **kwargs)
+
+        broker = stream.Broker(stream.ChangesFeedBackend())
+        with patch.object(changes, 'changes_since', flaky), self.assertLogs('tasks.stream', 'ERROR'):
+            subscription = broker.subscribe()
+            try:
+                task = await sync_to_async(Task.objects.create)(title="Written while the feed failed")
+                kind, data = self.parse(await asyncio.wait_for(subscription.queue.get(), 5))
+                self.assertEqual((kind, data['id']), ('created', task.id))
+
+                failures.append(changes.ExpiredToken('Sync token is older than the tombstone retention'))
+                frame = await asyncio.wait_for(subscription.queue.get(), 5)
+                self.assertEqual(frame, stream.RESYNC_FRAME)
+                self.assertFalse(broker.backend.task.done())
+            finally:
+                broker.unsubscribe(subscription)
+
+    def test_receivers_see_the_previous_completed_in_any_order(self):
+        """Test a receiver connected after the summary receivers still reads the value before the write"""
+        seen = []
+
+        def on_save(sender, instance, created, **kwargs):
+            seen.append(getattr(instance, '_loaded_completed', None))
+
+        def on_bulk(sender, action, tasks, previous=None, **kwargs):
+            seen.append(previous and previous[tasks[0].id])
+
+        post_save.connect(on_save, sender=Task)
+        tasks_bulk_changed.connect(on_bulk, sender=Task)
+        try:
+            task = Task.objects.get(id=Task.objects.create(title="Ordered").id)
+            task.completed = True
+            task.save()
+            task.completed = False
+            update_tasks([task], ['completed'])
+        finally:
+            post_save.disconnect(on_save, sender=Task)
+            tasks_bulk_changed.disconnect(on_bulk, sender=Task)
+        self.assertEqual(seen, [None, False, True])
+        self.assertFalse(task._loaded_completed)
+
+
+
+@override_settings(REPLICA_DATABASES=['replica_1'], DATABASE_REPLICA_MAX_LAG_SECONDS=5)
+class ReplicaRoutingTestCase(TestCase):
+    """Test the primary/replica router and its read-your-writes pinning"""
+
+    def setUp(self):
+        django_cache.clear()
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(email='replica@test.com', password='testpass123')
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {create_tokens_for_user(self.user)['access']}"}
+
+    def run_request(self, request, status_code=200):
+        """Pass `request` through ReplicaRoutingMiddleware, returns the response and the read aliases seen by the view."""
+        seen = {}
+
+        def view(request):
+            seen['task'] = self.router.db_for_read(Task)
+            seen['user'] = self.router.db_for_read(User)
+            seen['cached'] = task_cache.get('tasks:replica-test')
+            return HttpResponse(status=status_code)
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return response, seen
+
+    def test_outside_requests_use_the_primary(self):
+        """Test commands and background work never read a replica"""
+        self.assertEqual(self.router.db_for_read(Task), 'default')
+        self.assertEqual(self.router.db_for_write(Task), 'default')
+        self.assertFalse(self.router.allow_migrate('replica_1', 'tasks'))
+        self.assertTrue(self.router.allow_migrate('default', 'tasks'))
+
+    def test_safe_requests_read_task_data_from_replicas(self):
+        """Test GETs read tasks from a replica and users from the primary"""
+        _, seen = self.run_request(self.factory.get('/api/tasks/'))
+        self.assertEqual((seen['task'], seen['user']), ('replica_1', 'default'))
+
+    def test_writes_use_the_primary_and_pin_the_client(self):
+        """Test a write reads the primary and pins its client by cookie"""
+        response, seen = self.run_request(self.factory.post('/api/tasks/'), 201)
+        self.assertEqual(seen['task'], 'default')
+        self.assertEqual(response.cookies['db_pin']['max-age'], 5)
+
+        request = self.factory.get('/api/tasks/')
+        request.COOKIES['db_pin'] = '1'
+        _, seen = self.run_request(request)
+        self.assertEqual(seen['task'], 'default')
+
+    def test_user_pin_covers_other_clients(self):
+        """Test a JWT user's write pins the same user on a client without the cookie"""
+        self.run_request(self.factory.patch('/api/tasks/1/', **self.auth))
+        _, seen = self.run_request(self.factory.get('/api/tasks/', **self.auth))
+        self.assertEqual(seen['task'], 'default')
+        _, seen = self.run_request(self.factory.get('/api/tasks/'))
+        self.assertEqual(seen['task'], 'replica_1')
+
+    def test_failed_writes_do_not_pin(self):
+        """Test a rejected write does not pin the client"""
+        response, _ = self.run_request(self.factory.post('/api/tasks/', **self.auth), 400)
+        self.assertNotIn('db_pin', response.cookies)
+        _, seen = self.run_request(self.factory.get('/api/tasks/', **self.auth))
+        self.assertEqual(seen['task'], 'replica_1')
+
+    @override_settings(TASKS_CACHE_TTL=60)
+    def test_pinned_clients_bypass_the_response_cache(self):
+        """Test a pinned client is not served a page cached from a lagging replica"""
+        task_cache.get_cache().set('tasks:replica-test', 'stale')
+        request = self.factory.get('/api/tasks/')
+        _, seen = self.run_request(request)
+        self.assertEqual(seen['cached'], 'stale')
+        request.COOKIES['db_pin'] = '1'
+        _, seen = self.run_request(request)
+        self.assertIsNone(seen['cached'])
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_no_replicas_is_a_no_op(self):
+        """Test the middleware leaves single-database deployments alone"""
+        response, seen = self.run_request(self.factory.post('/api/tasks/'), 201)
+        self.assertEqual(seen['task'], 'default')
+        self.assertNotIn('db_pin', response.cookies)
+
+
+class SyncReplicaCommandTestCase(TransactionTestCase):
+    """Test cases for the sync_replica management command"""
+    # the backup API copies committed data, it would wait on TestCase's open transaction
+
+    def test_copy_database(self):
+        """Test the primary is copied onto a SQLite replica file"""
+        Task.objects.create(title="Replicated")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'replica.sqlite3')
+            copy_database(connection, path)
+            replica = sqlite3.connect(path)
+            try:
+                titles = [row[0] for row in replica.execute('SELECT title FROM tasks_task')]
+            finally:
+                replica.close()
+        self.assertEqual(titles, ["Replicated"])
+
+    def test_requires_replicas(self):
+        """Test the command refuses to run without SQLite replicas"""
+        with self.assertRaises(CommandError):
+            call_command('sync_replica')
+
+
+
+class SQLiteProfileTestCase(TestCase):
+    """Test the production SQLite profile is applied to new connections"""
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        """Test busy timeout, synchronous, cache and temp store settings"""
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+        self.assertEqual(self.pragma('temp_store'), 2)  # MEMORY
+        self.assertEqual(connection.settings_dict['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+
+
+class WriteQueueTestCase(TransactionTestCase):
+    """Test the group-committing SQLite write queue"""
+
+    def setUp(self):
+        self.queue = WriteQueue()
+        self.release = threading.Event()
+        # occupies the writer so the following jobs pile up into one batch
+        self.blocker = self.queue.submit(self.release.wait, 5)
+
+    def tearDown(self):
+        # the writer must be out of its transaction before the tables are flushed
+        self.release.set()
+        self.blocker.result(5)
+
+    def test_waiting_writes_share_one_commit(self):
+        """Test every write queued behind a commit is committed in the next one"""
+        futures = [self.queue.submit(Task.objects.create, title=f"Queued {i}") for i in range(10)]
+        self.release.set()
+        tasks = [future.result(5) for future in futures]
+        self.assertEqual(self.queue.stats()['batches'], 2)
+        self.assertEqual(self.queue.stats()['writes'], 11)
+        self.assertEqual(Task.objects.filter(id__in=[task.id for task in tasks]).count(), 10)
+        self.assertEqual(TaskSummary.current().total_tasks, 10)
+
+    def test_failing_write_only_rolls_back_itself(self):
+        """Test one failing job gets its exception and the rest of the batch commits"""
+        def fail():
+            Task.objects.create(title="Rolled back")
+            raise ValueError("rejected")
+
+        before = self.queue.submit(Task.objects.create, title="Before")
+        failing = self.queue.submit(fail)
+        after = self.queue.submit(Task.objects.create, title="After")
+        self.release.set()
+        with self.assertRaisesMessage(ValueError, "rejected"):
+            failing.result(5)
+        before.result(5), after.result(5)
+        self.assertEqual(sorted(Task.objects.values_list('title', flat=True)), ["After", "Before"])
+
+    def test_runs_inline_inside_a_transaction(self):
+        """Test a write inside the caller's transaction is not handed to the writer"""
+        self.release.set()
+        # the writer's own transaction has to end before this thread opens one
+        self.blocker.result(5)
+        with transaction.atomic():
+            self.assertIs(self.queue.run(threading.current_thread), threading.current_thread())
+        self.assertIsNot(self.queue.run(threading.current_thread), threading.current_thread())
+
+    @override_settings(SQLITE_WRITE_QUEUE=False)
+    def test_disabled(self):
+        """Test SQLITE_WRITE_QUEUE=False runs writes in the calling thread"""
+        self.release.set()
+        self.assertIs(self.queue.run(threading.current_thread), threading.current_thread())
+
+
 if __name__ == '__main__':
     import unittest
     unittest.main()
\ No newline at end of file
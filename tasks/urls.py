@@ -1,8 +1,16 @@
 from django.contrib import admin
 from django.urls import path
-from .views import TaskView
+from .async_views import AsyncTaskView, TaskStreamView
+from .views import TaskBulkView, TaskChangesView, TaskExportView, TaskFacetsView, TaskView
 
 urlpatterns = [
     path('tasks/', TaskView.as_view(), name='task-list'),
+    path('tasks/bulk/', TaskBulkView.as_view(), name='task-bulk'),
+    path('tasks/export/', TaskExportView.as_view(), name='task-export'),
+    path('tasks/facets/', TaskFacetsView.as_view(), name='task-facets'),
+    path('tasks/changes/', TaskChangesView.as_view(), name='task-changes'),
+    path('tasks/stream/', TaskStreamView.as_view(), name='task-stream'),
     path('tasks/<int:id>/', TaskView.as_view(), name='task-detail'),
+    path('async/tasks/', AsyncTaskView.as_view(), name='async-task-list'),
+    path('async/tasks/<int:id>/', AsyncTaskView.as_view(), name='async-task-detail'),
 ]
\ No newline at end of file
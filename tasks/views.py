@@ -1,23 +1,33 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 
 # Create your views here.
 from rest_framework import views
-from .models import Task
+from .models import Task, TaskSummary
 from rest_framework.response import Response
 
-from tasks.serializers import TaskSerializer
+from tasks import cache as task_cache, changes, conditional, counts, export, facets
+from tasks.search import search_tasks
+from tasks.bulk import PATCH_RETRIES, create_tasks, delete_tasks, patch_task, update_tasks
+from tasks.filters import filter_tasks
+from tasks.formatting import format_datetime
+from tasks.serializers import TaskSerializer, TaskValuesSerializer
 from rest_framework import status
-from rest_framework import pagination
+from tasks.pagination import TaskListPagination
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from zippee_assessment.permissions import AdminPermission, ManagerPermission, UserPermission
-from django.db.models import Q
-
-class TaskListPagination(pagination.CursorPagination):
-    ordering = '-created_at'
-    page_size = 10
-
+from zippee_assessment.write_queue import write_queue
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 class TaskView(views.APIView):
+    # enforced by QueryCountMiddleware: GET list is summary + page + filtered count
+    # (none when the summary answers it or the count is cached),
+    # writes include the user state lookup of a cold ClaimsJWTAuthentication cache,
+    # updates the conditional `completed` UPDATE of Task.write_completed
+    query_budget = {'GET': 3, 'POST': 5, 'PUT': 7, 'PATCH': 7, 'DELETE': 5}
 
     def get_permissions(self):
         """
@@ -29,7 +39,7 @@ class TaskView(views.APIView):
         elif self.request.method == 'POST':
             permission_classes = [IsAuthenticated, UserPermission]
 
-        elif self.request.method == 'PUT':
+        elif self.request.method in ['PUT', 'PATCH']:
             permission_classes = [IsAuthenticated, ManagerPermission]
 
         elif self.request.method == 'DELETE':
@@ -42,56 +52,90 @@ class TaskView(views.APIView):
 
     def get(self, request, id=None):
         if id is not None:
+            return self.retrieve(request, id)
+        return self.list(request)
+
+    def retrieve(self, request, id):
+        key = task_cache.detail_key(id)
+        entry = task_cache.get(key)
+        cache_status = 'HIT'
+        if entry is None:
+            cache_status = 'MISS'
             try:
                 task = Task.objects.get(id=id)
-                serializer = TaskSerializer(task)
-                return Response(serializer.data)
             except Task.DoesNotExist:
                 return Response(status=status.HTTP_404_NOT_FOUND)
-        else:
-            tasks = Task.objects.all()
-            
-            filters = Q()
-            
-            completed = request.query_params.get('completed')
-
-            if completed is not None:
-                if completed.lower() in ['true', '1']:
-                    filters &= Q(completed=True)
-
-                elif completed.lower() in ['false', '0']:
-                    filters &= Q(completed=False)
-            
-            search = request.query_params.get('search')
-            if search:
-                filters &= (Q(title__icontains=search) | Q(description__icontains=search))
-            
-            if filters:
-                filtered_tasks = tasks.filter(filters)
-            else:
-                filtered_tasks = tasks
+            # most polls are answered with a 304 before anything is serialized
+            not_modified = conditional.evaluate(request, conditional.task_etag(task.id, task.updated_at), task.updated_at)
+            if not_modified is not None:
+                return not_modified
+            entry = {
+                'data': TaskSerializer(task).data,
+                'etag': conditional.task_etag(task.id, task.updated_at),
+                'last_modified': task.updated_at,
+            }
+            task_cache.set(key, entry)
+        return self.cached_response(request, entry, cache_status)
 
-            total_tasks = Task.objects.count()
-            completed_tasks = Task.objects.filter(completed=True).count()
-            incomplete_tasks = Task.objects.filter(completed=False).count()
+    def list(self, request):
+        try:
+            fields = TaskValuesSerializer.parse_fields(request.query_params.get('fields'))
+            count_mode = counts.parse_mode(request.query_params.get('count'))
+        except ValueError as exc:
+            return Response({"message": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        key = task_cache.list_key(request)
+        entry = task_cache.get(key)
+        cache_status = 'HIT'
+        if entry is None:
+            cache_status = 'MISS'
+            filtered_tasks = filter_tasks(Task.objects.all(), request.query_params)
+            summary = TaskSummary.current()
+            params = task_cache.list_params(request)
+
+            serializer = TaskValuesSerializer(fields)
             paginator = TaskListPagination()
-            paginated_tasks = paginator.paginate_queryset(filtered_tasks, request)
-            serializer = TaskSerializer(paginated_tasks, many=True)
-            response = paginator.get_paginated_response(serializer.data)
+            rows = paginator.paginate_values(filtered_tasks, request, *serializer.select_fields, view=self)
+            # in the ETag, free without a search and carried in the cursor with one
+            filtered_count = counts.filtered_count(filtered_tasks, request, summary, count_mode, paginator)
+            etag = self.list_etag(params, rows, summary, filtered_count, paginator)
+            # a 304 skips serialization
+            not_modified = conditional.evaluate(request, etag, None)
+            if not_modified is not None:
+                return not_modified
+
+            response = paginator.get_paginated_response(serializer.to_representation(rows))
             response.data['task_summary'] = {
-                'total_tasks': total_tasks,
-                'completed_tasks': completed_tasks,
-                'incomplete_tasks': incomplete_tasks,
-                'filtered_count': filtered_tasks.count()
+                'total_tasks': summary.total_tasks,
+                'completed_tasks': summary.completed_tasks,
+                'incomplete_tasks': summary.incomplete_tasks,
+                'filtered_count': filtered_count,
+                'count': count_mode,
             }
-            
-            return response
-        
-        
+            entry = {'data': response.data, 'etag': etag, 'last_modified': None}
+            task_cache.set(key, entry)
+        return self.cached_response(request, entry, cache_status)
+
+    def list_etag(self, params, rows, summary, filtered_count, paginator):
+        # no Last-Modified for lists: deleting a row pulls an older one onto
+        # the page without moving the newest updated_at, only the ETag notices
+        return conditional.list_etag(
+            params, [(row['id'], row['updated_at']) for row in rows], summary,
+            filtered_count, paginator.has_next, paginator.has_previous,
+        )
+
+    def cached_response(self, request, entry, cache_status):
+        not_modified = conditional.evaluate(request, entry['etag'], entry['last_modified'])
+        if not_modified is not None:
+            not_modified['X-Cache'] = cache_status
+            return not_modified
+        response = Response(entry['data'], headers={'X-Cache': cache_status})
+        return conditional.set_validators(response, entry['etag'], entry['last_modified'])
+
     def post(self, request):
         serializer = TaskSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            write_queue.run(serializer.save)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -100,13 +144,271 @@ class TaskView(views.APIView):
         task = get_object_or_404(Task, id=id)
         serializer = TaskSerializer(task, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            write_queue.run(serializer.save)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def patch(self, request, id):
+        """
+        Partial update: only the supplied fields are validated, and only those
+        whose value changes are written, nothing at all when none does. Honours
+        `If-Match` with the detail ETag; the UPDATE is guarded by the
+        `updated_at` read here, so a concurrent write also answers 412. Without
+        `If-Match` the fields are applied again over a concurrent write, 409
+        when the task keeps changing.
+        """
+        task = get_object_or_404(Task, id=id)
+        if not conditional.if_match(request, task.id, task.updated_at):
+            return self.precondition_failed()
+        serializer = TaskSerializer(task, data=request.data, partial=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        pinned = conditional.pins_version(request)
+        task = write_queue.run(patch_task, task, serializer.validated_data, 0 if pinned else PATCH_RETRIES)
+        if task is None:
+            return self.precondition_failed() if pinned else self.conflict()
+        response = Response(TaskSerializer(task).data, status=status.HTTP_200_OK)
+        return conditional.set_validators(response, conditional.task_etag(task.id, task.updated_at), task.updated_at)
+
+    def precondition_failed(self):
+        return Response({"message": "Task was modified since it was read, fetch it again"}, status=status.HTTP_412_PRECONDITION_FAILED)
+
+    def conflict(self):
+        return Response({"message": "Task kept changing or was deleted, try again"}, status=status.HTTP_409_CONFLICT)
     
     def delete(self, request, id):
         task = get_object_or_404(Task, id=id)
-        task.delete()
+        write_queue.run(task.delete)
         return Response({"message": "Task deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
 
-    
\ No newline at end of file
+    
+
+def is_task_id(value):
+    # JSON true/false arrive as bool, an int subclass, and must not pass for ids 1 and 0
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class TaskBulkView(views.APIView):
+    """
+    Array versions of TaskView's writes. Every request is all-or-nothing: the
+    whole payload is validated first and any per-item error is reported in a
+    list aligned with the input, otherwise it is written in one transaction.
+    """
+    # constant in the number of items, savepoints included; updates re-read
+    # `completed` under the row locks (see update_tasks)
+    query_budget = {'POST': 7, 'PUT': 9, 'PATCH': 9, 'DELETE': 9}
+
+    def get_permissions(self):
+        if self.request.method == 'POST':
+            permission_classes = [IsAuthenticated, UserPermission]
+
+        elif self.request.method in ['PUT', 'PATCH', 'DELETE']:
+            permission_classes = [IsAuthenticated, ManagerPermission]
+        else:
+            permission_classes = [IsAuthenticated, AdminPermission]
+
+        return [permission() for permission in permission_classes]
+
+    def get_items(self, request, key):
+        items = request.data.get(key) if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return None, Response({"message": f"Expected a non-empty list of {key}"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.TASKS_BULK_MAX_ITEMS:
+            return None, Response({"message": f"At most {settings.TASKS_BULK_MAX_ITEMS} {key} per request"}, status=status.HTTP_400_BAD_REQUEST)
+        return items, None
+
+    def slug_errors(self, validated_items):
+        # each item passes UniqueValidator on its own, a slug repeated within
+        # the payload would only fail in the INSERT/UPDATE
+        seen, errors = set(), []
+        for data in validated_items:
+            slug = data.get('slug')
+            errors.append({"slug": ["Duplicate slug."]} if slug and slug in seen else {})
+            seen.add(slug)
+        return errors
+
+    @transaction.atomic
+    def post(self, request):
+        items, error = self.get_items(request, 'tasks')
+        if error:
+            return error
+        serializer = TaskSerializer(data=items, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        errors = self.slug_errors(serializer.validated_data)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        tasks = create_tasks([Task(**data) for data in serializer.validated_data])
+        return Response(TaskSerializer(tasks, many=True).data, status=status.HTTP_201_CREATED)
+
+    @transaction.atomic
+    def put(self, request):
+        items, error = self.get_items(request, 'tasks')
+        if error:
+            return error
+        partial = request.method == 'PATCH'
+
+        ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+        existing = Task.objects.in_bulk([i for i in ids if is_task_id(i)])
+        seen, serializers, errors = set(), [], []
+        for task_id, item in zip(ids, items):
+            if not is_task_id(task_id):
+                errors.append({"id": ["This field is required."]})
+            elif task_id in seen:
+                errors.append({"id": ["Duplicate task id."]})
+            elif task_id not in existing:
+                errors.append({"id": ["Task not found."]})
+            else:
+                serializer = TaskSerializer(existing[task_id], data=item, partial=partial)
+                errors.append({} if serializer.is_valid() else serializer.errors)
+                serializers.append(serializer)
+            seen.add(task_id)
+        if not any(errors):
+            errors = self.slug_errors([serializer.validated_data for serializer in serializers])
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = set()
+        for serializer in serializers:
+            for attr, value in serializer.validated_data.items():
+                setattr(serializer.instance, attr, value)
+                fields.add(attr)
+        tasks = update_tasks([serializer.instance for serializer in serializers], fields)
+        return Response(TaskSerializer(tasks, many=True).data, status=status.HTTP_200_OK)
+
+    def patch(self, request):
+        return self.put(request)
+
+    @transaction.atomic
+    def delete(self, request):
+        ids, error = self.get_items(request, 'ids')
+        if error:
+            return error
+        tasks = Task.objects.only('id', 'completed').in_bulk([i for i in ids if is_task_id(i)])
+        errors = [
+            {} if is_task_id(task_id) and task_id in tasks else {"id": ["Task not found."]}
+            for task_id in ids
+        ]
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        deleted = delete_tasks(list(tasks.values()))
+        return Response({"message": f"{deleted} tasks deleted successfully"}, status=status.HTTP_200_OK)
+
+
+class TaskChangesView(views.APIView):
+    """
+    Delta-sync feed for client side mirrors: tasks created or updated and
+    tombstones of tasks deleted since the `?since=` token, oldest first. Keep
+    calling with `next` while `has_more` is true, then poll with the last one.
+    """
+    permission_classes = [AllowAny]
+    # changed tasks + tombstones, both keyset reads
+    query_budget = 2
+    default_limit = 100
+    max_limit = 1000
+
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response({"message": f"limit must be between 1 and {self.max_limit}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = TaskValuesSerializer()
+        try:
+            rows, tombstones, token, has_more = changes.changes_since(
+                request.query_params.get('since'), limit, *serializer.select_fields
+            )
+        except changes.ExpiredToken as exc:
+            return Response({"message": str(exc)}, status=status.HTTP_410_GONE)
+        except changes.InvalidToken as exc:
+            return Response({"message": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'changes': serializer.to_representation(rows),
+            'deleted': [
+                {'id': task_id, 'deleted_at': format_datetime(deleted_at)}
+                for task_id, deleted_at in tombstones
+            ],
+            'next': token,
+            'has_more': has_more,
+        })
+
+
+class TaskFacetsView(views.APIView):
+    """
+    Dashboard counts by `completed`, by `created_at` bucket (`?bucket=hour|day|week`)
+    and by `updated_at` recency, for tasks matching `?search=`, from a single
+    GROUP BY query. `?since=` (by default the bucket's window, see
+    facets.WINDOWS) only limits which `created_at` buckets are listed.
+    """
+    permission_classes = [AllowAny]
+    query_budget = 1
+
+    def get(self, request):
+        try:
+            bucket = facets.parse_bucket(request.query_params.get('bucket'))
+        except ValueError as exc:
+            return Response({"message": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        since = request.query_params.get('since')
+        if since:
+            try:
+                since = parse_datetime(since)
+            except ValueError:
+                # well formed but out of range, e.g. month 13
+                since = None
+            if since is None:
+                return Response({"message": "since must be an ISO 8601 datetime"}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        key = task_cache.facets_key(request)
+        data = task_cache.get(key)
+        cache_status = 'HIT'
+        if data is None:
+            cache_status = 'MISS'
+            tasks = Task.objects.all()
+            search = request.query_params.get('search')
+            if search:
+                tasks = search_tasks(tasks, search)
+            try:
+                data = facets.task_facets(tasks, bucket, since or None)
+            except ValueError as exc:
+                return Response({"message": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            task_cache.set(key, data)
+        return Response(data, headers={'X-Cache': cache_status})
+
+
+class TaskExportView(views.APIView):
+    """
+    Streams every task matching the list filters as NDJSON or CSV. Rows are
+    read with a chunked server-side iterator in primary key order, so memory
+    stays flat whatever the table size.
+    """
+    permission_classes = [IsAuthenticated, UserPermission]
+    chunk_size = 2000
+
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= selects the export encoding here, not a DRF renderer
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        export_format = request.query_params.get('format', 'ndjson')
+        if export_format not in export.FORMATS:
+            return Response({"message": f"format must be one of {', '.join(export.FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        content_type, encode = export.FORMATS[export_format]
+
+        # the body is read after ReplicaRoutingMiddleware has returned, pin the
+        # alias while this request's routing still applies
+        tasks = Task.objects.using(router.db_for_read(Task))
+        rows = (
+            filter_tasks(tasks, request.query_params)
+            .order_by('id')
+            .values_list(*export.EXPORT_FIELDS)
+            .iterator(chunk_size=self.chunk_size)
+        )
+        response = StreamingHttpResponse(encode(rows, self.chunk_size), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="tasks.{export_format}"'
+        return response
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+
+class UserStateCache:
+    """
+    Per-process `user id -> (is_active, role)` map with a short TTL, so
+    deactivations and role changes take effect within JWT_USER_STATE_TTL
+    seconds without a user query on every request. Holds at most
+    JWT_USER_STATE_MAX_ENTRIES users, least recently used go first.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id):
+        found, state = self._cached(user_id)
+        if not found:
+            state = self._store(user_id, self._query(user_id).first())
+        return state
+
+    async def aget(self, user_id):
+        found, state = self._cached(user_id)
+        if not found:
+            state = self._store(user_id, await self._query(user_id).afirst())
+        return state
+
+    def _query(self, user_id):
+        return get_user_model().objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).values_list('is_active', 'role')
+
+    def _cached(self, user_id):
+        with self._lock:
+            entry = self._entries.get(str(user_id))
+            if entry is not None:
+                self._entries.move_to_end(str(user_id))
+        if entry is not None and entry[0] > time.monotonic():
+            return True, entry[1]
+        return False, None
+
+    def _store(self, user_id, state):
+        with self._lock:
+            self._entries[str(user_id)] = (time.monotonic() + settings.JWT_USER_STATE_TTL, state)
+            self._entries.move_to_end(str(user_id))
+            while len(self._entries) > settings.JWT_USER_STATE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+        return state
+
+    def forget(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(user_id), None)
+
+
+user_state = UserStateCache()
+
+
+class ClaimsUser(TokenUser):
+    """
+    Request user built from the access token claims written by
+    create_tokens_for_user() / MyTokenObtainPairSerializer, carrying what the
+    role permissions read without loading CustomUser.
+    """
+
+    def __init__(self, token, is_active, role):
+        super().__init__(token)
+        self.is_active = is_active
+        self.role = role
+
+    @cached_property
+    def id(self):
+        # `user_id` is serialised as a string, the `id` claim keeps the integer pk
+        return self.token.get('id', self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+    @cached_property
+    def first_name(self):
+        return self.token.get('first_name', '')
+
+    @cached_property
+    def last_name(self):
+        return self.token.get('last_name', '')
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication returning a ClaimsUser. `is_active` and `role` come from
+    the cached user state rather than the token so revocations still apply.
+    Tokens issued without a role claim fall back to loading the user.
+    """
+
+    def get_user(self, validated_token):
+        if 'role' not in validated_token or api_settings.USER_ID_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        return self.claims_user(validated_token, user_state.get(validated_token[api_settings.USER_ID_CLAIM]))
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views, header parsing and token checks are CPU only."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        if 'role' not in validated_token or api_settings.USER_ID_CLAIM not in validated_token:
+            user = await sync_to_async(super().get_user)(validated_token)
+        else:
+            user = self.claims_user(validated_token, await user_state.aget(validated_token[api_settings.USER_ID_CLAIM]))
+        return user, validated_token
+
+    def claims_user(self, validated_token, state):
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        is_active, role = state
+        if api_settings.CHECK_USER_IS_ACTIVE and not is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return ClaimsUser(validated_token, is_active, role)
@@ -0,0 +1,245 @@
+import contextvars
+import json
+import logging
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from zippee_assessment import routers
+
+logger = logging.getLogger('zippee_assessment.queries')
+
+_current = contextvars.ContextVar('query_stats', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+    """SQL statements a request ran: count, total time and the slowest one."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_duration = 0.0
+        self.slowest_sql = ''
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        if duration >= self.slowest_duration:
+            self.slowest_duration = duration
+            self.slowest_sql = sql
+
+    def as_dict(self):
+        return {
+            'queries': self.count,
+            'db_time_ms': round(self.duration * 1000, 3),
+            'slowest_ms': round(self.slowest_duration * 1000, 3),
+            'slowest_sql': self.slowest_sql,
+        }
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record(sql, time.perf_counter() - started)
+
+
+def install(connection, **kwargs):
+    # execute_wrappers live on the per-thread connection object, add ours once
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# connections opened later (new worker or sync_to_async threads) get it on connect
+connection_created.connect(install)
+
+
+def query_budget(view_class, method):
+    """
+    The most queries `view_class` may run for `method`, from its `query_budget`
+    attribute: an int for every method or a `{method: int}` dict. None when the
+    view declares no budget.
+    """
+    budget = getattr(view_class, 'query_budget', None)
+    if isinstance(budget, dict):
+        return budget.get(method.upper())
+    return budget
+
+
+def _header_value(sql):
+    return re.sub(r'\s+', ' ', sql)[:200]
+
+
+class QueryCountMiddleware:
+    """
+    Counts the SQL statements, total database time and slowest statement of
+    every request. In DEBUG they are sent as X-Query-* response headers,
+    otherwise logged as one JSON line on the `zippee_assessment.queries`
+    logger. Views declare a `query_budget`. Going over it logs a warning, or
+    raises QueryBudgetExceeded when QUERY_BUDGET_ENFORCE is set (tests).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(request._query_stats_token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(request._query_stats_token)
+        return self.finish(request, response)
+
+    def start(self, request):
+        for connection in connections.all():
+            install(connection)
+        request.query_stats = QueryStats()
+        request._query_stats_token = _current.set(request.query_stats)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = query_budget(getattr(view_func, 'view_class', None), request.method)
+
+    def finish(self, request, response):
+        stats = request.query_stats
+        budget = getattr(request, 'query_budget', None)
+        over_budget = budget is not None and stats.count > budget
+
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(stats.count)
+            response['X-Query-Time'] = f'{stats.duration * 1000:.3f}'
+            if stats.count:
+                response['X-Query-Slowest'] = f'{stats.slowest_duration * 1000:.3f} {_header_value(stats.slowest_sql)}'
+            if budget is not None:
+                response['X-Query-Budget'] = str(budget)
+
+        line = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **stats.as_dict(),
+            'budget': budget,
+        }
+        if over_budget:
+            logger.warning(json.dumps(line))
+            if settings.QUERY_BUDGET_ENFORCE:
+                raise QueryBudgetExceeded(
+                    f'{request.method} {request.path} ran {stats.count} queries, budget is {budget}'
+                )
+        elif not settings.DEBUG:
+            logger.info(json.dumps(line))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Tells PrimaryReplicaRouter whether this request may read from a replica:
+    safe requests may, unless their client wrote within the last
+    DATABASE_REPLICA_MAX_LAG_SECONDS. A successful write sets the
+    `DATABASE_REPLICA_PIN_COOKIE` cookie and, when it carries a JWT, pins the
+    user in the cache, so other devices of the same user are covered too.
+    Does nothing while REPLICA_DATABASES is empty.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+        user_id = self.user_id(request)
+        pinned = request.method in SAFE_METHODS and self.is_pinned(request, user_id and cache.get(self.pin_key(user_id)))
+        token = routers.route(self.state(request, pinned))
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.reset(token)
+        if self.wrote(request, response):
+            self.pin(response)
+            if user_id is not None:
+                cache.set(self.pin_key(user_id), True, timeout=settings.DATABASE_REPLICA_MAX_LAG_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return await self.get_response(request)
+        user_id = self.user_id(request)
+        pinned = request.method in SAFE_METHODS and self.is_pinned(request, user_id and await cache.aget(self.pin_key(user_id)))
+        token = routers.route(self.state(request, pinned))
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.reset(token)
+        if self.wrote(request, response):
+            self.pin(response)
+            if user_id is not None:
+                await cache.aset(self.pin_key(user_id), True, timeout=settings.DATABASE_REPLICA_MAX_LAG_SECONDS)
+        return response
+
+    def state(self, request, pinned):
+        if request.method not in SAFE_METHODS:
+            return routers.PRIMARY
+        return routers.PINNED if pinned else routers.REPLICA
+
+    def is_pinned(self, request, user_pinned):
+        return bool(user_pinned) or settings.DATABASE_REPLICA_PIN_COOKIE in request.COOKIES
+
+    def wrote(self, request, response):
+        return request.method not in SAFE_METHODS and response.status_code < 400
+
+    def pin(self, response):
+        response.set_cookie(
+            settings.DATABASE_REPLICA_PIN_COOKIE, '1',
+            max_age=settings.DATABASE_REPLICA_MAX_LAG_SECONDS, httponly=True, samesite='Lax',
+        )
+
+    def pin_key(self, user_id):
+        return f'db:pinned:{user_id}'
+
+    def user_id(self, request):
+        """The user id of a valid bearer token, None otherwise. Signature check only, no query."""
+        authenticator = JWTAuthentication()
+        header = authenticator.get_header(request)
+        raw_token = authenticator.get_raw_token(header) if header else None
+        if raw_token is None:
+            return None
+        try:
+            return authenticator.get_validated_token(raw_token).get(api_settings.USER_ID_CLAIM)
+        except InvalidToken:
+            return None
@@ -0,0 +1,63 @@
+"""
+Primary/replica database routing.
+
+Writes go to `default`, the primary. Safe (GET/HEAD/OPTIONS) requests read
+task data from the REPLICA_DATABASES aliases, chosen at random per query.
+Users, tokens and the other auth tables, unsafe requests, and anything outside
+a request (management commands, background tasks) always read the primary.
+
+Read-your-writes: a successful write pins its client to the primary for
+DATABASE_REPLICA_MAX_LAG_SECONDS, through a cookie and, for JWT users, a cache
+key, see ReplicaRoutingMiddleware.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+
+PRIMARY = 'primary'
+REPLICA = 'replica'
+PINNED = 'pinned'
+
+# set per request by ReplicaRoutingMiddleware, None outside requests
+_routing = contextvars.ContextVar('replica_routing', default=None)
+
+
+def reading_replicas():
+    return _routing.get() == REPLICA
+
+
+def pinned():
+    """Whether this request's client wrote within the replica lag window."""
+    return _routing.get() == PINNED
+
+
+def route(state):
+    """Set the routing state of the current request, returns the token for reset()."""
+    return _routing.set(state)
+
+
+def reset(token):
+    _routing.reset(token)
+
+
+class PrimaryReplicaRouter:
+    # read from the primary even in safe requests: authentication must see
+    # fresh is_active/role and token state
+    primary_apps = {'admin', 'auth', 'authentication', 'contenttypes', 'sessions', 'token_blacklist'}
+
+    def db_for_read(self, model, **hints):
+        if reading_replicas() and settings.REPLICA_DATABASES and model._meta.app_label not in self.primary_apps:
+            return random.choice(settings.REPLICA_DATABASES)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas receive the schema from the primary
+        return db not in settings.REPLICA_DATABASES
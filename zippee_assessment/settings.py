@@ -10,8 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'zippee_assessment.middleware.QueryCountMiddleware',
+    'zippee_assessment.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,12 +84,76 @@ WSGI_APPLICATION = 'zippee_assessment.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SQLite profile applied to every new connection. "production" turns on WAL,
+# synchronous=NORMAL, a busy timeout, mmap and a bigger page cache, and takes the
+# write lock at BEGIN (IMMEDIATE) so concurrent writers wait for it instead of
+# failing with "database is locked" on upgrade; "default" keeps SQLite's own settings
+SQLITE_PROFILE = config('SQLITE_PROFILE', default='production')
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT_MS', default=5000, cast=int),
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=128 * 1024 * 1024, cast=int),
+    # negative means KiB: 64 MiB of page cache per connection
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-64 * 1024, cast=int),
+    'temp_store': 'memory',
+}
+SQLITE_OPTIONS = {}
+if SQLITE_PROFILE == 'production':
+    SQLITE_OPTIONS = {
+        'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+    }
+
+# hand TaskView writes to one writer thread per process that group-commits them,
+# see zippee_assessment/write_queue.py; batch is the most writes per commit
+SQLITE_WRITE_QUEUE = config('SQLITE_WRITE_QUEUE', default=True, cast=bool)
+SQLITE_WRITE_QUEUE_BATCH = config('SQLITE_WRITE_QUEUE_BATCH', default=64, cast=int)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
+    }
+}
+
+# Read replicas, see zippee_assessment/routers.py. DATABASE_REPLICAS lists SQLite
+# files kept in step with `python manage.py sync_replica`; for PostgreSQL add the
+# replica aliases to DATABASES and REPLICA_DATABASES here instead
+for n, name in enumerate(config('DATABASE_REPLICAS', default='', cast=Csv()), 1):
+    DATABASES[f'replica_{n}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'OPTIONS': SQLITE_OPTIONS,
+        'TEST': {'MIRROR': 'default'},
+    }
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['zippee_assessment.routers.PrimaryReplicaRouter']
+# how far replicas may lag behind: a client that wrote reads the primary for this long
+DATABASE_REPLICA_MAX_LAG_SECONDS = config('DATABASE_REPLICA_MAX_LAG_SECONDS', default=5, cast=int)
+DATABASE_REPLICA_PIN_COOKIE = 'db_pin'
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# locmem is per process, point CACHE_BACKEND/CACHE_LOCATION at a shared
+# cache (redis, memcached) when running several workers
+
+CACHE_BACKEND = config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': config('CACHE_LOCATION', default='zippee'),
     }
 }
+# backends whose entries other worker processes cannot see
+PER_PROCESS_CACHE_BACKENDS = [
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+]
+SHARED_CACHE = CACHE_BACKEND not in PER_PROCESS_CACHE_BACKENDS
 
 
 # Password validation
@@ -132,12 +199,114 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'authentication.CustomUser'
 
+# largest array accepted by the /api/tasks/bulk/ endpoints
+TASKS_BULK_MAX_ITEMS = config('TASKS_BULK_MAX_ITEMS', default=500, cast=int)
+
+# /api/tasks/changes/ only serves rows older than this many seconds, so a write
+# committing late with an earlier updated_at cannot slip behind a client's token
+TASKS_CHANGES_SETTLE_SECONDS = config('TASKS_CHANGES_SETTLE_SECONDS', default=2, cast=float)
+# delete tombstones are kept this long, older sync tokens get a 410 and must resync
+TASKS_TOMBSTONE_RETENTION_DAYS = config('TASKS_TOMBSTONE_RETENTION_DAYS', default=30, cast=int)
+
+# /api/tasks/stream/ server-sent events: where events come from (LocalBackend for a
+# single worker, ChangesFeedBackend to share writes between workers through the
+# database), per-subscriber queue bound, subscribers per process, keep-alive interval
+TASKS_STREAM_BACKEND = config('TASKS_STREAM_BACKEND', default='tasks.stream.LocalBackend')
+TASKS_STREAM_QUEUE_SIZE = config('TASKS_STREAM_QUEUE_SIZE', default=100, cast=int)
+TASKS_STREAM_MAX_SUBSCRIBERS = config('TASKS_STREAM_MAX_SUBSCRIBERS', default=20000, cast=int)
+TASKS_STREAM_KEEPALIVE_SECONDS = config('TASKS_STREAM_KEEPALIVE_SECONDS', default=15, cast=float)
+TASKS_STREAM_POLL_SECONDS = config('TASKS_STREAM_POLL_SECONDS', default=1, cast=float)
+
+# response cache for the public task GET endpoints, 0 disables it. Off by default on a
+# per-process cache: a write there only bumps its own worker's generation, so the other
+# workers would keep serving pre-write pages, counts and facets (see tasks/checks.py)
+TASKS_CACHE_ALIAS = 'default'
+TASKS_CACHE_TTL = config('TASKS_CACHE_TTL', default=60 if SHARED_CACHE else 0, cast=int)
+# seconds an exact `filtered_count` is reused across the pages of one filter (0 disables),
+# and how many search matches `?count=estimate` probes on SQLite
+TASKS_COUNT_CACHE_TTL = config('TASKS_COUNT_CACHE_TTL', default=300 if SHARED_CACHE else 0, cast=int)
+TASKS_COUNT_SAMPLE_SIZE = config('TASKS_COUNT_SAMPLE_SIZE', default=10000, cast=int)
+# most created_at buckets /tasks/facets/ returns before asking for a coarser bucket
+TASKS_FACETS_MAX_BUCKETS = config('TASKS_FACETS_MAX_BUCKETS', default=1000, cast=int)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # ClaimsJWTAuthentication builds request.user from the token claims,
+        # set to rest_framework_simplejwt.authentication.JWTAuthentication to load CustomUser instead
+        config('JWT_AUTHENTICATION_CLASS', default='zippee_assessment.authentication.ClaimsJWTAuthentication'),
     ),
 }
 
+# Email
+# console backend by default, set EMAIL_BACKEND/EMAIL_HOST/EMAIL_PORT for SMTP
+# (e.g. `python -m aiosmtpd -n -l localhost:1025` as a local stub)
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=25, cast=int)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=False, cast=bool)
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='no-reply@zippee.local')
+
+# outbox worker (manage.py run_outbox_worker): emails per batch, attempts before an
+# email is marked FAILED, retry backoff doubling from BASE up to MAX seconds, and
+# how long a claimed batch is reserved for the worker that claimed it
+OUTBOX_BATCH_SIZE = config('OUTBOX_BATCH_SIZE', default=50, cast=int)
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+OUTBOX_RETRY_BASE_SECONDS = config('OUTBOX_RETRY_BASE_SECONDS', default=30, cast=int)
+OUTBOX_RETRY_MAX_SECONDS = config('OUTBOX_RETRY_MAX_SECONDS', default=3600, cast=int)
+OUTBOX_LEASE_SECONDS = config('OUTBOX_LEASE_SECONDS', default=300, cast=int)
+
+# email verification codes (authentication.otp), kept in the cache: digits per code,
+# seconds a code stays valid, wrong guesses before it is dropped, and the minimum
+# seconds between resends to one address
+OTP_LENGTH = config('OTP_LENGTH', default=6, cast=int)
+OTP_TTL_SECONDS = config('OTP_TTL_SECONDS', default=600, cast=int)
+OTP_MAX_ATTEMPTS = config('OTP_MAX_ATTEMPTS', default=5, cast=int)
+OTP_RESEND_SECONDS = config('OTP_RESEND_SECONDS', default=60, cast=int)
+
+# login throughput (authentication.login): password hashing threads, logins allowed to
+# wait for one before login answers 503, and seconds between batched last_login UPDATEs
+LOGIN_HASH_WORKERS = config('LOGIN_HASH_WORKERS', default=os.cpu_count() or 1, cast=int)
+LOGIN_HASH_QUEUE = config('LOGIN_HASH_QUEUE', default=64, cast=int)
+LOGIN_FLUSH_SECONDS = config('LOGIN_FLUSH_SECONDS', default=10, cast=float)
+
+# refresh token blacklist (authentication.blacklist): revoked tokens the per-process
+# Bloom filter is sized for before it is rebuilt, its false positive rate (each
+# false positive costs one query), the most seconds a filter goes without loading
+# rows revoked by other processes, and seconds between prunes of expired rows
+JWT_BLACKLIST_CAPACITY = config('JWT_BLACKLIST_CAPACITY', default=1000000, cast=int)
+JWT_BLACKLIST_ERROR_RATE = config('JWT_BLACKLIST_ERROR_RATE', default=0.001, cast=float)
+JWT_BLACKLIST_SYNC_SECONDS = config('JWT_BLACKLIST_SYNC_SECONDS', default=5, cast=int)
+JWT_BLACKLIST_PRUNE_SECONDS = config('JWT_BLACKLIST_PRUNE_SECONDS', default=3600, cast=int)
+
+# seconds a user's is_active/role is cached per process by ClaimsJWTAuthentication,
+# and the most users cached per process
+JWT_USER_STATE_TTL = config('JWT_USER_STATE_TTL', default=30, cast=int)
+JWT_USER_STATE_MAX_ENTRIES = config('JWT_USER_STATE_MAX_ENTRIES', default=10000, cast=int)
+
+# raise instead of logging a warning when a view runs more queries than its query_budget
+QUERY_BUDGET_ENFORCE = config('QUERY_BUDGET_ENFORCE', default=False, cast=bool)
+
+TEST_RUNNER = 'zippee_assessment.test_runner.TestRunner'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # one JSON line per request from QueryCountMiddleware
+        'zippee_assessment.queries': {
+            'handlers': ['console'],
+            # the test runner lowers it to over-budget warnings only
+            'level': config('QUERY_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 
 from datetime import timedelta
 ...
@@ -175,9 +344,9 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 
     "TOKEN_OBTAIN_SERIALIZER": "zippee_assessment.serializers.MyTokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "authentication.serializers.RefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
-    "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
+    "TOKEN_BLACKLIST_SERIALIZER": "authentication.serializers.LogoutSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
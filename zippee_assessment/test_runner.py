@@ -0,0 +1,33 @@
+import logging
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the suite with the per-request query log at WARNING, so only
+    over-budget requests are printed. Tests asserting the INFO lines lower it
+    themselves with assertLogs().
+
+    The last_login buffer's flush timer is pushed past the run, so it does not
+    write from its own thread in the middle of another test, and what the
+    tests left buffered is dropped instead of being flushed at exit into
+    whatever database the settings point at by then.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        logger = logging.getLogger('zippee_assessment.queries')
+        self.query_log_level = logger.level
+        logger.setLevel(logging.WARNING)
+        self.login_flush_seconds = settings.LOGIN_FLUSH_SECONDS
+        settings.LOGIN_FLUSH_SECONDS = 24 * 3600
+
+    def teardown_test_environment(self, **kwargs):
+        from authentication.login import last_logins
+
+        last_logins.forget()
+        settings.LOGIN_FLUSH_SECONDS = self.login_flush_seconds
+        logging.getLogger('zippee_assessment.queries').setLevel(self.query_log_level)
+        super().teardown_test_environment(**kwargs)
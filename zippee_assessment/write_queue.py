@@ -0,0 +1,106 @@
+"""
+In-process write coordinator for SQLite.
+
+SQLite allows one writer at a time and every commit is a journal sync, so
+request threads that write concurrently mostly wait on each other's locks (or
+fail with "database is locked"). WriteQueue hands the writes of this process
+to a single writer thread instead: it takes every job waiting in the queue,
+up to SQLITE_WRITE_QUEUE_BATCH, runs each in its own savepoint and commits
+them together, so N concurrent writes cost one lock and one sync. A job that
+raises only rolls back its savepoint; its caller gets the exception and the
+rest of the batch still commits.
+
+Jobs run in a copy of the caller's context (query stats, routing state) and
+their on_commit callbacks run before the caller is released. Writes made
+inside an open transaction, or on other databases than SQLite, run inline.
+"""
+import contextvars
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import connections, transaction
+
+
+class WriteQueue:
+    def __init__(self, using='default'):
+        self.using = using
+        self.jobs = queue.SimpleQueue()
+        self.thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.writes = 0
+
+    def enabled(self):
+        return settings.SQLITE_WRITE_QUEUE and connections[self.using].vendor == 'sqlite'
+
+    def inline(self):
+        # the caller's transaction must include the write, and the writer must not wait on itself
+        return (
+            not self.enabled()
+            or connections[self.using].in_atomic_block
+            or threading.current_thread() is self.thread
+        )
+
+    def run(self, func, *args, **kwargs):
+        """Run `func(*args, **kwargs)` as part of the next group commit and return its result."""
+        if self.inline():
+            return func(*args, **kwargs)
+        return self.submit(func, *args, **kwargs).result()
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        self.jobs.put((contextvars.copy_context(), func, args, kwargs, future))
+        self.start()
+        return future
+
+    def start(self):
+        if self.thread is None:
+            with self._lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.work, name='sqlite-writer', daemon=True)
+                    self.thread.start()
+
+    def work(self):
+        while True:
+            batch = [self.jobs.get()]
+            while len(batch) < settings.SQLITE_WRITE_QUEUE_BATCH:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            self.commit(batch)
+
+    def commit(self, batch):
+        outcomes = []
+        try:
+            with transaction.atomic(using=self.using):
+                for context, func, args, kwargs, future in batch:
+                    try:
+                        with transaction.atomic(using=self.using):
+                            outcomes.append((future, context.run(func, *args, **kwargs), None))
+                    except Exception as exc:
+                        outcomes.append((future, None, exc))
+        except Exception as exc:
+            # the commit itself failed, nothing in the batch was written
+            for _, _, _, _, future in batch:
+                future.set_exception(exc)
+            return
+        self.batches += 1
+        self.writes += len(batch)
+        for future, result, exc in outcomes:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'writes': self.writes,
+            'writes_per_batch': self.writes / self.batches if self.batches else 0.0,
+        }
+
+
+write_queue = WriteQueue()